@@ -1,19 +1,19 @@
 import asyncio
+import json
 import sys
 import time
-import json
 import copy
 import os
-import random
 import gc
 from collections import defaultdict
+from contextlib import asynccontextmanager
 from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, Literal, Optional
 from uuid import uuid4
-from dataclasses import asdict
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 CURRENT_DIR = Path(__file__).resolve().parent
@@ -21,16 +21,17 @@ if str(CURRENT_DIR) not in sys.path:
   sys.path.append(str(CURRENT_DIR))
 
 from upstash_client import get_upstash_client  # noqa: E402
+from queue_consumer import QueueConsumer, consumer_concurrency  # noqa: E402
 from loguru import logger  # noqa: E402
 from models import Assignment, parse_schedule_input, ScheduleInput  # noqa: E402
-from solver.ortools_solver import solve_with_ortools  # noqa: E402
-from solver.cpsat_solver import solve_with_cpsat  # noqa: E402
-from solver.postprocessor import SchedulePostProcessor  # noqa: E402
+from pipeline import serialize_assignments, solve_job  # noqa: E402
+from solver.incumbents import IncumbentSink  # noqa: E402
+from solver.preflight import blocking_issues, run_preflight_checks  # noqa: E402
+from solver.progress import JobEvents  # noqa: E402
+from solver.search_params import track_inflight_job  # noqa: E402
 from solver.exceptions import SolverFailure  # noqa: E402
 from solver.types import SolveResult  # noqa: E402
 
-LOG_DIR = Path(os.environ.get("MILP_LOG_DIR", CURRENT_DIR / "logs"))
-
 
 class SchedulerJobRequest(BaseModel):
   milpInput: Dict[str, Any]
@@ -44,6 +45,7 @@ class SchedulerJobStatus(BaseModel):
   status: Literal['queued', 'processing', 'completed', 'failed', 'timedout', 'cancelled']
   result: Optional[Dict[str, Any]] = None
   bestResult: Optional[Dict[str, Any]] = None
+  incumbent: Optional[Dict[str, Any]] = None
   error: Optional[str] = None
   errorDiagnostics: Optional[Dict[str, Any]] = None
   createdAt: str
@@ -54,9 +56,23 @@ class SchedulerJobResponse(BaseModel):
   jobId: str = Field(..., alias='jobId')
 
 
+class SchedulerPreflightRequest(BaseModel):
+  milpInput: Dict[str, Any]
+
+
+class SchedulerPreflightResponse(BaseModel):
+  feasible: bool
+  issues: list[Dict[str, Any]]
+  blockingIssues: list[Dict[str, Any]]
+  guidance: Dict[str, list[str]]
+  elapsedMs: int
+
+
 class CancellationToken:
   def __init__(self):
     self.cancelled = False
+    self.incumbent_sink: Optional[IncumbentSink] = None
+    self.events: Optional[JobEvents] = None
 
   def cancel(self):
     self.cancelled = True
@@ -69,18 +85,35 @@ class InternalJobState:
     self.status: Literal['queued', 'processing', 'completed', 'failed', 'timedout', 'cancelled'] = 'queued'
     self.result: Optional[Dict[str, Any]] = None
     self.best_result: Optional[Dict[str, Any]] = None
+    # Latest raw solver incumbent while processing; best_result only fills once the pipeline returns.
+    self.incumbent: Optional[Dict[str, Any]] = None
     self.error: Optional[str] = None
     self.error_diagnostics: Optional[Dict[str, Any]] = None
+    # The submitted request, kept while queued so any write of the record (e.g. a cancel) preserves it.
+    self.request_payload: Optional[Dict[str, Any]] = None
     self.created_at = now
     self.updated_at = now
     self.cancel_token = CancellationToken()
+    self.events = JobEvents()
+    self.cancel_token.events = self.events
+
+  def refresh_incumbent(self, force: bool = False) -> bool:
+    sink = self.cancel_token.incumbent_sink
+    snapshot = sink.snapshot(force) if sink and self.status == 'processing' else None
+    if snapshot is None or (self.incumbent and self.incumbent.get("version") == snapshot["version"]):
+      return False
+    self.incumbent = snapshot
+    self.updated_at = datetime.utcnow().isoformat()
+    return True
 
   def to_response(self) -> SchedulerJobStatus:
+    self.refresh_incumbent()
     return SchedulerJobStatus(
       id=self.id,
       status=self.status,
       result=self.result,
       bestResult=self.best_result,
+      incumbent=self.incumbent,
       error=self.error,
       errorDiagnostics=self.error_diagnostics,
       createdAt=self.created_at,
@@ -95,6 +128,7 @@ class InternalJobState:
     self.status = 'completed'
     self.result = result
     self.best_result = result
+    self.incumbent = None
     self.updated_at = datetime.utcnow().isoformat()
 
   def mark_failed(self, error: str, diagnostics: Optional[Dict[str, Any]] = None):
@@ -126,12 +160,43 @@ class InternalJobState:
     self.cancel_token.cancel()
 
 
-app = FastAPI(title="MILP-CSP Scheduler Worker", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  consumer = None
+  if UPSTASH_CLIENT and UPSTASH_CONSUMER_ENABLED:
+    consumer = QueueConsumer(
+      UPSTASH_CLIENT,
+      UPSTASH_QUEUE_KEY,
+      run_queued_job,
+      consumer_concurrency(SCHEDULER_CONSUMER_CONCURRENCY, SCHEDULER_CORES_PER_JOB),
+      UPSTASH_POLL_MIN_SECONDS,
+      UPSTASH_POLL_MAX_SECONDS,
+    )
+    consumer.start()
+    logger.info(f"[Upstash] consuming {UPSTASH_QUEUE_KEY} with concurrency {consumer.concurrency}")
+  app.state.queue_consumer = consumer
+  try:
+    yield
+  finally:
+    if consumer:
+      await consumer.stop()
+
+
+app = FastAPI(title="MILP-CSP Scheduler Worker", version="0.1.0", lifespan=lifespan)
 jobs: Dict[str, InternalJobState] = {}
 JOB_RETENTION_SECONDS = int(os.environ.get("SCHEDULER_JOB_TTL_SECONDS", 300))
 UPSTASH_CLIENT = get_upstash_client()
 UPSTASH_QUEUE_KEY = os.environ.get("UPSTASH_QUEUE_KEY", "scheduler:queue")
 UPSTASH_JOB_KEY_PREFIX = os.environ.get("UPSTASH_JOB_KEY_PREFIX", "scheduler:job:")
+UPSTASH_CONSUMER_ENABLED = os.environ.get("UPSTASH_CONSUMER_ENABLED", "1").lower() not in {"0", "false", "no"}
+UPSTASH_POLL_MIN_SECONDS = float(os.environ.get("UPSTASH_POLL_MIN_SECONDS", 0.25))
+UPSTASH_POLL_MAX_SECONDS = float(os.environ.get("UPSTASH_POLL_MAX_SECONDS", 5))
+SCHEDULER_CONSUMER_CONCURRENCY = int(os.environ.get("SCHEDULER_CONSUMER_CONCURRENCY", 0))
+SCHEDULER_CORES_PER_JOB = int(os.environ.get("SCHEDULER_CORES_PER_JOB", 2))
+INCUMBENT_SNAPSHOT_INTERVAL_MS = int(os.environ.get("SCHEDULER_INCUMBENT_INTERVAL_MS", 1000))
+INCUMBENT_PERSIST_SECONDS = float(os.environ.get("UPSTASH_INCUMBENT_PERSIST_SECONDS", 5))
+SSE_KEEPALIVE_SECONDS = float(os.environ.get("SCHEDULER_SSE_KEEPALIVE_SECONDS", 15))
+TERMINAL_JOB_STATUSES = {'completed', 'failed', 'timedout', 'cancelled'}
 
 
 def _job_record_key(job_id: str) -> str:
@@ -144,6 +209,7 @@ def job_to_record(job: InternalJobState, request_payload: Optional[Dict[str, Any
     "status": job.status,
     "result": job.result,
     "bestResult": job.best_result,
+    "incumbent": job.incumbent,
     "error": job.error,
     "errorDiagnostics": job.error_diagnostics,
     "createdAt": job.created_at,
@@ -157,8 +223,10 @@ def record_to_job(record: Dict[str, Any]) -> InternalJobState:
   job.status = record.get("status", "queued")
   job.result = record.get("result")
   job.best_result = record.get("bestResult")
+  job.incumbent = record.get("incumbent")
   job.error = record.get("error")
   job.error_diagnostics = record.get("errorDiagnostics")
+  job.request_payload = record.get("requestPayload")
   job.created_at = record.get("createdAt", job.created_at)
   job.updated_at = record.get("updatedAt", job.updated_at)
   return job
@@ -168,7 +236,7 @@ async def persist_job_state(job: InternalJobState, request_payload: Optional[Dic
   if not UPSTASH_CLIENT:
     return
   try:
-    record = job_to_record(job, request_payload)
+    record = json.dumps(job_to_record(job, request_payload), ensure_ascii=False, default=str)
     await asyncio.to_thread(UPSTASH_CLIENT.set, _job_record_key(job.id), record)
   except Exception as exc:  # pragma: no cover
     logger.warning(f"[Upstash] failed to persist job {job.id}: {exc}")
@@ -190,7 +258,9 @@ async def fetch_job_record(job_id: str) -> Optional[Dict[str, Any]]:
   if not UPSTASH_CLIENT:
     return None
   try:
-    return await asyncio.to_thread(UPSTASH_CLIENT.get, _job_record_key(job_id))
+    record = await asyncio.to_thread(UPSTASH_CLIENT.get, _job_record_key(job_id))
+    # Records are stored as JSON text; the TS client's auto-serialized writes read back the same way.
+    return json.loads(record) if isinstance(record, (str, bytes)) else record
   except Exception:
     return None
 
@@ -210,25 +280,11 @@ async def _cleanup_job_later(job_id: str):
   if job_state:
     job_state.result = None
     job_state.best_result = None
+    job_state.incumbent = None
     job_state.error_diagnostics = None
   gc.collect()
 
 
-def serialize_assignments(assignments: list[Assignment]) -> list[Dict[str, Any]]:
-  serialized = []
-  for assignment in assignments:
-    serialized.append(
-      {
-        "employeeId": assignment.employeeId,
-        "date": assignment.date,
-        "shiftId": assignment.shiftId,
-        "shiftType": assignment.shiftType,
-        "isLocked": assignment.isLocked,
-      }
-  )
-  return serialized
-
-
 def _build_date_range(start: date, end: date) -> list[date]:
   current = start
   days: list[date] = []
@@ -312,18 +368,6 @@ def compute_off_accruals(schedule: ScheduleInput, assignments: list[Assignment])
   return summaries
 
 
-def log_json(prefix: str, payload: Dict[str, Any]) -> Optional[str]:
-  try:
-    LOG_DIR.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
-    path = LOG_DIR / f"{prefix}-{timestamp}.json"
-    with path.open("w", encoding="utf-8") as file:
-      json.dump(payload, file, ensure_ascii=False, indent=2, default=str)
-    return str(path)
-  except Exception:
-    return None
-
-
 def build_solver_result(
   schedule: ScheduleInput,
   assignments: list[Assignment],
@@ -477,6 +521,14 @@ def _build_failure_guidance(diagnostics: Optional[Dict[str, Any]]) -> Dict[str,
       guidance["staffing"].append(
         f"{issue.get('date')} {issue.get('shiftType')}: 필요 {issue.get('required')}명 > 가능 {issue.get('available')}명 → requiredStaffPerShift↓ 또는 해당 시프트 가능한 인원 추가"
       )
+    elif issue_type == "dailyDemandExceedsStaff":
+      guidance["staffing"].append(
+        f"{issue.get('date')}: 시프트 합계 필요 {issue.get('required')}명 > 근무 가능 {issue.get('available')}명 → requiredStaffPerShift↓ 또는 인원 추가"
+      )
+    elif issue_type == "offRequirementImpossible":
+      guidance["general"].append(
+        f"{issue.get('employeeId')}: 필요 휴무 {issue.get('requiredOffDays')}일 > 기간 {issue.get('availableDays')}일 → 이월 휴무(previousOffAccruals) 조정"
+      )
     elif issue_type == "teamCoverageImpossible":
       guidance["coverage"].append(
         f"{issue.get('date')} {issue.get('shiftType')} 팀 {issue.get('teamId')}: 배치 가능 0명 → 팀 커버 요구 완화 또는 팀 구성 조정"
@@ -519,376 +571,38 @@ def _build_failure_guidance(diagnostics: Optional[Dict[str, Any]]) -> Dict[str,
   return guidance
 
 
-def serialize_schedule(schedule: ScheduleInput) -> Dict[str, Any]:
-  return asdict(schedule)
-
-
-def attempt_schedule_run(
-  schedule: ScheduleInput, label: str, cancel_token: Optional[CancellationToken] = None
-) -> SolveResult:
-  start = time.perf_counter()
-  log_json(f"{label}-milp-input", serialize_schedule(schedule))
-  solver_result = solve_with_ortools(schedule, cancel_token)
-  postprocessor = SchedulePostProcessor(
-    schedule,
-    solver_result.assignments,
-    solver_result.diagnostics,
-    getattr(schedule, "options", None),
-  )
-  assignments, diagnostics = postprocessor.run()
-  log_json(
-    f"{label}-milp-output",
-    {
-      "diagnostics": diagnostics,
-      "assignments": serialize_assignments(assignments),
-    },
-  )
-  postprocessor = None
-  solver_meta = {
-    "solverStatus": solver_result.diagnostics.get("solverStatus", solver_result.status),
-    "solverTimedOut": solver_result.diagnostics.get("solverTimedOut", solver_result.timed_out),
-    "solverWallTimeMs": solver_result.diagnostics.get("solverWallTimeMs"),
-    "solverRawStatus": solver_result.diagnostics.get("solverRawStatus"),
-  }
-  for key, value in solver_meta.items():
-    if value is not None:
-      diagnostics.setdefault(key, value)
-  elapsed_ms = int((time.perf_counter() - start) * 1000)
-  return SolveResult(
-    assignments=assignments,
-    diagnostics=diagnostics,
-    status=solver_result.status,
-    solve_time_ms=elapsed_ms,
-    best_objective=solver_result.best_objective,
-    timed_out=solver_result.timed_out,
-  )
-
-
-def attempt_cpsat_schedule_run(
-  schedule: ScheduleInput, label: str, cancel_token: Optional[CancellationToken] = None
-) -> SolveResult:
-  start = time.perf_counter()
-  log_json(f"{label}-milp-input", serialize_schedule(schedule))
-  solver_result = solve_with_cpsat(schedule, cancel_token)
-  postprocessor = SchedulePostProcessor(
-    schedule,
-    solver_result.assignments,
-    solver_result.diagnostics,
-    getattr(schedule, "options", None),
-  )
-  assignments, diagnostics = postprocessor.run()
-  log_json(
-    f"{label}-milp-output",
-    {
-      "diagnostics": diagnostics,
-      "assignments": serialize_assignments(assignments),
-    },
-  )
-  postprocessor = None
-  solver_meta = {
-    "solverStatus": solver_result.diagnostics.get("solverStatus", solver_result.status),
-    "solverTimedOut": solver_result.diagnostics.get("solverTimedOut", solver_result.timed_out),
-    "solverWallTimeMs": solver_result.diagnostics.get("solverWallTimeMs"),
-    "solverRawStatus": solver_result.diagnostics.get("solverRawStatus"),
-  }
-  for key, value in solver_meta.items():
-    if value is not None:
-      diagnostics.setdefault(key, value)
-  elapsed_ms = int((time.perf_counter() - start) * 1000)
-  return SolveResult(
-    assignments=assignments,
-    diagnostics=diagnostics,
-    status=solver_result.status,
-    solve_time_ms=elapsed_ms,
-    best_objective=solver_result.best_objective,
-    timed_out=solver_result.timed_out,
-  )
-
-
-def attempt_hybrid_schedule_run(
-  schedule: ScheduleInput, label: str, cancel_token: Optional[CancellationToken] = None
-) -> SolveResult:
-  cpsat_result = attempt_cpsat_schedule_run(schedule, f"{label}-cpsat", cancel_token)
-  ortools_result = attempt_schedule_run(schedule, f"{label}-ortools", cancel_token)
-  diagnostics = ortools_result.diagnostics
-  diagnostics.setdefault("preflightIssues", []).append(
-    {
-      "type": "solverInfo",
-      "message": "Hybrid solver: CP-SAT then OR-Tools",
-      "solver": "hybrid",
-    }
-  )
-  diagnostics["hybrid"] = {"cpsatDiagnostics": cpsat_result.diagnostics}
-  return SolveResult(
-    assignments=ortools_result.assignments,
-    diagnostics=diagnostics,
-    status=ortools_result.status,
-    solve_time_ms=max(ortools_result.solve_time_ms, cpsat_result.solve_time_ms),
-    best_objective=ortools_result.best_objective or cpsat_result.best_objective,
-    timed_out=ortools_result.timed_out or cpsat_result.timed_out,
-  )
-
-
-def build_relaxed_schedule(schedule: ScheduleInput, relax_level: int, diagnostics: Optional[Dict[str, Any]]) -> ScheduleInput:
-  relaxed = copy.deepcopy(schedule)
-  options = dict(getattr(relaxed, "options", {}) or {})
-  weights = dict(options.get("constraintWeights") or {})
-  decay = [0.8, 0.6, 0.4][min(relax_level, 2)]
-  for key in ("staffing", "teamBalance", "careerBalance", "offBalance", "shiftPattern"):
-    current = float(weights.get(key, 1.0))
-    weights[key] = max(0.2, current * decay)
-  options["constraintWeights"] = weights
-  csp = dict(options.get("cspSettings") or {})
-  base_off_tol = int(csp.get("offTolerance", 2))
-  base_max_shift = int(csp.get("maxSameShift", 2))
-  base_tabu = int(csp.get("tabuSize", 32))
-  base_time = int(csp.get("timeLimitMs", 4000))
-
-  if diagnostics:
-    if diagnostics.get("staffingShortages"):
-      csp["timeLimitMs"] = int(base_time * (1.5 + relax_level))
-    if diagnostics.get("offBalanceGaps"):
-      csp["offTolerance"] = base_off_tol + (2 + relax_level)
-    if diagnostics.get("shiftPatternBreaks"):
-      csp["maxSameShift"] = base_max_shift + 1 + relax_level
-    if diagnostics.get("specialRequestMisses"):
-      csp["tabuSize"] = max(8, base_tabu // (relax_level + 1))
-  csp.setdefault("offTolerance", base_off_tol + relax_level)
-  csp.setdefault("maxSameShift", base_max_shift + relax_level)
-  csp.setdefault("tabuSize", max(8, base_tabu // (relax_level + 1)))
-  csp["timeLimitMs"] = csp.get("timeLimitMs", base_time * (1.5 + relax_level))
-  options["cspSettings"] = csp
-  relaxed.options = options
-  return relaxed
-
-
-def _solve_single_attempt(
-  schedule: ScheduleInput, preferred_solver: Optional[str] = None, cancel_token: Optional[CancellationToken] = None
-) -> SolveResult:
-  env_solver = os.environ.get("MILP_DEFAULT_SOLVER", "ortools").lower()
-  solver_choice = (preferred_solver or env_solver or "ortools").lower()
-  if solver_choice not in {"ortools", "cpsat", "hybrid"}:
-    solver_choice = "ortools"
-
-  def run_cpsat(phase: str):
-    result = attempt_cpsat_schedule_run(schedule, phase, cancel_token)
-    result.diagnostics.setdefault("preflightIssues", []).append(
-      {
-        "type": "solverInfo",
-        "message": f"Schedule generated via CP-SAT ({phase}).",
-        "solver": "cpsat",
-      }
-    )
-    return result
-
-  def run_hybrid():
-    result = attempt_hybrid_schedule_run(schedule, "hybrid", cancel_token)
-    return result
-
-  if solver_choice == "cpsat":
-    try:
-      return run_cpsat("cpsat-primary")
-    except Exception as cpsat_error:
-      log_json("milp-error", {"phase": "cpsat-primary", "error": str(cpsat_error)})
-      if preferred_solver == "cpsat":
-        raise
-      solver_choice = "ortools"
-
-  if solver_choice == "hybrid":
-    try:
-      return run_hybrid()
-    except Exception as hybrid_error:
-      log_json("milp-error", {"phase": "hybrid", "error": str(hybrid_error)})
-      if preferred_solver == "hybrid":
-        raise
-      solver_choice = "ortools"
-
-  try:
-    return attempt_schedule_run(schedule, "primary", cancel_token)
-  except Exception as primary_error:
-    log_json("milp-error", {"phase": "primary", "error": str(primary_error)})
-    diagnostics_snapshot = getattr(primary_error, "diagnostics", None)
-    for level in range(3):
-      relaxed_schedule = build_relaxed_schedule(schedule, level, diagnostics_snapshot)
-      try:
-        result = attempt_schedule_run(relaxed_schedule, f"relaxed-{level+1}", cancel_token)
-        result.diagnostics.setdefault("preflightIssues", []).append(
-          {
-            "type": "fallbackRelaxation",
-            "message": f"Primary MILP run failed; applied relaxation level {level+1}.",
-            "level": level + 1,
-          }
-        )
-        relaxed_schedule = None
-        return result
-      except Exception as relaxed_error:
-        log_json("milp-error", {"phase": f"relaxed-{level+1}", "error": str(relaxed_error)})
-        diagnostics_snapshot = getattr(relaxed_error, "diagnostics", diagnostics_snapshot)
-      finally:
-        relaxed_schedule = None
-    if solver_choice in {"cpsat", "ortools"}:
-      try:
-        return run_cpsat("cpsat-fallback")
-      except Exception as cpsat_error:
-        log_json("milp-error", {"phase": "cpsat-fallback", "error": str(cpsat_error)})
-    raise
-
-
-def _apply_weight_jitter(schedule: ScheduleInput, jitter_fraction: float, rng: random.Random):
-  if jitter_fraction <= 0:
-    return
-  options = dict(getattr(schedule, "options", {}) or {})
-  weights = dict(options.get("constraintWeights") or {})
-  changed = False
-  for key in ("staffing", "teamBalance", "careerBalance", "offBalance"):
-    base_value = weights.get(key, 1.0)
+async def _persist_incumbents(job: InternalJobState, request_payload: Dict[str, Any], stop: asyncio.Event):
+  # Stops via the event rather than task cancellation so no write can land after the final state.
+  while True:
     try:
-      base_float = float(base_value)
-    except (TypeError, ValueError):
-      base_float = 1.0
-    offset = rng.uniform(-jitter_fraction, jitter_fraction)
-    weights[key] = max(0.1, base_float * (1.0 + offset))
-    changed = True
-  if changed:
-    options["constraintWeights"] = weights
-    schedule.options = options
-
-
-def _safe_float(value: Any, default: float = 0.0) -> float:
-  try:
-    return float(value)
-  except (TypeError, ValueError):
-    return default
-
-
-def _compute_solution_penalty(diagnostics: Optional[Dict[str, Any]]) -> float:
-  if not isinstance(diagnostics, dict):
-    return float("inf")
-  post = diagnostics.get("postprocess")
-  if isinstance(post, dict):
-    final_penalty = post.get("finalPenalty")
-    if isinstance(final_penalty, (int, float)):
-      return float(final_penalty)
-  penalty = 0.0
-  for shortage in diagnostics.get("staffingShortages", []):
-    penalty += 1000 * max(0.0, _safe_float(shortage.get("shortage", 0)))
-  for gap in diagnostics.get("teamCoverageGaps", []):
-    penalty += 400 * max(0.0, _safe_float(gap.get("shortage", 0)))
-  for gap in diagnostics.get("careerGroupCoverageGaps", []):
-    penalty += 350 * max(0.0, _safe_float(gap.get("shortage", 0)))
-  for gap in diagnostics.get("teamWorkloadGaps", []):
-    penalty += 200 * max(0.0, _safe_float(gap.get("difference", 0)))
-  for gap in diagnostics.get("offBalanceGaps", []):
-    penalty += 180 * max(0.0, _safe_float(gap.get("difference", 0)))
-  for issue in diagnostics.get("shiftPatternBreaks", []):
-    penalty += 120 * max(0.0, _safe_float(issue.get("excess", 0)))
-  penalty += 150 * len(diagnostics.get("specialRequestMisses", []) or [])
-  return penalty
-
-
-def solve_job(
-  schedule: ScheduleInput, preferred_solver: Optional[str] = None, cancel_token: Optional[CancellationToken] = None
-) -> SolveResult:
-  options = getattr(schedule, "options", {}) or {}
-  pattern_constraints = options.get("patternConstraints") or {}
-  try:
-    override_consecutive = int(pattern_constraints.get("maxConsecutiveDaysThreeShift", 0))
-  except (TypeError, ValueError):
-    override_consecutive = 0
-  if override_consecutive > 0:
-    for employee in schedule.employees:
-      work_pattern = getattr(employee, "workPatternType", "three-shift") or "three-shift"
-      if work_pattern == "three-shift":
-        employee.maxConsecutiveDaysPreferred = override_consecutive
-  multi_run: Dict[str, Any] = options.get("multiRun") or {}
-  try:
-    attempts = int(multi_run.get("attempts", 1))
-  except (ValueError, TypeError):
-    attempts = 1
-  attempts = max(1, min(10, attempts))
-  try:
-    jitter_pct = float(multi_run.get("weightJitterPct", 0.0))
-  except (ValueError, TypeError):
-    jitter_pct = 0.0
-  jitter_fraction = max(0.0, jitter_pct) / 100.0
-  try:
-    requested_seed = multi_run.get("seed")
-    seed_value = int(requested_seed) if requested_seed is not None else None
-  except (ValueError, TypeError):
-    seed_value = None
-  if seed_value is None:
-    seed_value = random.SystemRandom().randrange(1_000_000_000)
-  rng = random.Random(seed_value)
-  best_result: Optional[Dict[str, Any]] = None
-  last_error: Optional[Exception] = None
-
-  for attempt_index in range(attempts):
-    if cancel_token and getattr(cancel_token, "cancelled", False):
-      break
-    candidate = copy.deepcopy(schedule)
-    should_jitter = jitter_fraction > 0 and (attempts == 1 or attempt_index > 0)
-    if should_jitter:
-      _apply_weight_jitter(candidate, jitter_fraction, rng)
-    try:
-      result = _solve_single_attempt(candidate, preferred_solver, cancel_token)
-    except Exception as exc:
-      last_error = exc
-      candidate = None
-      continue
-    penalty = _compute_solution_penalty(result.diagnostics)
-    if best_result is None or penalty < best_result["penalty"]:
-      best_result = {
-        "result": result,
-        "penalty": penalty,
-        "attempt": attempt_index + 1,
-      }
-    candidate = None
-    if penalty <= 0 and result.status in {"optimal", "feasible"}:
-      break
-    if cancel_token and getattr(cancel_token, "cancelled", False):
-      break
-
-  if best_result:
-    result = best_result["result"]
-    diagnostics = result.diagnostics
-    if attempts > 1 or jitter_fraction > 0:
-      diagnostics.setdefault("preflightIssues", []).append(
-        {
-          "type": "multiRunSummary",
-          "message": f"MILP multi-run selected attempt {best_result['attempt']} / {attempts}",
-          "attempts": attempts,
-          "bestAttempt": best_result["attempt"],
-          "bestPenalty": best_result["penalty"],
-          "seed": seed_value,
-          "weightJitterPct": jitter_pct,
-        }
-      )
-    best_result = None
-    gc.collect()
-    return result
-
-  gc.collect()
-  if cancel_token and getattr(cancel_token, "cancelled", False):
-    raise SolverFailure(
-      "Solver cancelled",
-      diagnostics={"solverStatus": "cancelled"},
-    )
-  if last_error:
-    raise last_error
-  raise RuntimeError("MILP solver failed for all attempts")
+      await asyncio.wait_for(stop.wait(), timeout=INCUMBENT_PERSIST_SECONDS)
+      return
+    except asyncio.TimeoutError:
+      pass
+    if await asyncio.to_thread(job.refresh_incumbent, True):
+      await persist_job_state(job, request_payload)
 
 
 async def process_job(job: InternalJobState, payload: SchedulerJobRequest):
   schedule: Optional[ScheduleInput] = None
   solve_result: Optional[SolveResult] = None
+  stop_publishing = asyncio.Event()
+  publisher: Optional[asyncio.Task] = None
   try:
     job.mark_processing()
-    await persist_job_state(job, payload.model_dump())
+    request_payload = payload.model_dump()
+    await persist_job_state(job, request_payload)
+    job.events.enter_phase("parse")
     schedule = parse_schedule_input(payload.milpInput)
+    job.cancel_token.incumbent_sink = IncumbentSink(schedule, INCUMBENT_SNAPSHOT_INTERVAL_MS)
+    if UPSTASH_CLIENT and INCUMBENT_PERSIST_SECONDS > 0:
+      publisher = asyncio.create_task(_persist_incumbents(job, request_payload, stop_publishing))
     loop = asyncio.get_running_loop()
     start_time = time.perf_counter()
-    solve_result = await loop.run_in_executor(None, solve_job, schedule, payload.solver, job.cancel_token)
+    with track_inflight_job():
+      solve_result = await loop.run_in_executor(None, solve_job, schedule, payload.solver, job.cancel_token)
     elapsed = time.perf_counter() - start_time
+    job.events.enter_phase("serialize")
     result_payload = build_solver_result(
       schedule,
       solve_result.assignments,
@@ -915,6 +629,10 @@ async def process_job(job: InternalJobState, payload: SchedulerJobRequest):
         f"final_penalty={post_stats.get('finalPenalty')}"
       )
   except SolverFailure as exc:
+    if job.cancel_token.cancelled:
+      # Cancelled before any attempt returned; the last published incumbent stays on the job.
+      job.mark_cancelled()
+      return
     diag_obj = copy.deepcopy(getattr(exc, "diagnostics", None)) or {}
     guidance = _build_failure_guidance(diag_obj)
     diag_obj["guidance"] = guidance
@@ -928,13 +646,61 @@ async def process_job(job: InternalJobState, payload: SchedulerJobRequest):
   except Exception as exc:
     job.mark_failed(str(exc))
   finally:
+    stop_publishing.set()
+    if publisher:
+      await publisher
+    job.cancel_token.incumbent_sink = None
     await persist_job_state(job)
+    job.events.close({"status": job.status, "error": job.error})
     solve_result = None
     schedule = None
     asyncio.create_task(_cleanup_job_later(job.id))
     gc.collect()
 
 
+async def run_queued_job(job_id: str):
+  # Claimed off the Upstash queue, possibly by a different machine than the one that accepted it.
+  record = await fetch_job_record(job_id)
+  if not record:
+    logger.warning(f"[Upstash] queued job {job_id} has no record; skipping")
+    return
+  if record.get("status") != "queued":
+    # Cancelled (or already picked up) while it sat in the queue.
+    logger.info(f"[Upstash] queued job {job_id} is {record.get('status')}; skipping")
+    return
+  if not record.get("requestPayload"):
+    logger.warning(f"[Upstash] queued job {job_id} has no request payload; skipping")
+    return
+  try:
+    payload = SchedulerJobRequest(**record["requestPayload"])
+  except Exception as exc:
+    job = record_to_job(record)
+    job.mark_failed(f"Invalid queued request: {exc}")
+    await persist_job_state(job)
+    return
+  job = record_to_job(record)
+  jobs[job_id] = job
+  await process_job(job, payload)
+
+
+@app.post("/scheduler/preflight", response_model=SchedulerPreflightResponse)
+async def preflight(request: SchedulerPreflightRequest):
+  start_time = time.perf_counter()
+  try:
+    schedule = parse_schedule_input(request.milpInput)
+  except (KeyError, TypeError, ValueError) as exc:
+    raise HTTPException(status_code=400, detail=f"Invalid milpInput: {exc}")
+  issues = run_preflight_checks(schedule)
+  blocking = blocking_issues(schedule, issues)
+  return SchedulerPreflightResponse(
+    feasible=not blocking,
+    issues=issues,
+    blockingIssues=blocking,
+    guidance=_build_failure_guidance({"preflightIssues": issues}),
+    elapsedMs=int((time.perf_counter() - start_time) * 1000),
+  )
+
+
 @app.post("/scheduler/jobs", response_model=SchedulerJobResponse)
 async def enqueue_job(request: SchedulerJobRequest):
   if "milpInput" not in request.model_dump():
@@ -943,14 +709,15 @@ async def enqueue_job(request: SchedulerJobRequest):
   job_id = str(uuid4())
   job = InternalJobState(job_id)
   job.request_payload = request.model_dump()
-  jobs[job_id] = job
 
   if UPSTASH_CLIENT:
     enqueued = await enqueue_upstash_job(job, job.request_payload)
     if enqueued:
+      # Any machine's consumer may claim it; until one does, the Upstash record is the only state.
       return SchedulerJobResponse(jobId=job_id)
     # fall back to local processing if enqueue fails
 
+  jobs[job_id] = job
   asyncio.create_task(process_job(job, request))
   return SchedulerJobResponse(jobId=job_id)
 
@@ -967,17 +734,94 @@ async def get_job_status(job_id: str):
   raise HTTPException(status_code=404, detail="Job not found")
 
 
-@app.post("/scheduler/jobs/{job_id}/cancel", response_model=SchedulerJobStatus)
-async def cancel_job(job_id: str):
+def _sse(event: str, data: Dict[str, Any]) -> str:
+  return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _status_event(job: InternalJobState) -> Dict[str, Any]:
+  incumbent = job.incumbent or {}
+  return {
+    "status": job.status,
+    "updatedAt": job.updated_at,
+    "incumbentObjective": incumbent.get("objective"),
+    "incumbentVersion": incumbent.get("version"),
+  }
+
+
+async def _local_job_events(job: InternalJobState):
+  # Subscribe before checking the status so a completion in between is still seen.
+  queue = job.events.subscribe()
+  try:
+    yield _sse("status", _status_event(job))
+    if job.status in TERMINAL_JOB_STATUSES:
+      yield _sse("done", {"status": job.status, "error": job.error})
+      return
+    if job.events.phase:
+      yield _sse("phase", job.events.phase)
+    while True:
+      try:
+        item = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+      except asyncio.TimeoutError:
+        yield ": keepalive\n\n"
+        continue
+      if item is None:
+        return
+      event, data = item
+      yield _sse(event, data)
+  finally:
+    job.events.unsubscribe(queue)
+
+
+async def _remote_job_events(job_id: str, record: Dict[str, Any]):
+  # Solved by another worker: only its persisted record is visible, so follow that at the persist rate.
+  last: Optional[Dict[str, Any]] = None
+  while record:
+    job = record_to_job(record)
+    status = _status_event(job)
+    if status != last:
+      yield _sse("status", status)
+      last = status
+    if job.status in TERMINAL_JOB_STATUSES:
+      yield _sse("done", {"status": job.status, "error": job.error})
+      return
+    await asyncio.sleep(max(1.0, INCUMBENT_PERSIST_SECONDS))
+    record = await fetch_job_record(job_id)
+
+
+@app.get("/scheduler/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
   job = jobs.get(job_id)
-  if not job:
+  if job:
+    stream = _local_job_events(job)
+  else:
     record = await fetch_job_record(job_id)
     if not record:
       raise HTTPException(status_code=404, detail="Job not found")
-    job = record_to_job(record)
+    stream = _remote_job_events(job_id, record)
+  return StreamingResponse(
+    stream,
+    media_type="text/event-stream",
+    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+  )
 
-  job.request_cancel()
+
+@app.post("/scheduler/jobs/{job_id}/cancel", response_model=SchedulerJobStatus)
+async def cancel_job(job_id: str):
+  job = jobs.get(job_id)
+  if job:
+    job.request_cancel()
+    if job.status == 'queued':
+      job.mark_cancelled(job.result)
+    await persist_job_state(job, job.request_payload)
+    return job.to_response()
+
+  record = await fetch_job_record(job_id)
+  if not record:
+    raise HTTPException(status_code=404, detail="Job not found")
+  job = record_to_job(record)
+  # Not running here: only a job still waiting in the queue can be cancelled from this machine.
+  # Anything else belongs to the consumer that claimed it, and its record must not be overwritten.
   if job.status == 'queued':
     job.mark_cancelled(job.result)
-  await persist_job_state(job)
+    await persist_job_state(job, job.request_payload)
   return job.to_response()
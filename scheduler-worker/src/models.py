@@ -86,6 +86,20 @@ class AliasMaps:
   careerGroupAliasMap: Dict[str, str]
 
 
+@dataclass
+class WarmStartAssignment:
+  employeeId: str
+  date: str
+  shiftType: Optional[str] = None
+  shiftId: Optional[str] = None
+
+
+@dataclass
+class WarmStart:
+  assignments: List[WarmStartAssignment]
+  hard: bool = False
+
+
 @dataclass
 class ScheduleInput:
   departmentId: str
@@ -103,6 +117,7 @@ class ScheduleInput:
   careerGroups: Optional[List[CareerGroup]] = None
   aliasMaps: Optional[AliasMaps] = None
   options: Optional[Dict[str, Any]] = None
+  warmStart: Optional[WarmStart] = None
 
 
 @dataclass
@@ -144,6 +159,22 @@ def parse_schedule_input(payload: dict) -> ScheduleInput:
     AliasMaps(**payload["aliasMaps"]) if payload.get("aliasMaps") else None
   )
   options = payload.get("options")
+  warm_start = None
+  if payload.get("warmStart"):
+    raw_warm_start = payload["warmStart"]
+    warm_start = WarmStart(
+      assignments=[
+        WarmStartAssignment(
+          employeeId=item["employeeId"],
+          date=str(item["date"])[:10],
+          shiftType=item.get("shiftType"),
+          shiftId=item.get("shiftId"),
+        )
+        for item in raw_warm_start.get("assignments", [])
+        if item.get("employeeId") and item.get("date")
+      ],
+      hard=bool(raw_warm_start.get("hard", False)),
+    )
 
   return ScheduleInput(
     departmentId=payload["departmentId"],
@@ -161,4 +192,5 @@ def parse_schedule_input(payload: dict) -> ScheduleInput:
     careerGroups=career_groups,
     aliasMaps=alias_maps,
     options=options,
+    warmStart=warm_start,
   )
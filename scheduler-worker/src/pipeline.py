@@ -0,0 +1,1174 @@
+import copy
+import gc
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+CURRENT_DIR = Path(__file__).resolve().parent
+if str(CURRENT_DIR) not in sys.path:
+  sys.path.append(str(CURRENT_DIR))
+
+from models import Assignment, ScheduleInput  # noqa: E402
+from solver.ortools_solver import solve_with_ortools  # noqa: E402
+from solver.cpsat_solver import solve_with_cpsat  # noqa: E402
+from solver.model_ir import get_model_ir  # noqa: E402
+from solver.decomposition import (  # noqa: E402
+  build_coordination_schedule,
+  build_subproblem,
+  decomposition_settings,
+  find_repair_days,
+  plan_clusters,
+  should_decompose,
+)
+from solver.rolling_horizon import (  # noqa: E402
+  build_window_schedule,
+  history_days,
+  period_off_targets,
+  plan_windows,
+  rolling_horizon_settings,
+  should_roll,
+)
+from solver.postprocessor import SchedulePostProcessor  # noqa: E402
+from solver.preflight import blocking_issues, off_day_slack, run_preflight_checks  # noqa: E402
+from solver.incumbents import publish_incumbent  # noqa: E402
+from solver.progress import enter_phase, job_events, postprocess_progress  # noqa: E402
+from solver.search_params import available_cores, inflight_jobs  # noqa: E402
+from solver.exceptions import SolverFailure  # noqa: E402
+from solver.types import CANCEL_POLL_SECONDS, CancellationToken, SolveResult  # noqa: E402
+
+LOG_DIR = Path(os.environ.get("MILP_LOG_DIR", CURRENT_DIR / "logs"))
+# After a user cancel or the multi-run deadline, pool attempts get this long to hand back a result before the pool is terminated.
+CANCEL_GRACE_SECONDS = 0.5
+# Pool workers forward at most one incumbent per attempt this often (the last one is always sent).
+FORWARD_INCUMBENT_SECONDS = 0.5
+# Relaxation ladder depth; build_relaxed_schedule saturates at its last level.
+RELAXATION_LEVELS = 3
+# A hybrid CP-SAT search is only restarted from CBC's incumbent with at least this much time left.
+HYBRID_RESEED_MIN_MS = 1000
+
+
+def log_json(prefix: str, payload: Dict[str, Any]) -> Optional[str]:
+  try:
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+    path = LOG_DIR / f"{prefix}-{timestamp}.json"
+    with path.open("w", encoding="utf-8") as file:
+      json.dump(payload, file, ensure_ascii=False, indent=2, default=str)
+    return str(path)
+  except Exception:
+    return None
+
+
+def serialize_assignments(assignments: list[Assignment]) -> list[Dict[str, Any]]:
+  serialized = []
+  for assignment in assignments:
+    serialized.append(
+      {
+        "employeeId": assignment.employeeId,
+        "date": assignment.date,
+        "shiftId": assignment.shiftId,
+        "shiftType": assignment.shiftType,
+        "isLocked": assignment.isLocked,
+      }
+  )
+  return serialized
+
+
+def serialize_schedule(schedule: ScheduleInput) -> Dict[str, Any]:
+  return asdict(schedule)
+
+
+def attempt_schedule_run(
+  schedule: ScheduleInput, label: str, cancel_token: Optional[CancellationToken] = None
+) -> SolveResult:
+  start = time.perf_counter()
+  log_json(f"{label}-milp-input", serialize_schedule(schedule))
+  enter_phase(cancel_token, "solve", label=label, engine="ortools")
+  solver_result = solve_with_ortools(schedule, cancel_token)
+  enter_phase(cancel_token, "postprocess", label=label)
+  postprocessor = SchedulePostProcessor(
+    schedule,
+    solver_result.assignments,
+    solver_result.diagnostics,
+    getattr(schedule, "options", None),
+    progress=postprocess_progress(cancel_token, label),
+    cancel_token=cancel_token,
+  )
+  assignments, diagnostics = postprocessor.run()
+  log_json(
+    f"{label}-milp-output",
+    {
+      "diagnostics": diagnostics,
+      "assignments": serialize_assignments(assignments),
+    },
+  )
+  postprocessor = None
+  solver_meta = {
+    "solverStatus": solver_result.diagnostics.get("solverStatus", solver_result.status),
+    "solverTimedOut": solver_result.diagnostics.get("solverTimedOut", solver_result.timed_out),
+    "solverWallTimeMs": solver_result.diagnostics.get("solverWallTimeMs"),
+    "solverRawStatus": solver_result.diagnostics.get("solverRawStatus"),
+    "model": solver_result.diagnostics.get("model"),
+    "lowering": solver_result.diagnostics.get("lowering"),
+    "modelCache": solver_result.diagnostics.get("modelCache"),
+  }
+  for key, value in solver_meta.items():
+    if value is not None:
+      diagnostics.setdefault(key, value)
+  elapsed_ms = int((time.perf_counter() - start) * 1000)
+  return SolveResult(
+    assignments=assignments,
+    diagnostics=diagnostics,
+    status=solver_result.status,
+    solve_time_ms=elapsed_ms,
+    best_objective=solver_result.best_objective,
+    timed_out=solver_result.timed_out,
+  )
+
+
+def attempt_cpsat_schedule_run(
+  schedule: ScheduleInput, label: str, cancel_token: Optional[CancellationToken] = None
+) -> SolveResult:
+  start = time.perf_counter()
+  log_json(f"{label}-milp-input", serialize_schedule(schedule))
+  enter_phase(cancel_token, "solve", label=label, engine="cpsat")
+  solver_result = solve_with_cpsat(schedule, cancel_token)
+  enter_phase(cancel_token, "postprocess", label=label)
+  postprocessor = SchedulePostProcessor(
+    schedule,
+    solver_result.assignments,
+    solver_result.diagnostics,
+    getattr(schedule, "options", None),
+    progress=postprocess_progress(cancel_token, label),
+    cancel_token=cancel_token,
+  )
+  assignments, diagnostics = postprocessor.run()
+  log_json(
+    f"{label}-milp-output",
+    {
+      "diagnostics": diagnostics,
+      "assignments": serialize_assignments(assignments),
+    },
+  )
+  postprocessor = None
+  solver_meta = {
+    "solverStatus": solver_result.diagnostics.get("solverStatus", solver_result.status),
+    "solverTimedOut": solver_result.diagnostics.get("solverTimedOut", solver_result.timed_out),
+    "solverWallTimeMs": solver_result.diagnostics.get("solverWallTimeMs"),
+    "solverRawStatus": solver_result.diagnostics.get("solverRawStatus"),
+    "model": solver_result.diagnostics.get("model"),
+    "lowering": solver_result.diagnostics.get("lowering"),
+    "modelCache": solver_result.diagnostics.get("modelCache"),
+    "searchParameters": solver_result.diagnostics.get("searchParameters"),
+  }
+  for key, value in solver_meta.items():
+    if value is not None:
+      diagnostics.setdefault(key, value)
+  elapsed_ms = int((time.perf_counter() - start) * 1000)
+  return SolveResult(
+    assignments=assignments,
+    diagnostics=diagnostics,
+    status=solver_result.status,
+    solve_time_ms=elapsed_ms,
+    best_objective=solver_result.best_objective,
+    timed_out=solver_result.timed_out,
+  )
+
+
+class EngineCancellationToken:
+  """Cancels one portfolio engine without touching the job-level token.
+
+  It is also the engine's incumbent sink: it remembers the engine's best
+  objective so far and forwards every offer to the job's sink.
+  """
+
+  def __init__(self, parent: Optional[CancellationToken] = None):
+    self.parent = parent
+    self.stopped = False
+    # Set by the race to stop the current search and restart it from another engine's incumbent.
+    self.reseed: Optional[List[int]] = None
+    self.best_objective: Optional[float] = None
+    self.best_active: Optional[Callable[[], List[int]]] = None
+
+  @property
+  def cancelled(self) -> bool:
+    return self.stopped or self.reseed is not None or bool(getattr(self.parent, "cancelled", False))
+
+  @property
+  def incumbent_sink(self):
+    return self
+
+  def offer(self, model_ir, active, objective, engine) -> Optional[int]:
+    if objective is not None and (self.best_objective is None or objective < self.best_objective):
+      self.best_objective = objective
+      self.best_active = active
+    sink = getattr(self.parent, "incumbent_sink", None)
+    return sink.offer(model_ir, active, objective, engine) if sink is not None else None
+
+  @property
+  def events(self):
+    return getattr(self.parent, "events", None)
+
+
+def _hybrid_settings(options: Dict[str, Any]) -> Dict[str, Optional[float]]:
+  hybrid_options = options.get("hybrid") or {}
+  target_gap = _safe_float(hybrid_options.get("targetGap"), 0.0)
+  target_penalty = _safe_float(hybrid_options.get("targetPenalty"), 0.0)
+  cbc_time_share = _safe_float(hybrid_options.get("cbcTimeShare"), 0.5)
+  return {
+    "targetGap": target_gap if target_gap > 0 else None,
+    "targetPenalty": max(0.0, target_penalty),
+    "cbcTimeShare": cbc_time_share if 0 < cbc_time_share <= 1 else 0.5,
+  }
+
+
+def attempt_hybrid_schedule_run(
+  schedule: ScheduleInput, label: str, cancel_token: Optional[CancellationToken] = None
+) -> SolveResult:
+  # CBC is single-threaded, so CP-SAT gets this job's core share minus one.
+  # pywraplp's CBC neither takes hints nor reports incumbents mid-solve, so
+  # sharing only goes one way: CBC gets cbcTimeShare of the budget, and when it
+  # returns first while CP-SAT has no incumbent yet, CP-SAT restarts from CBC's
+  # solution as a hint for the rest of its time limit. (Once CP-SAT has one,
+  # objectives are not comparable across engines: rounding and integral slacks
+  # score the same schedule differently.)
+  start = time.perf_counter()
+  options = dict(getattr(schedule, "options", {}) or {})
+  settings = _hybrid_settings(options)
+  budget_ms = _safe_float(options.get("maxSolveTimeMs"), 0.0) or _safe_float(
+    os.environ.get("MILP_SOLVE_TIMEOUT_MS"), 300000.0
+  )
+
+  def remaining_ms() -> int:
+    return int(budget_ms - (time.perf_counter() - start) * 1000)
+
+  cpsat_settings = dict(options.get("cpsatSettings") or {})
+  cpsat_settings.setdefault("numWorkers", max(1, available_cores() // inflight_jobs() - 1))
+  if settings["targetGap"] is not None:
+    cpsat_settings.setdefault("relativeGapLimit", settings["targetGap"])
+  cpsat_schedule = copy.copy(schedule)
+  cpsat_schedule.options = dict(options, cpsatSettings=cpsat_settings)
+  cbc_schedule = copy.copy(schedule)
+  cbc_schedule.options = dict(options, maxSolveTimeMs=max(1, int(budget_ms * settings["cbcTimeShare"])))
+
+  tokens = {
+    "cpsat": EngineCancellationToken(cancel_token),
+    "ortools": EngineCancellationToken(cancel_token),
+  }
+
+  def run_cpsat() -> SolveResult:
+    token = tokens["cpsat"]
+    engine_schedule = cpsat_schedule
+    while True:
+      try:
+        result = attempt_cpsat_schedule_run(engine_schedule, f"{label}-cpsat", token)
+      except SolverFailure:
+        if token.reseed is None or token.stopped or getattr(cancel_token, "cancelled", False):
+          raise
+      if token.reseed is None or token.stopped or getattr(cancel_token, "cancelled", False):
+        return result
+      engine_schedule = copy.copy(cpsat_schedule)
+      engine_schedule._incumbent_hint = token.reseed
+      engine_schedule.options = dict(cpsat_schedule.options, maxSolveTimeMs=max(1, remaining_ms()))
+      token.reseed = None
+
+  runners = {
+    "cpsat": run_cpsat,
+    "ortools": lambda: attempt_schedule_run(cbc_schedule, f"{label}-ortools", tokens["ortools"]),
+  }
+  results: Dict[str, SolveResult] = {}
+  errors: Dict[str, Exception] = {}
+  engines: Dict[str, Dict[str, Any]] = {}
+  winner: Optional[str] = None
+  reason = "bestPenalty"
+  with ThreadPoolExecutor(max_workers=len(runners), thread_name_prefix="hybrid") as pool:
+    futures = {pool.submit(runner): engine for engine, runner in runners.items()}
+    cpsat_future = next(future for future, engine in futures.items() if engine == "cpsat")
+    pending = set(futures)
+    while pending:
+      done, pending = wait(pending, return_when=FIRST_COMPLETED)
+      for future in done:
+        engine = futures[future]
+        try:
+          result = future.result()
+        except Exception as exc:
+          errors[engine] = exc
+          if tokens[engine].stopped:
+            engines.setdefault(engine, {})["status"] = "cancelled"
+          else:
+            engines.setdefault(engine, {}).update(status="error", error=str(exc))
+            log_json("milp-error", {"phase": f"{label}-{engine}", "error": str(exc)})
+          continue
+        penalty = _compute_solution_penalty(result.diagnostics)
+        results[engine] = result
+        engines.setdefault(engine, {}).update(
+          status=result.status,
+          penalty=penalty,
+          solveTimeMs=result.solve_time_ms,
+          bestObjective=result.best_objective,
+        )
+        if winner is None and not tokens[engine].stopped and not getattr(cancel_token, "cancelled", False):
+          if result.status == "optimal":
+            # CP-SAT reports OPTIMAL once relative_gap_limit is met.
+            winner = engine
+            reason = "targetGap" if engine == "cpsat" and settings["targetGap"] is not None else "optimal"
+          elif penalty <= settings["targetPenalty"] and result.status in {"feasible", "timeout"}:
+            winner, reason = engine, "targetPenalty"
+        cpsat_token = tokens["cpsat"]
+        if (
+          winner is None
+          and engine == "ortools"
+          and tokens["ortools"].best_active is not None
+          and not cpsat_future.done()
+          and not cpsat_token.cancelled
+          and remaining_ms() >= HYBRID_RESEED_MIN_MS
+          and cpsat_token.best_objective is None
+        ):
+          # CBC's raw incumbent, not its postprocessed schedule: that one satisfies the model rows.
+          cpsat_token.reseed = tokens["ortools"].best_active()
+          engines.setdefault("cpsat", {}).update(seededFrom="ortools", seedObjective=tokens["ortools"].best_objective)
+        if winner is not None:
+          for other, token in tokens.items():
+            if other != winner and other not in results and other not in errors:
+              token.stopped = True
+              engines.setdefault(other, {})["cancelledBy"] = winner
+
+  if winner is None:
+    if not results:
+      raise errors.get("ortools") or errors.get("cpsat") or RuntimeError("Hybrid solver produced no result")
+    winner = min(results, key=lambda engine: engines[engine]["penalty"])
+    reason = "bestPenalty" if len(results) > 1 else "onlyResult"
+  result = results[winner]
+  diagnostics = result.diagnostics
+  diagnostics.setdefault("preflightIssues", []).append(
+    {
+      "type": "solverInfo",
+      "message": f"Hybrid solver: {winner} won the CP-SAT/OR-Tools race ({reason}).",
+      "solver": "hybrid",
+    }
+  )
+  diagnostics["hybrid"] = {
+    "winner": winner,
+    "reason": reason,
+    "targetGap": settings["targetGap"],
+    "targetPenalty": settings["targetPenalty"],
+    "cbcTimeShare": settings["cbcTimeShare"],
+    "engines": engines,
+  }
+  return SolveResult(
+    assignments=result.assignments,
+    diagnostics=diagnostics,
+    status=result.status,
+    solve_time_ms=max(entry.solve_time_ms for entry in results.values()),
+    best_objective=result.best_objective,
+    timed_out=result.timed_out,
+  )
+
+
+def _solve_subproblem(subproblem: ScheduleInput, engine: str, cancel_token: Optional[CancellationToken]) -> SolveResult:
+  if engine == "cpsat":
+    return solve_with_cpsat(subproblem, cancel_token)
+  return solve_with_ortools(subproblem, cancel_token)
+
+
+def attempt_decomposed_schedule_run(
+  schedule: ScheduleInput,
+  label: str,
+  cancel_token: Optional[CancellationToken] = None,
+  preferred_solver: Optional[str] = None,
+) -> SolveResult:
+  # Team clusters are solved as independent subproblems with their share of the
+  # staffing requirement; a coordination solve on the full model then reopens
+  # only the days where the merged result breaks cross-team rows.
+  start = time.perf_counter()
+  settings = decomposition_settings(schedule)
+  model_ir = get_model_ir(schedule)
+  clusters = plan_clusters(model_ir, settings["maxClusterSize"])
+  if len(clusters) < 2:
+    raise SolverFailure("Decomposition needs at least two team clusters", diagnostics={"clusters": len(clusters)})
+  engine = "cpsat" if preferred_solver == "cpsat" else "ortools"
+  run_coordination = attempt_cpsat_schedule_run if engine == "cpsat" else attempt_schedule_run
+  options = getattr(schedule, "options", {}) or {}
+  total_ms = _safe_float(options.get("maxSolveTimeMs"), 0.0) or _safe_float(
+    os.environ.get("MILP_SOLVE_TIMEOUT_MS", "300000"), 300000.0
+  )
+  subproblem_ms = total_ms * settings["subproblemTimeRatio"]
+  workers = min(len(clusters), max(1, available_cores() // inflight_jobs()))
+  # Clusters beyond the worker count queue up, so each wave gets a slice of the budget.
+  waves = -(-len(clusters) // workers)
+  subproblems = []
+  for cluster in clusters:
+    subproblem = build_subproblem(schedule, cluster, subproblem_ms / waves)
+    cpsat_settings = dict(subproblem.options.get("cpsatSettings") or {})
+    cpsat_settings.setdefault("numWorkers", max(1, available_cores() // inflight_jobs() // workers))
+    subproblem.options["cpsatSettings"] = cpsat_settings
+    subproblems.append(subproblem)
+
+  merged: List[Assignment] = []
+  cluster_reports: List[Dict[str, Any]] = []
+  # Both backends release the GIL while solving, so threads are enough here.
+  enter_phase(cancel_token, "solve", label=label, engine=engine, clusters=len(clusters))
+  with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decomposition") as pool:
+    futures = [pool.submit(_solve_subproblem, subproblem, engine, cancel_token) for subproblem in subproblems]
+    for cluster, future in zip(clusters, futures):
+      report: Dict[str, Any] = {
+        "teams": [team_id or None for team_id in cluster.team_ids],
+        "employees": len(cluster.employees),
+        "peakRequiredStaff": cluster.required,
+      }
+      try:
+        result = future.result()
+        merged.extend(result.assignments)
+        report.update({"status": result.status, "solveTimeMs": result.solve_time_ms})
+      except Exception as exc:
+        # Staff of a failed cluster are simply left unseeded for the coordination solve.
+        report.update({"status": "error", "error": str(exc)})
+        log_json("milp-error", {"phase": f"{label}-subproblem", "teams": cluster.team_ids, "error": str(exc)})
+      cluster_reports.append(report)
+  subproblems = []
+  if getattr(cancel_token, "cancelled", False):
+    raise SolverFailure("Solver cancelled", diagnostics={"solverStatus": "cancelled"})
+
+  repair_days = find_repair_days(model_ir, merged, settings["repairRadius"])
+  remaining_ms = max(1000.0, total_ms - (time.perf_counter() - start) * 1000)
+  coordination = "repair"
+  try:
+    coordination_schedule = build_coordination_schedule(schedule, merged, repair_days, remaining_ms, hard=True)
+    result = run_coordination(coordination_schedule, f"{label}-coordination", cancel_token)
+    if result.status in {"infeasible", "error"}:
+      raise SolverFailure("Coordination could not repair the merged schedule", diagnostics=result.diagnostics)
+  except Exception as exc:
+    if getattr(cancel_token, "cancelled", False):
+      raise
+    # Fixed neighbours can leave the reopened days infeasible; re-solve the full
+    # model seeded with the merged schedule (soft hints, which CBC ignores).
+    log_json("milp-error", {"phase": f"{label}-coordination", "error": str(exc)})
+    coordination = "hint"
+    remaining_ms = max(1000.0, total_ms - (time.perf_counter() - start) * 1000)
+    coordination_schedule = build_coordination_schedule(schedule, merged, repair_days, remaining_ms, hard=False)
+    result = run_coordination(coordination_schedule, f"{label}-coordination-hint", cancel_token)
+  coordination_schedule = None
+
+  diagnostics = result.diagnostics
+  diagnostics.setdefault("preflightIssues", []).append(
+    {
+      "type": "solverInfo",
+      "message": f"Schedule generated via team decomposition ({len(clusters)} clusters, {len(repair_days)} repair days).",
+      "solver": engine,
+    }
+  )
+  diagnostics["decomposition"] = {
+    "clusters": cluster_reports,
+    "parallelWorkers": workers,
+    "subproblemTimeMs": int(subproblem_ms),
+    "repairDays": sorted(repair_days),
+    "coordination": coordination,
+  }
+  return SolveResult(
+    assignments=result.assignments,
+    diagnostics=diagnostics,
+    status=result.status,
+    solve_time_ms=int((time.perf_counter() - start) * 1000),
+    best_objective=result.best_objective,
+    timed_out=result.timed_out,
+  )
+
+
+def attempt_rolling_schedule_run(
+  schedule: ScheduleInput,
+  label: str,
+  cancel_token: Optional[CancellationToken] = None,
+  preferred_solver: Optional[str] = None,
+) -> SolveResult:
+  # Long periods are solved as overlapping windows in date order. Each window sees
+  # the last committed days pinned in front of it, so streak, repeat and night-rest
+  # rows carry across the boundary; the stitched period is then re-checked (and
+  # polished) by the postprocessor against period-wide targets.
+  start = time.perf_counter()
+  settings = rolling_horizon_settings(schedule)
+  windows = plan_windows(schedule.startDate, schedule.endDate, settings["windowDays"], settings["overlapDays"])
+  history_length = history_days(schedule, settings["overlapDays"])
+  engine = "cpsat" if preferred_solver == "cpsat" else "ortools"
+  options = getattr(schedule, "options", {}) or {}
+  total_ms = _safe_float(options.get("maxSolveTimeMs"), 0.0) or _safe_float(
+    os.environ.get("MILP_SOLVE_TIMEOUT_MS", "300000"), 300000.0
+  )
+  off_targets = period_off_targets(get_model_ir(schedule))
+  committed: List[Assignment] = []
+  committed_off: Dict[str, int] = {}
+  window_reports: List[Dict[str, Any]] = []
+  for index, window in enumerate(windows):
+    if getattr(cancel_token, "cancelled", False):
+      raise SolverFailure("Solver cancelled", diagnostics={"solverStatus": "cancelled"})
+    history_start = (window.start - timedelta(days=history_length)).isoformat()
+    history = [item for item in committed if item.date >= history_start]
+    remaining_ms = total_ms - (time.perf_counter() - start) * 1000
+    window_ms = remaining_ms / (len(windows) - index)
+    enter_phase(cancel_token, "solve", label=label, engine=engine, window=index + 1, windows=len(windows))
+    carried = True
+    try:
+      window_schedule = build_window_schedule(schedule, window, history, off_targets, committed_off, window_ms)
+      result = _solve_subproblem(window_schedule, engine, cancel_token)
+    except SolverFailure:
+      if getattr(cancel_token, "cancelled", False):
+        raise
+      # Owed off days can collide with the pinned history; retry on weekends alone.
+      carried = False
+      window_schedule = build_window_schedule(schedule, window, history, {}, committed_off, window_ms)
+      try:
+        result = _solve_subproblem(window_schedule, engine, cancel_token)
+      except SolverFailure as exc:
+        raise SolverFailure(
+          f"Rolling horizon window {window.start.isoformat()}..{window.end.isoformat()} failed: {exc}",
+          diagnostics=getattr(exc, "diagnostics", None),
+        ) from exc
+    window_schedule = None
+    commit_end = window.commit_end.isoformat()
+    first_day = window.start.isoformat()
+    kept = [item for item in result.assignments if first_day <= item.date <= commit_end]
+    for item in kept:
+      if item.shiftType.upper() in {"O", "V"}:
+        committed_off[item.employeeId] = committed_off.get(item.employeeId, 0) + 1
+    committed.extend(kept)
+    window_reports.append(
+      {
+        "start": first_day,
+        "end": window.end.isoformat(),
+        "commitEnd": commit_end,
+        "status": result.status,
+        "solveTimeMs": result.solve_time_ms,
+        "carriedOffTargets": carried,
+      }
+    )
+
+  enter_phase(cancel_token, "postprocess", label=label)
+  postprocessor = SchedulePostProcessor(
+    schedule,
+    committed,
+    {"preflightIssues": list(get_model_ir(schedule).preflight_issues)},
+    getattr(schedule, "options", None),
+    progress=postprocess_progress(cancel_token, label),
+    cancel_token=cancel_token,
+  )
+  assignments, diagnostics = postprocessor.run()
+  postprocessor = None
+  log_json(
+    f"{label}-milp-output",
+    {
+      "diagnostics": diagnostics,
+      "assignments": serialize_assignments(assignments),
+    },
+  )
+  statuses = {report["status"] for report in window_reports}
+  status = "optimal" if statuses == {"optimal"} else "feasible"
+  diagnostics.setdefault("preflightIssues", []).append(
+    {
+      "type": "solverInfo",
+      "message": f"Schedule generated via rolling horizon ({len(windows)} windows of {settings['windowDays']} days).",
+      "solver": engine,
+    }
+  )
+  diagnostics["solverStatus"] = status
+  diagnostics["rollingHorizon"] = {
+    "windowDays": settings["windowDays"],
+    "overlapDays": settings["overlapDays"],
+    "historyDays": history_length,
+    "windows": window_reports,
+  }
+  return SolveResult(
+    assignments=assignments,
+    diagnostics=diagnostics,
+    status=status,
+    solve_time_ms=int((time.perf_counter() - start) * 1000),
+    best_objective=None,
+    timed_out=any(report["status"] == "timeout" for report in window_reports),
+  )
+
+
+def build_relaxed_schedule(schedule: ScheduleInput, relax_level: int, diagnostics: Optional[Dict[str, Any]]) -> ScheduleInput:
+  relaxed = copy.deepcopy(schedule)
+  options = dict(getattr(relaxed, "options", {}) or {})
+  weights = dict(options.get("constraintWeights") or {})
+  decay = [0.8, 0.6, 0.4][min(relax_level, 2)]
+  for key in ("staffing", "teamBalance", "careerBalance", "offBalance", "shiftPattern"):
+    current = float(weights.get(key, 1.0))
+    weights[key] = max(0.2, current * decay)
+  options["constraintWeights"] = weights
+  csp = dict(options.get("cspSettings") or {})
+  base_off_tol = int(csp.get("offTolerance", 2))
+  base_max_shift = int(csp.get("maxSameShift", 2))
+  base_tabu = int(csp.get("tabuSize", 32))
+  base_time = int(csp.get("timeLimitMs", 4000))
+
+  if diagnostics:
+    if diagnostics.get("staffingShortages"):
+      csp["timeLimitMs"] = int(base_time * (1.5 + relax_level))
+    if diagnostics.get("offBalanceGaps") or diagnostics.get("blockingIssues"):
+      csp["offTolerance"] = base_off_tol + (2 + relax_level)
+    if diagnostics.get("shiftPatternBreaks"):
+      csp["maxSameShift"] = base_max_shift + 1 + relax_level
+    if diagnostics.get("specialRequestMisses"):
+      csp["tabuSize"] = max(8, base_tabu // (relax_level + 1))
+  csp.setdefault("offTolerance", base_off_tol + relax_level)
+  csp.setdefault("maxSameShift", base_max_shift + relax_level)
+  csp.setdefault("tabuSize", max(8, base_tabu // (relax_level + 1)))
+  csp["timeLimitMs"] = csp.get("timeLimitMs", base_time * (1.5 + relax_level))
+  options["cspSettings"] = csp
+  relaxed.options = options
+  return relaxed
+
+
+def blocking_relax_level(schedule: ScheduleInput, blocking: List[Dict[str, Any]]) -> Optional[int]:
+  """First relaxation level whose widened off-day slack clears every blocking issue.
+
+  Only off-day targets longer than the period can be relaxed away; staffing
+  shortfalls (and night-intensive off-day targets) are hard at every level.
+  """
+  employee_map = {emp.id: emp for emp in schedule.employees}
+  for level in range(RELAXATION_LEVELS):
+    relaxed = build_relaxed_schedule(schedule, level, {"blockingIssues": blocking})
+    slack = off_day_slack(relaxed.options.get("cspSettings") or {})
+    cleared = True
+    for issue in blocking:
+      emp = employee_map.get(issue.get("employeeId"))
+      if (
+        issue.get("type") != "offRequirementImpossible"
+        or emp is None
+        or emp.workPatternType == "night-intensive"
+        or issue["requiredOffDays"] - slack > issue["availableDays"]
+      ):
+        cleared = False
+        break
+    if cleared:
+      return level
+  return None
+
+
+def _run_relaxation_ladder(
+  schedule: ScheduleInput,
+  start_level: int,
+  diagnostics_snapshot: Optional[Dict[str, Any]],
+  message: str,
+  cancel_token: Optional[CancellationToken] = None,
+) -> Optional[SolveResult]:
+  for level in range(start_level, RELAXATION_LEVELS):
+    relaxed_schedule = build_relaxed_schedule(schedule, level, diagnostics_snapshot)
+    try:
+      result = attempt_schedule_run(relaxed_schedule, f"relaxed-{level+1}", cancel_token)
+      result.diagnostics.setdefault("preflightIssues", []).append(
+        {
+          "type": "fallbackRelaxation",
+          "message": f"{message}; applied relaxation level {level+1}.",
+          "level": level + 1,
+        }
+      )
+      relaxed_schedule = None
+      return result
+    except Exception as relaxed_error:
+      log_json("milp-error", {"phase": f"relaxed-{level+1}", "error": str(relaxed_error)})
+      if getattr(cancel_token, "cancelled", False):
+        raise
+      diagnostics_snapshot = getattr(relaxed_error, "diagnostics", diagnostics_snapshot)
+    finally:
+      relaxed_schedule = None
+  return None
+
+
+def _solve_single_attempt(
+  schedule: ScheduleInput, preferred_solver: Optional[str] = None, cancel_token: Optional[CancellationToken] = None
+) -> SolveResult:
+  env_solver = os.environ.get("MILP_DEFAULT_SOLVER", "ortools").lower()
+  solver_choice = (preferred_solver or env_solver or "ortools").lower()
+  if solver_choice not in {"ortools", "cpsat", "hybrid"}:
+    solver_choice = "ortools"
+
+  def run_cpsat(phase: str):
+    result = attempt_cpsat_schedule_run(schedule, phase, cancel_token)
+    result.diagnostics.setdefault("preflightIssues", []).append(
+      {
+        "type": "solverInfo",
+        "message": f"Schedule generated via CP-SAT ({phase}).",
+        "solver": "cpsat",
+      }
+    )
+    return result
+
+  def run_hybrid():
+    result = attempt_hybrid_schedule_run(schedule, "hybrid", cancel_token)
+    return result
+
+  relax_from = getattr(schedule, "_relax_from", None)
+  if relax_from is not None:
+    # Preflight proved the schedule's own settings infeasible; start at the level that clears it.
+    blocking = {"blockingIssues": getattr(schedule, "_blocking_issues", [])}
+    result = _run_relaxation_ladder(
+      schedule, relax_from, blocking, "Preflight found off-day targets the period cannot hold", cancel_token
+    )
+    if result is None:
+      raise SolverFailure(
+        "Relaxed schedules failed after preflight",
+        diagnostics=dict(blocking, solverStatus="infeasible"),
+      )
+    return result
+
+  if should_roll(schedule, rolling_horizon_settings(schedule)) and solver_choice != "hybrid":
+    try:
+      return attempt_rolling_schedule_run(schedule, "rolling", cancel_token, solver_choice)
+    except Exception as rolling_error:
+      log_json("milp-error", {"phase": "rolling", "error": str(rolling_error)})
+      if getattr(cancel_token, "cancelled", False):
+        raise
+
+  if should_decompose(schedule, decomposition_settings(schedule)) and solver_choice != "hybrid":
+    try:
+      return attempt_decomposed_schedule_run(schedule, "decomposed", cancel_token, solver_choice)
+    except Exception as decomposition_error:
+      log_json("milp-error", {"phase": "decomposed", "error": str(decomposition_error)})
+      if getattr(cancel_token, "cancelled", False):
+        raise
+
+  if solver_choice == "cpsat":
+    try:
+      return run_cpsat("cpsat-primary")
+    except Exception as cpsat_error:
+      log_json("milp-error", {"phase": "cpsat-primary", "error": str(cpsat_error)})
+      if preferred_solver == "cpsat" or getattr(cancel_token, "cancelled", False):
+        raise
+      solver_choice = "ortools"
+
+  if solver_choice == "hybrid":
+    try:
+      return run_hybrid()
+    except Exception as hybrid_error:
+      log_json("milp-error", {"phase": "hybrid", "error": str(hybrid_error)})
+      if preferred_solver == "hybrid" or getattr(cancel_token, "cancelled", False):
+        raise
+      solver_choice = "ortools"
+
+  try:
+    return attempt_schedule_run(schedule, "primary", cancel_token)
+  except Exception as primary_error:
+    log_json("milp-error", {"phase": "primary", "error": str(primary_error)})
+    if getattr(cancel_token, "cancelled", False):
+      raise
+    result = _run_relaxation_ladder(
+      schedule, 0, getattr(primary_error, "diagnostics", None), "Primary MILP run failed", cancel_token
+    )
+    if result is not None:
+      return result
+    if solver_choice in {"cpsat", "ortools"}:
+      try:
+        return run_cpsat("cpsat-fallback")
+      except Exception as cpsat_error:
+        log_json("milp-error", {"phase": "cpsat-fallback", "error": str(cpsat_error)})
+    raise
+
+
+def _apply_weight_jitter(schedule: ScheduleInput, jitter_fraction: float, rng: random.Random):
+  if jitter_fraction <= 0:
+    return
+  options = dict(getattr(schedule, "options", {}) or {})
+  weights = dict(options.get("constraintWeights") or {})
+  changed = False
+  for key in ("staffing", "teamBalance", "careerBalance", "offBalance"):
+    base_value = weights.get(key, 1.0)
+    try:
+      base_float = float(base_value)
+    except (TypeError, ValueError):
+      base_float = 1.0
+    offset = rng.uniform(-jitter_fraction, jitter_fraction)
+    weights[key] = max(0.1, base_float * (1.0 + offset))
+    changed = True
+  if changed:
+    options["constraintWeights"] = weights
+    schedule.options = options
+
+
+def _safe_float(value: Any, default: float = 0.0) -> float:
+  try:
+    return float(value)
+  except (TypeError, ValueError):
+    return default
+
+
+def _compute_solution_penalty(diagnostics: Optional[Dict[str, Any]]) -> float:
+  if not isinstance(diagnostics, dict):
+    return float("inf")
+  post = diagnostics.get("postprocess")
+  if isinstance(post, dict):
+    final_penalty = post.get("finalPenalty")
+    if isinstance(final_penalty, (int, float)):
+      return float(final_penalty)
+  penalty = 0.0
+  for shortage in diagnostics.get("staffingShortages", []):
+    penalty += 1000 * max(0.0, _safe_float(shortage.get("shortage", 0)))
+  for gap in diagnostics.get("teamCoverageGaps", []):
+    penalty += 400 * max(0.0, _safe_float(gap.get("shortage", 0)))
+  for gap in diagnostics.get("careerGroupCoverageGaps", []):
+    penalty += 350 * max(0.0, _safe_float(gap.get("shortage", 0)))
+  for gap in diagnostics.get("teamWorkloadGaps", []):
+    penalty += 200 * max(0.0, _safe_float(gap.get("difference", 0)))
+  for gap in diagnostics.get("offBalanceGaps", []):
+    penalty += 180 * max(0.0, _safe_float(gap.get("difference", 0)))
+  for issue in diagnostics.get("shiftPatternBreaks", []):
+    penalty += 120 * max(0.0, _safe_float(issue.get("excess", 0)))
+  penalty += 150 * len(diagnostics.get("specialRequestMisses", []) or [])
+  return penalty
+
+
+def _weight_key(schedule: ScheduleInput) -> Tuple[Tuple[str, str], ...]:
+  weights = (getattr(schedule, "options", {}) or {}).get("constraintWeights") or {}
+  return tuple(sorted((str(key), repr(value)) for key, value in weights.items()))
+
+
+class DeadlineCancellationToken:
+  """Job token that also trips once the multi-run deadline has passed."""
+
+  def __init__(self, parent: Optional[CancellationToken], deadline: Optional[float]):
+    self.parent = parent
+    self.deadline = deadline
+
+  @property
+  def cancelled(self) -> bool:
+    if getattr(self.parent, "cancelled", False):
+      return True
+    return self.deadline is not None and time.perf_counter() >= self.deadline
+
+  @property
+  def incumbent_sink(self):
+    return getattr(self.parent, "incumbent_sink", None)
+
+  @property
+  def events(self):
+    return getattr(self.parent, "events", None)
+
+
+class EventCancellationToken:
+  """Cancellation token for pool workers, backed by a shared multiprocessing event.
+
+  With a ``progress`` queue it is also the attempt's incumbent sink and event
+  bus: both are forwarded to the parent, which republishes them on the job.
+  Incumbents are throttled to one per ``FORWARD_INCUMBENT_SECONDS``; the last
+  one is flushed when the attempt ends.
+  """
+
+  def __init__(self, event, progress=None, attempt_index: int = 0, schedule: Optional[ScheduleInput] = None):
+    self.event = event
+    self.progress = progress
+    self.attempt_index = attempt_index
+    self.shape = (schedule.startDate, schedule.endDate, len(schedule.employees)) if schedule else None
+    self._pending: Optional[Tuple[Callable[[], List[int]], Optional[float], str]] = None
+    self._sent_at = 0.0
+
+  @property
+  def cancelled(self) -> bool:
+    return self.event.is_set()
+
+  @property
+  def incumbent_sink(self):
+    return self if self.progress is not None else None
+
+  @property
+  def events(self):
+    return self if self.progress is not None else None
+
+  def offer(self, model_ir, active, objective, engine) -> Optional[int]:
+    schedule = model_ir.schedule
+    if (schedule.startDate, schedule.endDate, len(schedule.employees)) != self.shape:
+      return None
+    self._pending = (active, objective, engine)
+    if time.perf_counter() - self._sent_at >= FORWARD_INCUMBENT_SECONDS:
+      self.flush()
+    # The parent emits the job's "incumbent" event when it republishes.
+    return None
+
+  def flush(self):
+    if self._pending is None:
+      return
+    active, objective, engine = self._pending
+    self._pending = None
+    self._sent_at = time.perf_counter()
+    self.progress.put(("incumbent", self.attempt_index, (active(), objective, engine)))
+
+  def emit(self, event: str, data: Any):
+    payload = data() if callable(data) else data
+    self.progress.put(("event", self.attempt_index, (event, dict(payload, attempt=self.attempt_index + 1))))
+
+  def enter_phase(self, phase: str, **details: Any):
+    self.progress.put(("phase", self.attempt_index, (phase, dict(details, attempt=self.attempt_index + 1))))
+
+
+_ATTEMPT_STOP_EVENT = None
+_ATTEMPT_PROGRESS = None
+
+
+def _init_attempt_worker(stop_event, progress=None):
+  global _ATTEMPT_STOP_EVENT, _ATTEMPT_PROGRESS
+  _ATTEMPT_STOP_EVENT = stop_event
+  _ATTEMPT_PROGRESS = progress
+
+
+def _run_attempt_in_worker(
+  schedule: ScheduleInput, preferred_solver: Optional[str], attempt_index: int = 0
+) -> SolveResult:
+  token = (
+    EventCancellationToken(_ATTEMPT_STOP_EVENT, _ATTEMPT_PROGRESS, attempt_index, schedule)
+    if _ATTEMPT_STOP_EVENT is not None
+    else None
+  )
+  if token and token.cancelled:
+    raise SolverFailure("Solver cancelled", diagnostics={"solverStatus": "cancelled"})
+  try:
+    return _solve_single_attempt(schedule, preferred_solver, token)
+  finally:
+    if token and token.progress is not None:
+      token.flush()
+
+
+def _forward_attempt_progress(progress, cancel_token: Optional[CancellationToken], model_ir):
+  # Republish what pool workers reported; jittered attempts share the job's IR layout.
+  events = job_events(cancel_token)
+  while True:
+    try:
+      kind, _attempt_index, body = progress.get_nowait()
+    except queue.Empty:
+      return
+    if kind == "incumbent":
+      active, objective, engine = body
+      publish_incumbent(cancel_token, model_ir, lambda active=active: active, objective, engine)
+    elif events is not None and kind == "phase":
+      phase, details = body
+      events.enter_phase(phase, **details)
+    elif events is not None:
+      event, data = body
+      events.emit(event, data)
+
+
+def _run_attempts_inline(
+  candidates: List[Tuple[int, ScheduleInput]],
+  preferred_solver: Optional[str],
+  cancel_token: Optional[CancellationToken],
+  deadline: Optional[float],
+) -> Iterator[Tuple[int, Any]]:
+  token = DeadlineCancellationToken(cancel_token, deadline)
+  for attempt_index, candidate in candidates:
+    if token.cancelled:
+      break
+    try:
+      yield attempt_index, _solve_single_attempt(candidate, preferred_solver, cancel_token if deadline is None else token)
+    except Exception as exc:
+      yield attempt_index, exc
+
+
+def _run_attempts_in_pool(
+  candidates: List[Tuple[int, ScheduleInput]],
+  preferred_solver: Optional[str],
+  cancel_token: Optional[CancellationToken],
+  deadline: Optional[float],
+  workers: int,
+) -> Iterator[Tuple[int, Any]]:
+  # spawn, not fork: the API process runs event-loop, executor and solver threads.
+  context = multiprocessing.get_context("spawn")
+  stop_event = context.Event()
+  forwarding = getattr(cancel_token, "incumbent_sink", None) is not None or job_events(cancel_token) is not None
+  progress = context.Queue() if forwarding else None
+  model_ir = get_model_ir(candidates[0][1]) if forwarding else None
+  cpsat_share = max(1, available_cores() // inflight_jobs() // workers)
+  outcomes: "queue.Queue[Tuple[int, Any]]" = queue.Queue()
+  pool = context.Pool(processes=workers, initializer=_init_attempt_worker, initargs=(stop_event, progress))
+  try:
+    for attempt_index, candidate in candidates:
+      options = dict(getattr(candidate, "options", {}) or {})
+      cpsat_settings = dict(options.get("cpsatSettings") or {})
+      cpsat_settings.setdefault("numWorkers", cpsat_share)
+      options["cpsatSettings"] = cpsat_settings
+      candidate.options = options
+      pool.apply_async(
+        _run_attempt_in_worker,
+        (candidate, preferred_solver, attempt_index),
+        callback=lambda result, index=attempt_index: outcomes.put((index, result)),
+        error_callback=lambda exc, index=attempt_index: outcomes.put((index, exc)),
+      )
+    remaining = len(candidates)
+    received = 0
+    stopped_at: Optional[float] = None
+    while remaining:
+      try:
+        attempt_index, outcome = outcomes.get(timeout=CANCEL_POLL_SECONDS)
+      except queue.Empty:
+        attempt_index, outcome = None, None
+      if progress is not None:
+        _forward_attempt_progress(progress, cancel_token, model_ir)
+      if attempt_index is not None:
+        remaining -= 1
+        received += 1
+        yield attempt_index, outcome
+      if getattr(cancel_token, "cancelled", False) or (deadline is not None and time.perf_counter() >= deadline):
+        # Running attempts stop and hand back their incumbents; once one result
+        # is in hand the stragglers (CBC root work, postprocessing) are not awaited.
+        stop_event.set()
+        if received:
+          break
+        # Neither a user cancel nor the deadline waits on CBC (which ignores interrupts) past the grace period.
+        stopped_at = stopped_at or time.perf_counter()
+        if time.perf_counter() - stopped_at >= CANCEL_GRACE_SECONDS:
+          break
+  finally:
+    stop_event.set()
+    pool.terminate()
+    if progress is not None:
+      # Incumbents flushed by attempts that finished as the pool went down.
+      _forward_attempt_progress(progress, cancel_token, model_ir)
+      progress.close()
+
+
+def solve_job(
+  schedule: ScheduleInput, preferred_solver: Optional[str] = None, cancel_token: Optional[CancellationToken] = None
+) -> SolveResult:
+  options = getattr(schedule, "options", {}) or {}
+  pattern_constraints = options.get("patternConstraints") or {}
+  try:
+    override_consecutive = int(pattern_constraints.get("maxConsecutiveDaysThreeShift", 0))
+  except (TypeError, ValueError):
+    override_consecutive = 0
+  if override_consecutive > 0:
+    for employee in schedule.employees:
+      work_pattern = getattr(employee, "workPatternType", "three-shift") or "three-shift"
+      if work_pattern == "three-shift":
+        employee.maxConsecutiveDaysPreferred = override_consecutive
+  enter_phase(cancel_token, "preflight")
+  preflight_issues = run_preflight_checks(schedule)
+  blocking = blocking_issues(schedule, preflight_issues)
+  relax_from = blocking_relax_level(schedule, blocking) if blocking else None
+  if blocking and relax_from is None:
+    # No relaxation level or fallback engine can satisfy these rows; fail before holding a worker.
+    log_json("milp-error", {"phase": "preflight", "blockingIssues": blocking})
+    raise SolverFailure(
+      "Preflight checks prove the schedule infeasible",
+      diagnostics={"preflightIssues": preflight_issues, "blockingIssues": blocking, "solverStatus": "infeasible"},
+    )
+  if blocking:
+    # Every attempt skips the primary model and starts the relaxation ladder at this level.
+    log_json("milp-error", {"phase": "preflight", "blockingIssues": blocking, "relaxFrom": relax_from + 1})
+    schedule._relax_from = relax_from
+    schedule._blocking_issues = blocking
+  enter_phase(cancel_token, "build")
+  try:
+    # Built on the base schedule so every deep-copied attempt shares it; relaxed attempts build their own.
+    if relax_from is None:
+      get_model_ir(schedule)
+  except Exception as exc:
+    log_json("milp-error", {"phase": "model-ir", "error": str(exc)})
+  multi_run: Dict[str, Any] = options.get("multiRun") or {}
+  try:
+    attempts = int(multi_run.get("attempts", 1))
+  except (ValueError, TypeError):
+    attempts = 1
+  attempts = max(1, min(10, attempts))
+  try:
+    jitter_pct = float(multi_run.get("weightJitterPct", 0.0))
+  except (ValueError, TypeError):
+    jitter_pct = 0.0
+  jitter_fraction = max(0.0, jitter_pct) / 100.0
+  try:
+    requested_seed = multi_run.get("seed")
+    seed_value = int(requested_seed) if requested_seed is not None else None
+  except (ValueError, TypeError):
+    seed_value = None
+  if seed_value is None:
+    seed_value = random.SystemRandom().randrange(1_000_000_000)
+  rng = random.Random(seed_value)
+  deadline_ms = _safe_float(multi_run.get("deadlineMs"), 0.0)
+  deadline = time.perf_counter() + deadline_ms / 1000.0 if deadline_ms > 0 else None
+  best_result: Optional[Dict[str, Any]] = None
+  last_error: Optional[Exception] = None
+
+  candidates: List[Tuple[int, ScheduleInput]] = []
+  seen_weights = set()
+  for attempt_index in range(attempts):
+    candidate = copy.deepcopy(schedule)
+    should_jitter = jitter_fraction > 0 and (attempts == 1 or attempt_index > 0)
+    if should_jitter:
+      _apply_weight_jitter(candidate, jitter_fraction, rng)
+    weight_key = _weight_key(candidate)
+    if weight_key in seen_weights:
+      # Same weights means the same model and objective; the solve would repeat itself.
+      continue
+    seen_weights.add(weight_key)
+    candidates.append((attempt_index, candidate))
+
+  workers = min(len(candidates), max(1, available_cores() // inflight_jobs()))
+  if workers > 1:
+    outcomes = _run_attempts_in_pool(candidates, preferred_solver, cancel_token, deadline, workers)
+  else:
+    outcomes = _run_attempts_inline(candidates, preferred_solver, cancel_token, deadline)
+  completed = 0
+  for attempt_index, outcome in outcomes:
+    if isinstance(outcome, Exception):
+      last_error = outcome
+      continue
+    completed += 1
+    penalty = _compute_solution_penalty(outcome.diagnostics)
+    if (
+      best_result is None
+      or penalty < best_result["penalty"]
+      or (penalty == best_result["penalty"] and attempt_index + 1 < best_result["attempt"])
+    ):
+      best_result = {
+        "result": outcome,
+        "penalty": penalty,
+        "attempt": attempt_index + 1,
+      }
+    if penalty <= 0 and outcome.status in {"optimal", "feasible"}:
+      break
+  outcomes.close()
+  candidates = []
+
+  if best_result:
+    result = best_result["result"]
+    diagnostics = result.diagnostics
+    if attempts > 1 or jitter_fraction > 0:
+      diagnostics.setdefault("preflightIssues", []).append(
+        {
+          "type": "multiRunSummary",
+          "message": f"MILP multi-run selected attempt {best_result['attempt']} / {attempts}",
+          "attempts": attempts,
+          "bestAttempt": best_result["attempt"],
+          "bestPenalty": best_result["penalty"],
+          "seed": seed_value,
+          "weightJitterPct": jitter_pct,
+          "uniqueAttempts": len(seen_weights),
+          "completedAttempts": completed,
+          "parallelWorkers": workers,
+        }
+      )
+    best_result = None
+    gc.collect()
+    return result
+
+  gc.collect()
+  if cancel_token and getattr(cancel_token, "cancelled", False):
+    raise SolverFailure(
+      "Solver cancelled",
+      diagnostics={"solverStatus": "cancelled"},
+    )
+  last_status = (getattr(last_error, "diagnostics", None) or {}).get("solverStatus")
+  stopped_by_deadline = last_error is None or last_status == "cancelled"
+  if deadline is not None and time.perf_counter() >= deadline and stopped_by_deadline:
+    # Attempts the deadline stopped report themselves cancelled; the job was not.
+    raise SolverFailure(
+      "Multi-run deadline passed before any attempt returned",
+      diagnostics={"solverStatus": "timeout", "deadlineMs": deadline_ms},
+    )
+  if last_error:
+    raise last_error
+  raise RuntimeError("MILP solver failed for all attempts")
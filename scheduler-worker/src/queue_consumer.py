@@ -0,0 +1,87 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional, Set
+
+from loguru import logger
+
+from solver.search_params import available_cores
+
+
+def consumer_concurrency(override: int = 0, cores_per_job: int = 2) -> int:
+  """Jobs one worker machine runs at once: an explicit override, else its core budget."""
+  if override > 0:
+    return override
+  return max(1, available_cores() // max(1, cores_per_job))
+
+
+class QueueConsumer:
+  """Claims job ids from an Upstash list and runs up to ``concurrency`` of them at once.
+
+  ``LPOP`` is the claim, so any number of worker machines can share one queue.
+  Polling backs off from ``min_delay`` to ``max_delay`` while the queue is empty
+  (or Upstash is failing) and snaps back after every claim.
+  """
+
+  def __init__(
+    self,
+    client: Any,
+    queue_key: str,
+    handler: Callable[[str], Awaitable[None]],
+    concurrency: int,
+    min_delay: float = 0.25,
+    max_delay: float = 5.0,
+  ):
+    self.client = client
+    self.queue_key = queue_key
+    self.handler = handler
+    self.concurrency = max(1, concurrency)
+    self.min_delay = min_delay
+    self.max_delay = max(min_delay, max_delay)
+    self.delay = min_delay
+    self.running: Set[asyncio.Task] = set()
+    self._slots = asyncio.Semaphore(self.concurrency)
+    self._task: Optional[asyncio.Task] = None
+
+  def start(self):
+    if self._task is None:
+      self._task = asyncio.create_task(self._run())
+
+  async def stop(self):
+    # Only stops claiming; jobs already running finish (or die with the process).
+    if self._task is not None:
+      self._task.cancel()
+      await asyncio.gather(self._task, return_exceptions=True)
+      self._task = None
+
+  async def _claim(self) -> Optional[str]:
+    job_id = await asyncio.to_thread(self.client.lpop, self.queue_key)
+    if isinstance(job_id, bytes):
+      job_id = job_id.decode()
+    return job_id or None
+
+  async def _run_job(self, job_id: str):
+    try:
+      await self.handler(job_id)
+    except Exception as exc:  # pragma: no cover - handlers record their own failures
+      logger.warning(f"[Upstash] queued job {job_id} crashed: {exc}")
+    finally:
+      self._slots.release()
+
+  async def _run(self):
+    while True:
+      # Hold a slot before claiming so a claimed id never waits behind a full worker.
+      await self._slots.acquire()
+      try:
+        job_id = await self._claim()
+      except Exception as exc:
+        logger.warning(f"[Upstash] queue poll failed: {exc}")
+        job_id = None
+        self.delay = self.max_delay
+      if job_id is None:
+        self._slots.release()
+        await asyncio.sleep(self.delay)
+        self.delay = min(self.max_delay, self.delay * 2)
+        continue
+      self.delay = self.min_delay
+      task = asyncio.create_task(self._run_job(job_id))
+      self.running.add(task)
+      task.add_done_callback(self.running.discard)
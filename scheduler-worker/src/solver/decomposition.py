@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import copy
+import re
+from dataclasses import dataclass, field, replace
+from datetime import date, timedelta
+from typing import Any, Dict, List, Set
+
+from models import Assignment, Employee, ScheduleInput, WarmStart, WarmStartAssignment
+from solver.model_ir import INF, ScheduleModelIR
+
+# Rows that tie teams together; the coordination pass reopens the days where the
+# merged subproblem solutions break them.
+_COUPLING_ROW_PREFIXES = ("staff_", "team_cover_", "career_cover_")
+_DAY_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def decomposition_settings(schedule: ScheduleInput) -> Dict[str, Any]:
+  options = getattr(schedule, "options", {}) or {}
+  raw = options.get("decomposition") or {}
+  if not isinstance(raw, dict):
+    raw = {"enabled": raw}
+
+  def _number(key: str, default: float) -> float:
+    try:
+      return float(raw.get(key, default))
+    except (TypeError, ValueError):
+      return default
+
+  return {
+    "enabled": raw.get("enabled", "auto"),
+    "minEmployees": int(_number("minEmployees", 80)),
+    "maxClusterSize": max(1, int(_number("maxClusterSize", 40))),
+    "subproblemTimeRatio": min(0.95, max(0.1, _number("subproblemTimeRatio", 0.6))),
+    "repairRadius": max(0, int(_number("repairRadius", 1))),
+  }
+
+
+def should_decompose(schedule: ScheduleInput, settings: Dict[str, Any]) -> bool:
+  enabled = settings.get("enabled")
+  if enabled is False or enabled == "off":
+    return False
+  if enabled is True or enabled == "on":
+    return True
+  return len(schedule.employees) >= settings["minEmployees"]
+
+
+@dataclass
+class TeamCluster:
+  team_ids: List[str]
+  employees: List[Employee] = field(default_factory=list)
+  required: Dict[str, int] = field(default_factory=dict)
+  required_by_date: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+
+def plan_clusters(model_ir: ScheduleModelIR, max_cluster_size: int) -> List[TeamCluster]:
+  """Packs whole teams into clusters of at most ``max_cluster_size`` staff (first-fit decreasing).
+
+  Staff without a team travel together as one extra group. A team larger than the
+  limit gets a cluster of its own; teams are never split.
+  """
+  groups = [(team_id, list(model_ir.team_members_map.get(team_id, []))) for team_id in model_ir.team_ids]
+  teamless = [emp for emp in model_ir.schedule.employees if not emp.teamId]
+  if teamless:
+    groups.append(("", teamless))
+  groups.sort(key=lambda item: (-len(item[1]), item[0]))
+  clusters: List[TeamCluster] = []
+  for team_id, members in groups:
+    target = next((cluster for cluster in clusters if len(cluster.employees) + len(members) <= max_cluster_size), None)
+    if target is None:
+      target = TeamCluster(team_ids=[])
+      clusters.append(target)
+    target.team_ids.append(team_id)
+    target.employees.extend(members)
+  _apportion_requirements(model_ir, clusters)
+  return clusters
+
+
+def _apportion_requirements(model_ir: ScheduleModelIR, clusters: List[TeamCluster]):
+  # Each day's requirement is dealt out one seat at a time to the cluster furthest
+  # behind its running quota (its share of eligible staff), so every day sums back
+  # to the department requirement and each cluster's workload over the horizon
+  # stays within one shift of proportional. Uniform integer shares would leave
+  # some clusters short of work and push their staff past the off-day cap.
+  for code in model_ir.required_staff_map:
+    quota = [0.0] * len(clusters)
+    dealt = [0] * len(clusters)
+    for day in model_ir.date_range:
+      day_key = day.isoformat()
+      required = model_ir.staffing_requirements.get((day_key, code), 0)
+      capacity = [sum(1 for emp in cluster.employees if model_ir._is_shift_allowed(emp, day, code)) for cluster in clusters]
+      total = sum(capacity)
+      shares = [0] * len(clusters)
+      if required and total:
+        for idx, cap in enumerate(capacity):
+          quota[idx] += required * cap / total
+        for _ in range(min(required, total)):
+          idx = max(
+            (idx for idx in range(len(clusters)) if shares[idx] < capacity[idx]),
+            key=lambda idx: quota[idx] - dealt[idx],
+          )
+          shares[idx] += 1
+          dealt[idx] += 1
+      for cluster, share in zip(clusters, shares):
+        cluster.required_by_date.setdefault(day_key, {})[code] = share
+        cluster.required[code] = max(cluster.required.get(code, 0), share)
+
+
+def build_subproblem(schedule: ScheduleInput, cluster: TeamCluster, max_solve_time_ms: int) -> ScheduleInput:
+  member_ids = {emp.id for emp in cluster.employees}
+  options = dict(getattr(schedule, "options", {}) or {})
+  for key in ("decomposition", "multiRun", "hybrid"):
+    options.pop(key, None)
+  options["maxSolveTimeMs"] = max(1000, int(max_solve_time_ms))
+  options["requiredStaffByDate"] = cluster.required_by_date
+  daily_cfg = dict(options.get("dailyStaffingBalance") or {})
+  if daily_cfg.get("targetMode") == "manual" and isinstance(daily_cfg.get("targetValue"), (int, float)):
+    daily_cfg["targetValue"] = daily_cfg["targetValue"] * len(member_ids) / max(1, len(schedule.employees))
+    options["dailyStaffingBalance"] = daily_cfg
+  warm_start = getattr(schedule, "warmStart", None)
+  if warm_start:
+    warm_start = WarmStart(
+      assignments=[item for item in warm_start.assignments if item.employeeId in member_ids], hard=warm_start.hard
+    )
+  subproblem = replace(
+    schedule,
+    employees=[copy.deepcopy(emp) for emp in cluster.employees],
+    # Department-wide min/max staff would be enforced in every cluster; the daily shares replace them.
+    shifts=[replace(shift, minStaff=None, maxStaff=None) for shift in schedule.shifts],
+    specialRequests=[req for req in (schedule.specialRequests or []) if req.employeeId in member_ids],
+    requiredStaffPerShift=dict(cluster.required),
+    options=options,
+    warmStart=warm_start,
+  )
+  return subproblem
+
+
+def find_repair_days(model_ir: ScheduleModelIR, assignments: List[Assignment], radius: int) -> Set[str]:
+  """Days (plus ``radius`` neighbours inside the period) whose coupling rows the merged schedule violates."""
+  active: Set[int] = set()
+  for assignment in assignments:
+    idx = model_ir.variables.get((assignment.employeeId, assignment.date, assignment.shiftType.upper()))
+    if idx is not None:
+      active.add(idx)
+  violated: Set[date] = set()
+  for indices, coefs, lb, ub, name in zip(
+    model_ir.row_indices, model_ir.row_coefs, model_ir.row_lb, model_ir.row_ub, model_ir.row_names
+  ):
+    if not name.startswith(_COUPLING_ROW_PREFIXES):
+      continue
+    # Coverage slacks are ignored: a row that needs its slack counts as broken.
+    total = sum(
+      coef for idx, coef in zip(indices, coefs) if idx < model_ir.num_assignment_vars and idx in active
+    )
+    if total < lb or (ub != INF and total > ub):
+      match = _DAY_PATTERN.search(name)
+      if match:
+        violated.add(date.fromisoformat(match.group(0)))
+  period = {day.isoformat() for day in model_ir.date_range}
+  days: Set[str] = set()
+  for day in violated:
+    for offset in range(-radius, radius + 1):
+      days.add((day + timedelta(days=offset)).isoformat())
+  return days & period
+
+
+def build_coordination_schedule(
+  schedule: ScheduleInput, assignments: List[Assignment], repair_days: Set[str], max_solve_time_ms: int, hard: bool
+) -> ScheduleInput:
+  """Full schedule seeded with the merged solution; hard seeds leave only ``repair_days`` open."""
+  coordination = copy.deepcopy(schedule)
+  options = dict(getattr(coordination, "options", {}) or {})
+  for key in ("decomposition", "multiRun", "hybrid"):
+    options.pop(key, None)
+  options["maxSolveTimeMs"] = max(1000, int(max_solve_time_ms))
+  coordination.options = options
+  coordination.warmStart = WarmStart(
+    assignments=[
+      WarmStartAssignment(employeeId=item.employeeId, date=item.date, shiftType=item.shiftType)
+      for item in assignments
+      if not hard or item.date not in repair_days
+    ],
+    hard=hard,
+  )
+  return coordination
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+  from solver.postprocessor import SchedulePostProcessor
+
+IGNORE_SHIFT_CODES = {"O", "V"}
+OFF_COUNT_CODES = {"O", "V"}
+NON_WORKLOAD_CODES = {"O", "A", "V"}
+
+
+class DeltaEvaluator:
+  """Incremental mirror of SchedulePostProcessor._collect_diagnostics.
+
+  Keeps per-day, per-employee and per-team counters over the schedule's cell
+  matrix so the penalty of a swap can be scored by touching only the two
+  swapped cells.
+  """
+
+  def __init__(self, processor: "SchedulePostProcessor"):
+    self.processor = processor
+    self.state = processor.state
+    self.num_days = self.state.num_days
+    self.codes = self.state.codes
+    self.slot_codes = self.state.slot_codes
+    self.required_staff = processor.required_staff
+    self.core_codes = list(processor.core_shift_codes)
+    self.max_same_shift = processor.max_same_shift
+    self.avoid_patterns = processor.avoid_patterns
+    self.off_tolerance = processor.off_balance_tolerance
+    self.team_tolerance = processor.team_workload_tolerance
+    self.shift_balance_tolerance = processor.shift_balance_tolerance
+    self.off_like_codes = processor.off_like_codes
+    self.daily_enabled = bool(processor.daily_balance_config.get("enabled", True))
+    self.daily_tolerance = float(processor.daily_balance_config.get("tolerance", 0))
+    self.daily_targets = processor.daily_targets
+    self.weights = {
+      key: processor._weight(key)
+      for key in ("staffing", "teamBalance", "careerBalance", "offBalance", "shiftPattern", "dailyBalance")
+    }
+    self.employee_teams = processor.employee_teams
+    self.employee_aliases = processor.employee_aliases
+    self.team_member_indices = processor.team_member_indices
+    self.shift_balance_employees: Set[int] = {
+      emp_idx
+      for emp_idx, employee_id in enumerate(self.state.employee_ids)
+      if self.state.employee_map[employee_id].workPatternType == "three-shift"
+    }
+    self.team_coverage_terms: Set[Tuple[int, str, str]] = {
+      (day_idx, code, team_id) for (day_idx, code), teams in processor.coverage_teams.items() for team_id in teams
+    }
+    self.career_coverage_terms: Set[Tuple[int, str, str]] = {
+      (day_idx, code, alias) for (day_idx, code), aliases in processor.coverage_aliases.items() for alias in aliases
+    }
+    self.requests_by_cell: Dict[int, List[str]] = defaultdict(list)
+    self.static_request_misses = 0
+    for _, _, shift, cell, missed in processor.special_requests:
+      if cell is None:
+        self.static_request_misses += int(missed)
+      else:
+        self.requests_by_cell[cell].append(shift)
+    self.rebuild()
+
+  def rebuild(self):
+    processor = self.processor
+    employee_ids = self.state.employee_ids
+    self.shift_counts: Counter[Tuple[int, str]] = Counter(processor.fixed_shift_counts)
+    self.team_counts: Counter[Tuple[int, str, str]] = Counter(processor.fixed_team_counts)
+    self.career_counts: Counter[Tuple[int, str, str]] = Counter(processor.fixed_alias_counts)
+    self.off_counts: List[int] = [processor.fixed_off_counts.get(employee_id, 0) for employee_id in employee_ids]
+    self.workloads: Counter[str] = Counter(processor.fixed_workloads)
+    self.daily_actuals: List[int] = list(processor.fixed_daily_actuals)
+    self.core_counts: Dict[int, Counter[str]] = {emp_idx: Counter() for emp_idx in self.shift_balance_employees}
+    for cell in range(len(self.codes)):
+      code = self.slot_codes[self.codes[cell]]
+      if code is not None:
+        self._count_cell(cell, code, 1)
+    self.avoid_matches: List[List[int]] = [
+      [self._pattern_matches(emp_idx, pattern, 0, self.num_days) for pattern in self.avoid_patterns]
+      for emp_idx in range(len(employee_ids))
+    ]
+    self.n_staffing = sum(
+      1 for day_idx in range(self.num_days) for code in self.required_staff if self._staffing_short(day_idx, code)
+    )
+    self.n_team = sum(1 for term in self.team_coverage_terms if self.team_counts[term] == 0)
+    self.n_career = sum(1 for term in self.career_coverage_terms if self.career_counts[term] == 0)
+    self.n_special = self.static_request_misses + sum(self._request_misses(cell) for cell in self.requests_by_cell)
+    self.n_off = sum(
+      self._off_gap(a, b)
+      for members in self.team_member_indices.values()
+      for i, a in enumerate(members)
+      for b in members[i + 1 :]
+    )
+    team_ids = processor.team_ids
+    self.n_workload = sum(
+      self._workload_gap(team_ids[i], team_ids[j]) for i in range(len(team_ids)) for j in range(i + 1, len(team_ids))
+    )
+    self.n_breaks = sum(
+      self._row_breaks(emp_idx * self.num_days, 0, self.num_days - 1) for emp_idx in range(len(employee_ids))
+    )
+    self.n_avoid = sum(1 for matches in self.avoid_matches for count in matches if count > 0)
+    self.n_shift_balance = sum(self._shift_balance_gap(emp_idx) for emp_idx in self.shift_balance_employees)
+    self.daily_terms: List[float] = [self._daily_term(day_idx) for day_idx in range(self.num_days)]
+
+  def _count_cell(self, cell: int, code: str, step: int):
+    emp_idx, day_idx = divmod(cell, self.num_days)
+    team_id = self.employee_teams[emp_idx]
+    alias = self.employee_aliases[emp_idx]
+    self.shift_counts[(day_idx, code)] += step
+    if team_id:
+      self.team_counts[(day_idx, code, team_id)] += step
+      if code not in NON_WORKLOAD_CODES:
+        self.workloads[team_id] += step
+    if alias:
+      self.career_counts[(day_idx, code, alias)] += step
+    if code in OFF_COUNT_CODES:
+      self.off_counts[emp_idx] += step
+    if code not in self.off_like_codes:
+      self.daily_actuals[day_idx] += step
+    if emp_idx in self.core_counts and code in self.core_codes:
+      self.core_counts[emp_idx][code] += step
+
+  def penalty(self) -> float:
+    daily_gap_penalty = 0.0
+    for term in self.daily_terms:
+      daily_gap_penalty += term
+    weights = self.weights
+    return (
+      100 * self.n_staffing * weights["staffing"]
+      + 50 * self.n_team * weights["teamBalance"]
+      + 40 * self.n_career * weights["careerBalance"]
+      + 35 * self.n_workload * weights["teamBalance"]
+      + 30 * self.n_special
+      + 20 * self.n_off * weights["offBalance"]
+      + 10 * self.n_breaks * weights["shiftPattern"]
+      + 10 * self.n_avoid
+      + 12 * self.n_shift_balance * weights["shiftPattern"]
+      + 12 * daily_gap_penalty * weights["dailyBalance"]
+    )
+
+  def swap_penalty(self, cell_a: int, cell_b: int) -> float:
+    slot_a = self.codes[cell_a]
+    slot_b = self.codes[cell_b]
+    self._set_cell(cell_a, slot_b)
+    self._set_cell(cell_b, slot_a)
+    penalty = self.penalty()
+    self._set_cell(cell_b, slot_b)
+    self._set_cell(cell_a, slot_a)
+    return penalty
+
+  def apply_swap(self, cell_a: int, cell_b: int) -> bool:
+    if not self.state.can_swap_cells(cell_a, cell_b):
+      return False
+    slot_a = self.codes[cell_a]
+    slot_b = self.codes[cell_b]
+    self._set_cell(cell_a, slot_b)
+    self._set_cell(cell_b, slot_a)
+    return True
+
+  def _set_cell(self, cell: int, new_slot: int):
+    old_code = self.slot_codes[self.codes[cell]]
+    new_code = self.slot_codes[new_slot]
+    if old_code == new_code:
+      self.codes[cell] = new_slot
+      return
+    emp_idx, day_idx = divmod(cell, self.num_days)
+    team_id = self.employee_teams[emp_idx]
+    alias = self.employee_aliases[emp_idx]
+    codes = (old_code, new_code)
+    staffing_keys = [code for code in codes if code in self.required_staff]
+    team_keys = [(day_idx, code, team_id) for code in codes if (day_idx, code, team_id) in self.team_coverage_terms]
+    career_keys = [(day_idx, code, alias) for code in codes if (day_idx, code, alias) in self.career_coverage_terms]
+    off_changed = (old_code in OFF_COUNT_CODES) != (new_code in OFF_COUNT_CODES)
+    workload_changed = bool(team_id) and (old_code in NON_WORKLOAD_CODES) != (new_code in NON_WORKLOAD_CODES)
+    balance_changed = emp_idx in self.core_counts and (old_code in self.core_codes or new_code in self.core_codes)
+    has_requests = cell in self.requests_by_cell
+    base = emp_idx * self.num_days
+    window_lo = max(0, day_idx - 1)
+    window_hi = min(self.num_days - 1, day_idx + 1)
+
+    self.n_staffing -= sum(1 for code in staffing_keys if self._staffing_short(day_idx, code))
+    self.n_team -= sum(1 for key in team_keys if self.team_counts[key] == 0)
+    self.n_career -= sum(1 for key in career_keys if self.career_counts[key] == 0)
+    if off_changed:
+      self.n_off -= self._off_gaps_for(emp_idx)
+    if workload_changed:
+      self.n_workload -= self._workload_gaps_for(team_id)
+    if balance_changed:
+      self.n_shift_balance -= self._shift_balance_gap(emp_idx)
+    if has_requests:
+      self.n_special -= self._request_misses(cell)
+    lo, hi = self._run_bounds(base, window_lo, window_hi)
+    self.n_breaks -= self._row_breaks(base, lo, hi)
+    avoid_before = [
+      self._pattern_matches(emp_idx, pattern, day_idx - len(pattern) + 1, day_idx + 1) for pattern in self.avoid_patterns
+    ]
+
+    if old_code is not None:
+      self._count_cell(cell, old_code, -1)
+    if new_code is not None:
+      self._count_cell(cell, new_code, 1)
+    self.codes[cell] = new_slot
+    self.daily_terms[day_idx] = self._daily_term(day_idx)
+
+    self.n_staffing += sum(1 for code in staffing_keys if self._staffing_short(day_idx, code))
+    self.n_team += sum(1 for key in team_keys if self.team_counts[key] == 0)
+    self.n_career += sum(1 for key in career_keys if self.career_counts[key] == 0)
+    if off_changed:
+      self.n_off += self._off_gaps_for(emp_idx)
+    if workload_changed:
+      self.n_workload += self._workload_gaps_for(team_id)
+    if balance_changed:
+      self.n_shift_balance += self._shift_balance_gap(emp_idx)
+    if has_requests:
+      self.n_special += self._request_misses(cell)
+    lo, hi = self._run_bounds(base, window_lo, window_hi)
+    self.n_breaks += self._row_breaks(base, lo, hi)
+    matches = self.avoid_matches[emp_idx]
+    for pattern_idx, pattern in enumerate(self.avoid_patterns):
+      had_match = matches[pattern_idx] > 0
+      matches[pattern_idx] += (
+        self._pattern_matches(emp_idx, pattern, day_idx - len(pattern) + 1, day_idx + 1) - avoid_before[pattern_idx]
+      )
+      has_match = matches[pattern_idx] > 0
+      if had_match != has_match:
+        self.n_avoid += 1 if has_match else -1
+
+  def _code(self, cell: int) -> Optional[str]:
+    return self.slot_codes[self.codes[cell]]
+
+  def _staffing_short(self, day_idx: int, code: str) -> bool:
+    return self.shift_counts[(day_idx, code)] < self.required_staff[code]
+
+  def _request_misses(self, cell: int) -> int:
+    code = self._code(cell)
+    if code is None:
+      return len(self.requests_by_cell[cell])
+    return sum(1 for shift in self.requests_by_cell[cell] if shift and code != shift)
+
+  def _off_gap(self, emp_a: int, emp_b: int) -> int:
+    return int(abs(self.off_counts[emp_a] - self.off_counts[emp_b]) > self.off_tolerance)
+
+  def _off_gaps_for(self, emp_idx: int) -> int:
+    team_id = self.employee_teams[emp_idx]
+    if not team_id:
+      return 0
+    return sum(self._off_gap(emp_idx, other) for other in self.team_member_indices.get(team_id, []) if other != emp_idx)
+
+  def _workload_gap(self, team_a: str, team_b: str) -> int:
+    return int(abs(self.workloads[team_a] - self.workloads[team_b]) > self.team_tolerance)
+
+  def _workload_gaps_for(self, team_id: str) -> int:
+    return sum(self._workload_gap(team_id, other_id) for other_id in self.processor.team_ids if other_id != team_id)
+
+  def _shift_balance_gap(self, emp_idx: int) -> int:
+    if len(self.core_codes) < 2:
+      return 0
+    counts = self.core_counts[emp_idx]
+    values = [counts[code] for code in self.core_codes]
+    return int(max(values) - min(values) > self.shift_balance_tolerance)
+
+  def _daily_term(self, day_idx: int) -> float:
+    if not self.daily_enabled:
+      return 0.0
+    diff = self.daily_actuals[day_idx] - self.daily_targets[day_idx]
+    over = max(0.0, diff - self.daily_tolerance)
+    under = max(0.0, -diff - self.daily_tolerance)
+    if over <= 1e-6 and under <= 1e-6:
+      return 0.0
+    return max(over, under, 1)
+
+  def _pattern_matches(self, emp_idx: int, pattern: List[str], start: int, stop: int) -> int:
+    base = emp_idx * self.num_days
+    length = len(pattern)
+    matches = 0
+    for begin in range(max(0, start), min(stop, self.num_days - length + 1)):
+      if all(self._code(base + begin + offset) == code for offset, code in enumerate(pattern)):
+        matches += 1
+    return matches
+
+  def _run_bounds(self, base: int, lo: int, hi: int) -> Tuple[int, int]:
+    # widen [lo, hi] to whole runs so the streak excess can be recounted locally
+    first = self._present(base, lo, -1)
+    if first is not None:
+      lo = self._run_edge(base, first, -1)
+    last = self._present(base, hi, 1)
+    if last is not None:
+      hi = self._run_edge(base, last, 1)
+    return lo, hi
+
+  def _present(self, base: int, idx: int, step: int) -> Optional[int]:
+    while 0 <= idx < self.num_days:
+      if self.codes[base + idx]:
+        return idx
+      idx += step
+    return None
+
+  def _run_edge(self, base: int, idx: int, step: int) -> int:
+    code = self._code(base + idx)
+    if code in IGNORE_SHIFT_CODES:
+      return idx
+    edge = idx
+    probe = idx + step
+    while 0 <= probe < self.num_days:
+      probe_code = self._code(base + probe)
+      if probe_code is None:
+        probe += step
+        continue
+      if probe_code != code:
+        break
+      edge = probe
+      probe += step
+    return edge
+
+  def _row_breaks(self, base: int, lo: int, hi: int) -> int:
+    breaks = 0
+    last_code = None
+    streak = 0
+    for idx in range(lo, hi + 1):
+      code = self._code(base + idx)
+      if code is None:
+        continue
+      if code in IGNORE_SHIFT_CODES:
+        last_code = code
+        streak = 1
+        continue
+      if code == last_code:
+        streak += 1
+      else:
+        streak = 1
+        last_code = code
+      if streak > self.max_same_shift:
+        breaks += 1
+    return breaks
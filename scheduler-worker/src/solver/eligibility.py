@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Set
+
+from models import Employee, ScheduleInput
+
+
+def is_shift_allowed(employee: Employee, day: date, shift_code: str, holidays: Set[str]) -> bool:
+  upper = shift_code.replace("^", "").upper()
+  if upper == "V":
+    return True
+  if employee.workPatternType == "night-intensive":
+    return upper in ("N", "O", "V")
+  if employee.workPatternType == "weekday-only":
+    if day.weekday() >= 5 or day.isoformat() in holidays:
+      return upper in ("O", "V")
+    return upper in ("A", "V")
+  if upper == "A":
+    return False
+  return True
+
+
+class EligibilityTensor:
+  """Boolean (employee, day, shift) eligibility for one ScheduleInput.
+
+  Each shift code is stored as one employee bitmask per day, with team and
+  career-group masks so rollups are a single AND plus a popcount.
+  """
+
+  def __init__(self, schedule: ScheduleInput):
+    self.schedule = schedule
+    self.employees: List[Employee] = list(schedule.employees)
+    self.holiday_set = {holiday.date for holiday in (schedule.holidays or [])}
+    self.date_range: List[date] = []
+    current = schedule.startDate
+    while current <= schedule.endDate:
+      self.date_range.append(current)
+      current += timedelta(days=1)
+    self.day_index: Dict[str, int] = {day.isoformat(): idx for idx, day in enumerate(self.date_range)}
+    self.employee_index: Dict[str, int] = {}
+    self.pattern_masks: Dict[Optional[str], int] = {}
+    self.team_masks: Dict[str, int] = {}
+    self.group_masks: Dict[str, int] = {}
+    for idx, emp in enumerate(self.employees):
+      bit = 1 << idx
+      self.employee_index.setdefault(emp.id, idx)
+      self.pattern_masks[emp.workPatternType] = self.pattern_masks.get(emp.workPatternType, 0) | bit
+      if emp.teamId:
+        self.team_masks[emp.teamId] = self.team_masks.get(emp.teamId, 0) | bit
+      alias = getattr(emp, "careerGroupAlias", None)
+      if alias:
+        self.group_masks[alias] = self.group_masks.get(alias, 0) | bit
+    self.pattern_samples: Dict[Optional[str], Employee] = {}
+    for emp in self.employees:
+      self.pattern_samples.setdefault(emp.workPatternType, emp)
+    self._code_masks: Dict[str, List[int]] = {}
+
+  def _day_masks(self, shift_code: str) -> List[int]:
+    upper = shift_code.replace("^", "").upper()
+    masks = self._code_masks.get(upper)
+    if masks is None:
+      masks = []
+      for day in self.date_range:
+        mask = 0
+        for pattern, sample in self.pattern_samples.items():
+          if is_shift_allowed(sample, day, upper, self.holiday_set):
+            mask |= self.pattern_masks[pattern]
+        masks.append(mask)
+      self._code_masks[upper] = masks
+    return masks
+
+  def mask(self, day: date, shift_code: str) -> int:
+    day_idx = self.day_index.get(day.isoformat())
+    if day_idx is None:
+      mask = 0
+      for pattern, sample in self.pattern_samples.items():
+        if is_shift_allowed(sample, day, shift_code, self.holiday_set):
+          mask |= self.pattern_masks[pattern]
+      return mask
+    return self._day_masks(shift_code)[day_idx]
+
+  def is_allowed(self, employee: Employee, day: date, shift_code: str) -> bool:
+    idx = self.employee_index.get(employee.id)
+    if idx is None or self.employees[idx] is not employee:
+      return is_shift_allowed(employee, day, shift_code, self.holiday_set)
+    return bool((self.mask(day, shift_code) >> idx) & 1)
+
+  def count(self, day: date, shift_code: str) -> int:
+    return self.mask(day, shift_code).bit_count()
+
+  def team_count(self, team_id: str, day: date, shift_code: str) -> int:
+    return (self.mask(day, shift_code) & self.team_masks.get(team_id, 0)).bit_count()
+
+  def group_count(self, alias: str, day: date, shift_code: str) -> int:
+    return (self.mask(day, shift_code) & self.group_masks.get(alias, 0)).bit_count()
+
+  def members(self, mask: int) -> List[Employee]:
+    members: List[Employee] = []
+    while mask:
+      low = mask & -mask
+      members.append(self.employees[low.bit_length() - 1])
+      mask ^= low
+    return members
+
+  def team_eligible(self, team_id: str, day: date, shift_code: str) -> List[Employee]:
+    return self.members(self.mask(day, shift_code) & self.team_masks.get(team_id, 0))
+
+  def group_eligible(self, alias: str, day: date, shift_code: str) -> List[Employee]:
+    return self.members(self.mask(day, shift_code) & self.group_masks.get(alias, 0))
+
+
+def get_eligibility(schedule: ScheduleInput) -> EligibilityTensor:
+  tensor = getattr(schedule, "_eligibility", None)
+  if tensor is None or tensor.schedule is not schedule or len(tensor.employees) != len(schedule.employees):
+    tensor = EligibilityTensor(schedule)
+    schedule._eligibility = tensor
+  return tensor
@@ -2,3 +2,7 @@ class SolverFailure(RuntimeError):
   def __init__(self, message: str, diagnostics=None):
     super().__init__(message)
     self.diagnostics = diagnostics
+
+  def __reduce__(self):
+    # Keep diagnostics when a failure crosses a process boundary (multi-run pool).
+    return (self.__class__, (str(self), self.diagnostics))
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional
+
+from models import ScheduleInput
+from solver.model_ir import ScheduleModelIR
+from solver.progress import emit_event
+
+
+class IncumbentSink:
+  """Latest full-schedule incumbent of a running job, shared by every solver thread.
+
+  Solvers call ``offer`` on each improvement; it only keeps a reference to the
+  solution, so the callback stays cheap. Assignments are built when a reader
+  asks for a ``snapshot``, at most once per ``min_interval_ms``; in between
+  readers get the previous snapshot. Sub-models (decomposition clusters,
+  rolling-horizon windows) cover part of the job and are ignored.
+  """
+
+  def __init__(self, schedule: ScheduleInput, min_interval_ms: int = 1000):
+    self.shape = (schedule.startDate, schedule.endDate, len(schedule.employees))
+    self.min_interval = max(0, min_interval_ms) / 1000.0
+    self.started = time.perf_counter()
+    self.version = 0
+    self._lock = threading.Lock()
+    self._pending: Optional[Dict[str, Any]] = None
+    self._snapshot: Optional[Dict[str, Any]] = None
+    self._built_at = 0.0
+
+  def offer(
+    self,
+    model_ir: ScheduleModelIR,
+    active: Callable[[], List[int]],
+    objective: Optional[float],
+    engine: str,
+  ) -> Optional[int]:
+    schedule = model_ir.schedule
+    if (schedule.startDate, schedule.endDate, len(schedule.employees)) != self.shape:
+      return None
+    with self._lock:
+      self.version += 1
+      self._pending = {
+        "model_ir": model_ir,
+        "active": active,
+        "objective": objective,
+        "engine": engine,
+        "foundAtMs": int((time.perf_counter() - self.started) * 1000),
+        "version": self.version,
+      }
+      return self.version
+
+  def snapshot(self, force: bool = False) -> Optional[Dict[str, Any]]:
+    with self._lock:
+      pending = self._pending
+      if pending is None or (not force and time.perf_counter() - self._built_at < self.min_interval):
+        return self._snapshot
+      self._pending = None
+      self._built_at = time.perf_counter()
+    assignments = pending["model_ir"].build_assignments(pending["active"]())
+    snapshot = {
+      "engine": pending["engine"],
+      "objective": pending["objective"],
+      "foundAtMs": pending["foundAtMs"],
+      "version": pending["version"],
+      "assignments": [asdict(assignment) for assignment in assignments],
+    }
+    with self._lock:
+      if self._snapshot is None or self._snapshot["version"] < snapshot["version"]:
+        self._snapshot = snapshot
+      return self._snapshot
+
+
+def publish_incumbent(
+  cancel_token: Any,
+  model_ir: ScheduleModelIR,
+  active: Callable[[], List[int]],
+  objective: Optional[float],
+  engine: str,
+):
+  # The job's sink rides on its cancellation token, which already reaches every solver thread.
+  sink = getattr(cancel_token, "incumbent_sink", None)
+  if sink is not None:
+    version = sink.offer(model_ir, active, objective, engine)
+    if version is not None:
+      emit_event(cancel_token, "incumbent", {"engine": engine, "objective": objective, "version": version})
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Any, Dict, Optional, Tuple
+
+from models import ScheduleInput
+
+
+def _env_int(name: str, default: int) -> int:
+  try:
+    return int(os.environ.get(name, default))
+  except (TypeError, ValueError):
+    return default
+
+
+def structural_fingerprint(schedule: ScheduleInput, signature: Tuple[Any, ...]) -> str:
+  """Hash of everything that shapes the rows; weights and solver options are left out.
+
+  ``signature`` is the IR's ``model_signature`` and covers the few ``options``
+  and ``warmStart`` fields the IR reads, so the rest of ``options`` is dropped.
+  """
+  payload = {field: value for field, value in asdict(schedule).items() if field not in ("options", "warmStart")}
+  payload["signature"] = repr(signature)
+  encoded = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+  return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ModelCache:
+  """Process-wide LRU of built IRs (and the backend models lowered from them)."""
+
+  def __init__(self, max_entries: int, ttl_seconds: float):
+    self.max_entries = max(0, max_entries)
+    self.ttl_seconds = max(0.0, ttl_seconds)
+    self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  @classmethod
+  def from_env(cls) -> "ModelCache":
+    return cls(_env_int("MILP_MODEL_CACHE_SIZE", 8), _env_int("MILP_MODEL_CACHE_TTL_SECONDS", 1800))
+
+  @property
+  def enabled(self) -> bool:
+    return self.max_entries > 0
+
+  def get(self, key: str) -> Optional[Any]:
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and self.ttl_seconds and time.monotonic() - entry[0] > self.ttl_seconds:
+        del self._entries[key]
+        self.evictions += 1
+        entry = None
+      if entry is None:
+        self.misses += 1
+        return None
+      self._entries.move_to_end(key)
+      self.hits += 1
+      return entry[1]
+
+  def put(self, key: str, value: Any):
+    if not self.enabled:
+      return
+    with self._lock:
+      self._entries[key] = (time.monotonic(), value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+        self.evictions += 1
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      return {
+        "hits": self.hits,
+        "misses": self.misses,
+        "evictions": self.evictions,
+        "size": len(self._entries),
+        "maxEntries": self.max_entries,
+        "ttlSeconds": self.ttl_seconds,
+      }
+
+
+MODEL_CACHE = ModelCache.from_env()
+
+
+def model_cache_info(schedule: ScheduleInput) -> Optional[Dict[str, Any]]:
+  lookup = getattr(schedule, "_model_cache", None)
+  if lookup is None:
+    return None
+  return {**lookup, **MODEL_CACHE.stats()}
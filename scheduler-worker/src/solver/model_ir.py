@@ -0,0 +1,1517 @@
+from __future__ import annotations
+
+import math
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from models import Assignment, ScheduleInput
+from solver.eligibility import get_eligibility
+from solver.model_cache import MODEL_CACHE, structural_fingerprint
+from solver.preflight import (
+  DEFAULT_REQUIRED_STAFF,
+  off_day_slack,
+  required_off_days,
+  required_staff_by_date,
+  required_staff_map,
+  run_preflight_checks,
+)
+INF = math.inf
+# "auto" balance formulation switches from pairwise slacks to one max/min spread at this group size.
+SPREAD_MIN_GROUP_SIZE = 6
+
+
+def _weight_scalar(constraint_weights: Dict[str, Any], key: str, default: float) -> float:
+  value = constraint_weights.get(key)
+  if value is None:
+    return default
+  try:
+    scalar = float(value)
+    return max(0.1, scalar)
+  except (TypeError, ValueError):
+    return default
+
+
+def objective_weights(schedule: ScheduleInput) -> Dict[str, float]:
+  """Per-family objective weights; kept out of the IR so jittered runs can share one model."""
+  options = getattr(schedule, "options", {}) or {}
+  constraint_weights = options.get("constraintWeights", {}) or {}
+  daily_cfg = options.get("dailyStaffingBalance", {}) or {}
+  daily_weight = float(daily_cfg.get("weight", constraint_weights.get("dailyBalance", 1.0) or 1.0))
+  return {
+    "team": 500 * _weight_scalar(constraint_weights, "teamBalance", 1.0),
+    "special": 1200,
+    "career": 450 * _weight_scalar(constraint_weights, "careerBalance", 1.0),
+    "careerBalance": 600 * _weight_scalar(constraint_weights, "careerBalance", 1.0),
+    "offBalance": 800 * _weight_scalar(constraint_weights, "offBalance", 1.0),
+    "repeat": 350 * _weight_scalar(constraint_weights, "shiftPattern", 1.0),
+    "rest": 500 * _weight_scalar(constraint_weights, "shiftPattern", 1.0),
+    "shiftBalance": 250 * _weight_scalar(constraint_weights, "shiftPattern", 1.0),
+    "daily": 400 * _weight_scalar(constraint_weights, "dailyBalance", daily_weight),
+  }
+
+
+class ScheduleModelIR:
+  """Solver-neutral scheduling model built once per ScheduleInput.
+
+  Variables live in a flat index space (assignment cells first, then slacks and
+  auxiliary counters), rows are sparse ``lb <= sum(coef * x) <= ub`` and slack
+  families carry their objective family name instead of a weight. The pywraplp
+  and cp_model backends lower the same IR, so hybrid and multi-run jobs only
+  pay the Python-side build cost once.
+  """
+
+  def __init__(self, schedule: ScheduleInput):
+    self.schedule = schedule
+    self.options = getattr(schedule, "options", {}) or {}
+    self.constraint_weights = self.options.get("constraintWeights", {}) or {}
+    self.csp_options = self.options.get("cspSettings", {}) or {}
+    self.date_range = self._build_date_range()
+    self.special_request_targets = self._build_special_request_targets()
+    self.special_request_codes = {code for (_, _, code) in self.special_request_targets}
+    self.required_staff_map = self._build_required_staff_map()
+    self.required_staff_by_date = required_staff_by_date(self.options)
+    self.default_required_staff = DEFAULT_REQUIRED_STAFF
+    self.shift_codes = self._build_shift_codes()
+    self.shift_code_set = {code.upper() for code in self.shift_codes}
+    self.var_names: List[str] = []
+    self.var_lb: List[float] = []
+    self.var_ub: List[float] = []
+    self.var_integer: List[bool] = []
+    self.var_fixed: List[Optional[float]] = []
+    self.row_indices: List[List[int]] = []
+    self.row_coefs: List[List[int]] = []
+    self.row_lb: List[float] = []
+    self.row_ub: List[float] = []
+    self.row_names: List[str] = []
+    self.num_assignment_vars = 0
+    self.skipped_cells = 0
+    self.warm_start_hints: Dict[int, int] = {}
+    self.warm_start_stats: Dict[str, Any] = {}
+    self.presolve_stats: Dict[str, int] = {}
+    self.assignment_keys: List[Tuple[str, str, str]] = []
+    self.variables: Dict[Tuple[str, str, str], int] = {}
+    self.variable_name_map: Dict[str, Tuple[str, str, str]] = {}
+    # Assignment indexes filled by _create_variables, in creation order.
+    self.day_vars: Dict[str, List[int]] = {}
+    self.employee_vars: Dict[str, List[int]] = {}
+    self.cell_vars: Dict[Tuple[str, str], List[int]] = {}
+    self.day_shift_vars: Dict[Tuple[str, str], List[int]] = {}
+    self.staffing_requirements: Dict[Tuple[str, str], int] = {}
+    self.shift_min_staff: Dict[str, int] = {}
+    self.shift_max_staff: Dict[str, int] = {}
+    self.team_slacks: Dict[Tuple[str, str, str], int] = {}
+    self.team_requirements: Dict[Tuple[str, str, str], int] = {}
+    self.special_request_slacks: Dict[Tuple[str, str, str], int] = {}
+    self.career_group_slacks: Dict[Tuple[str, str, str], int] = {}
+    self.off_balance_slacks: List[int] = []
+    self.balance_formulation = _balance_formulation(self.options)
+    # Spread rows (one max/min pair per group); objective families scale their slack by group size - 1.
+    self.off_balance_spreads: List[Dict[str, Any]] = []
+    self.career_group_balance_spreads: List[Dict[str, Any]] = []
+    self.avoid_patterns: List[List[str]] = []
+    self.off_count_vars: Dict[str, int] = {}
+    self.shift_repeat_entries: List[Dict[str, Any]] = []
+    self.rest_after_night_entries: List[Dict[str, Any]] = []
+    self.shift_balance_entries: List[Dict[str, Any]] = []
+    self.preference_penalty_map: Dict[Tuple[str, str, str], float] = {}
+    self.team_total_vars: Dict[str, int] = {}
+    self.team_balance_entries: List[Dict[str, Any]] = []
+    self.team_ids: List[str] = sorted(
+      {emp.teamId for emp in self.schedule.employees if getattr(emp, "teamId", None)}
+    )
+    self.team_members_map: Dict[str, List[Any]] = {}
+    for emp in self.schedule.employees:
+      if emp.teamId:
+        self.team_members_map.setdefault(emp.teamId, []).append(emp)
+    self.career_group_aliases: List[str] = sorted(
+      {emp.careerGroupAlias for emp in self.schedule.employees if getattr(emp, "careerGroupAlias", None)}
+    )
+    self.career_group_total_vars: Dict[str, int] = {}
+    self.career_group_balance_slacks: List[int] = []
+    self.symmetry_settings = _symmetry_settings(self.options)
+    self.symmetry_classes: List[List[str]] = []
+    self.symmetry_stats: Dict[str, Any] = {}
+    self.holiday_set = {holiday.date for holiday in (schedule.holidays or [])}
+    self.eligibility = get_eligibility(schedule)
+    self.team_coverage_shift_codes = {
+      code
+      for code, value in self.required_staff_map.items()
+      if value and code not in {"O", "A"}
+    }
+    self.career_group_balance_shift_codes = {
+      code
+      for code, value in self.required_staff_map.items()
+      if value and code not in {"O", "A", "N"}
+    }
+    self.shift_id_map: Dict[str, str] = {}
+    for shift in self.schedule.shifts:
+      self.shift_id_map.setdefault((shift.code or shift.name or "").upper(), shift.id)
+      code = (shift.code or shift.name or shift.id).upper()
+      if shift.minStaff is not None:
+        self.shift_min_staff[code] = max(0, int(shift.minStaff))
+      if shift.maxStaff is not None:
+        self.shift_max_staff[code] = max(0, int(shift.maxStaff))
+    self.max_same_shift = self._get_max_same_shift()
+    self.shift_balance_tolerance = self._get_shift_balance_tolerance()
+    self.required_off = self._calculate_required_off_days()
+    self.preflight_issues = self._run_preflight_checks()
+    self._init_preference_penalties()
+    self.total_staff_capacity = 0
+    self.off_like_codes = self._build_off_like_codes()
+    self.daily_balance_config = self._get_daily_balance_config()
+    self.daily_balance_entries: List[Dict[str, Any]] = []
+    self.signature = model_signature(schedule)
+    self.build_ms = 0
+    start = time.perf_counter()
+    self.build_model()
+    self.presolve()
+    self.build_ms = int((time.perf_counter() - start) * 1000)
+    # Backend models lowered from this IR, keyed by backend; re-solves only swap the objective.
+    self.sessions: Dict[str, Any] = {}
+
+  def __deepcopy__(self, memo):
+    # The IR is read-only once built; deep-copied schedules (multi-run, relaxation)
+    # share it and get_model_ir() rebuilds when the signature no longer matches.
+    return self
+
+  def __getstate__(self):
+    # Native solver handles cannot cross process boundaries; pool workers lower their own.
+    state = self.__dict__.copy()
+    state["sessions"] = {}
+    return state
+
+  @property
+  def num_vars(self) -> int:
+    return len(self.var_names)
+
+  @property
+  def num_rows(self) -> int:
+    return len(self.row_names)
+
+  def _new_var(self, name: str, lb: float, ub: float, integer: bool = True) -> int:
+    self.var_names.append(name)
+    self.var_lb.append(lb)
+    self.var_ub.append(ub)
+    self.var_integer.append(integer)
+    self.var_fixed.append(None)
+    return len(self.var_names) - 1
+
+  def _add_row(self, indices: List[int], coefs: List[int], lb: float, ub: float, name: str):
+    self.row_indices.append(indices)
+    self.row_coefs.append(coefs)
+    self.row_lb.append(lb)
+    self.row_ub.append(ub)
+    self.row_names.append(name)
+
+  def _build_date_range(self) -> List[date]:
+    current = self.schedule.startDate
+    dates: List[date] = []
+    while current <= self.schedule.endDate:
+      dates.append(current)
+      current += timedelta(days=1)
+    return dates
+
+  @staticmethod
+  def _sanitize_shift_code(code: Optional[str]) -> Optional[str]:
+    if not code:
+      return None
+    normalized = code.replace("^", "").strip().upper()
+    return normalized or None
+
+  @staticmethod
+  def _normalize_day_key(raw: str) -> str:
+    try:
+      return date.fromisoformat(raw).isoformat()
+    except ValueError:
+      return raw
+
+  def _build_special_request_targets(self) -> Set[Tuple[str, str, str]]:
+    targets: Set[Tuple[str, str, str]] = set()
+    for request in self.schedule.specialRequests or []:
+      shift_code = self._sanitize_shift_code(request.shiftTypeCode)
+      if not shift_code:
+        continue
+      day_key = self._normalize_day_key(request.date)
+      targets.add((request.employeeId, day_key, shift_code))
+    return targets
+
+  def _build_required_staff_map(self) -> Dict[str, int]:
+    return required_staff_map(self.schedule)
+
+  def _build_shift_codes(self) -> List[str]:
+    codes: Set[str] = {
+      code for code, value in self.required_staff_map.items() if value and value > 0
+    }
+    if any(emp.workPatternType == "weekday-only" for emp in self.schedule.employees):
+      codes.add("A")
+    codes.add("O")
+    codes.update(self.special_request_codes)
+    return sorted(codes)
+
+  def _var_name(self, employee_id: str, date_key: str, shift_code: str) -> str:
+    safe_emp = employee_id.replace("-", "_")
+    safe_date = date_key.replace("-", "_")
+    safe_shift = shift_code.replace("-", "_")
+    return f"x_{safe_emp}_{safe_date}_{safe_shift}"
+
+  def _get_shift_id(self, shift_code: str) -> str:
+    upper = shift_code.upper()
+    shift_id = self.shift_id_map.get(upper)
+    if shift_id is not None:
+      return shift_id
+    return f"shift-{upper.lower()}"
+
+  @staticmethod
+  def _is_weekend(day: date) -> bool:
+    return day.weekday() >= 5
+
+  def _is_weekend_or_holiday(self, day: date) -> bool:
+    return self._is_weekend(day) or day.isoformat() in self.holiday_set
+
+  def _is_shift_allowed(self, emp, day: date, shift_code: str) -> bool:
+    return self.eligibility.is_allowed(emp, day, shift_code)
+
+  def _calculate_required_off_days(self) -> Dict[str, int]:
+    return required_off_days(self.schedule, self.date_range)
+
+  def _get_max_same_shift(self) -> int:
+    return _max_same_shift(self.csp_options)
+
+  def _get_shift_balance_tolerance(self) -> int:
+    return _shift_balance_tolerance(self.csp_options)
+
+  def _build_off_like_codes(self) -> Set[str]:
+    codes: Set[str] = {"O", "V"}
+    for shift in self.schedule.shifts:
+      code = (shift.code or shift.name or shift.id).upper()
+      if shift.type in {"off", "leave"}:
+        codes.add(code)
+    return codes
+
+  def _get_daily_balance_config(self) -> Dict[str, Any]:
+    cfg = self.options.get("dailyStaffingBalance", {}) or {}
+    return {
+      "enabled": bool(cfg.get("enabled", True)),
+      "targetMode": cfg.get("targetMode", "auto"),
+      "targetValue": cfg.get("targetValue"),
+      "tolerance": float(cfg.get("tolerance", 2)),
+      "weight": float(cfg.get("weight", self.constraint_weights.get("dailyBalance", 1.0) or 1.0)),
+      "weekendScale": float(cfg.get("weekendScale", 1)),
+    }
+
+  def _daily_target_for_day(self, day: date) -> float:
+    mode = self.daily_balance_config.get("targetMode", "auto")
+    manual = self.daily_balance_config.get("targetValue")
+    if mode == "manual" and isinstance(manual, (int, float)) and manual >= 0:
+      base_target = float(manual)
+    else:
+      total_days = max(1, len(self.date_range))
+      total_required_off = sum(self.required_off.values())
+      base_target = max(
+        0.0,
+        (len(self.schedule.employees) * total_days - total_required_off) / total_days,
+      )
+    if self._is_weekend_or_holiday(day):
+      return base_target * float(self.daily_balance_config.get("weekendScale", 1) or 1)
+    return base_target
+
+  def _create_variables(self):
+    # Cells the work pattern or special-only codes rule out are never created;
+    # presolve() then fixes the cells that are left with a single legal code.
+    special_only_codes = {
+      code for code in self.special_request_codes if code not in self.required_staff_map and code not in {"A", "O"}
+    }
+    for emp in self.schedule.employees:
+      for day in self.date_range:
+        day_key = day.isoformat()
+        for code in self.shift_codes:
+          if code in special_only_codes and (emp.id, day_key, code) not in self.special_request_targets:
+            self.skipped_cells += 1
+            continue
+          if not self._is_shift_allowed(emp, day, code):
+            self.skipped_cells += 1
+            continue
+          name = self._var_name(emp.id, day_key, code)
+          idx = self._new_var(name, 0, 1)
+          self.variables[(emp.id, day_key, code)] = idx
+          self.variable_name_map[name] = (emp.id, day_key, code)
+          self.assignment_keys.append((emp.id, day_key, code))
+          self.day_vars.setdefault(day_key, []).append(idx)
+          self.employee_vars.setdefault(emp.id, []).append(idx)
+          self.cell_vars.setdefault((emp.id, day_key), []).append(idx)
+          self.day_shift_vars.setdefault((day_key, code), []).append(idx)
+    self.num_assignment_vars = len(self.var_names)
+
+  def _init_preference_penalties(self):
+    team_pattern = getattr(self.schedule, "teamPattern", None)
+    pattern_sequence: List[str] = []
+    if team_pattern and getattr(team_pattern, "pattern", None):
+      pattern_sequence = [
+        str(code).upper() for code in team_pattern.pattern if isinstance(code, str) and code.strip()
+      ]
+    team_pattern_penalty = 40.0
+    preference_penalty_base = 20.0
+    for day_index, day in enumerate(self.date_range):
+      day_key = day.isoformat()
+      expected_shift = None
+      if pattern_sequence:
+        expected_shift = pattern_sequence[day_index % len(pattern_sequence)]
+      for emp in self.schedule.employees:
+        pref_map: Dict[str, float] = {}
+        if emp.preferredShiftTypes:
+          pref_map = {
+            key.upper(): float(value)
+            for key, value in emp.preferredShiftTypes.items()
+            if isinstance(key, str) and isinstance(value, (int, float))
+          }
+        for code in self.shift_codes:
+          upper = code.upper()
+          penalty = 0.0
+          if expected_shift and emp.workPatternType == "three-shift":
+            if upper != expected_shift:
+              penalty += team_pattern_penalty
+          if pref_map:
+            weight = pref_map.get(upper)
+            if weight is not None:
+              penalty += max(0.0, 1.0 - max(0.0, min(1.0, weight))) * preference_penalty_base
+          if penalty > 0:
+            self.preference_penalty_map[(emp.id, day_key, upper)] = penalty
+
+  def _add_daily_assignment_constraints(self):
+    for emp in self.schedule.employees:
+      for day in self.date_range:
+        day_key = day.isoformat()
+        indices = self.cell_vars.get((emp.id, day_key), [])
+        self._add_row(list(indices), [1] * len(indices), 1, 1, f"daily_{emp.id}_{day_key}")
+
+  def _add_warm_start_hints(self):
+    # A hinted (employee, day) pins its chosen cell to 1 and the other cells to 0;
+    # hard hints also become rows, which presolve turns into fixed cells.
+    warm_start = getattr(self.schedule, "warmStart", None)
+    if not warm_start or not warm_start.assignments:
+      return
+    code_by_shift_id = {shift.id: (shift.code or shift.name or shift.id).upper() for shift in self.schedule.shifts}
+    ignored = 0
+    hinted_cells: Set[Tuple[str, str]] = set()
+    for hint in warm_start.assignments:
+      day_key = self._normalize_day_key(hint.date)
+      code = self._sanitize_shift_code(hint.shiftType) or code_by_shift_id.get(hint.shiftId or "")
+      var = self.variables.get((hint.employeeId, day_key, code)) if code else None
+      if var is None or (hint.employeeId, day_key) in hinted_cells:
+        ignored += 1
+        continue
+      hinted_cells.add((hint.employeeId, day_key))
+      for idx in self.cell_vars[(hint.employeeId, day_key)]:
+        self.warm_start_hints[idx] = 1 if idx == var else 0
+      if warm_start.hard:
+        self._add_row([var], [1], 1, 1, f"warm_start_{hint.employeeId}_{day_key}")
+    self.warm_start_stats = {"hintedCells": len(hinted_cells), "ignored": ignored, "hard": bool(warm_start.hard)}
+
+  def _add_special_request_constraints(self):
+    employee_ids = {emp.id for emp in self.schedule.employees}
+    day_keys = {day.isoformat() for day in self.date_range}
+    for req_index, req in enumerate(self.schedule.specialRequests or []):
+      if not req.shiftTypeCode:
+        continue
+      target_code = self._sanitize_shift_code(req.shiftTypeCode)
+      if not target_code:
+        continue
+      day_key = self._normalize_day_key(req.date)
+      var = self.variables.get((req.employeeId, day_key, target_code))
+      slack_name = f"special_req_slack_{req.employeeId}_{day_key}_{target_code}_{req_index}"
+      if var is None:
+        if req.employeeId in employee_ids and day_key in day_keys and target_code in self.shift_code_set:
+          # The requested cell is ruled out by the work pattern: a guaranteed miss.
+          self.special_request_slacks[(req.employeeId, day_key, target_code)] = self._new_var(slack_name, 1, 1)
+        continue
+      slack = self._new_var(slack_name, 0, 1)
+      self._add_row([var, slack], [1, 1], 1, INF, f"special_req_{req.employeeId}_{day_key}_{target_code}")
+      self.special_request_slacks[(req.employeeId, day_key, target_code)] = slack
+
+  def _add_avoid_pattern_constraints(self):
+    team_pattern = getattr(self.schedule, "teamPattern", None)
+    avoid_patterns = getattr(team_pattern, "avoidPatterns", None) if team_pattern else None
+    if not avoid_patterns:
+      return
+    normalized_patterns: List[List[str]] = []
+    for pattern in avoid_patterns:
+      if not isinstance(pattern, list):
+        continue
+      normalized = [str(code).upper() for code in pattern if isinstance(code, str) and code.strip()]
+      if normalized:
+        normalized_patterns.append(normalized)
+    if not normalized_patterns:
+      return
+    self.avoid_patterns = normalized_patterns
+    for emp in self.schedule.employees:
+      for pattern in normalized_patterns:
+        pattern_length = len(pattern)
+        if pattern_length > len(self.date_range):
+          continue
+        for start in range(0, len(self.date_range) - pattern_length + 1):
+          terms: List[int] = []
+          for offset, code in enumerate(pattern):
+            day_key = self.date_range[start + offset].isoformat()
+            var = self.variables.get((emp.id, day_key, code))
+            if var is not None:
+              terms.append(var)
+          if terms:
+            self._add_row(terms, [1] * len(terms), -INF, pattern_length - 1, f"avoid_{emp.id}_{pattern_length}_{start}")
+
+  def _add_staffing_constraints(self):
+    self.total_staff_capacity = 0
+    required = self.required_staff_map
+    for day in self.date_range:
+      day_key = day.isoformat()
+      for code in self.shift_codes:
+        upper = code.upper()
+        eligible_count = self.eligibility.count(day, code)
+        min_required = self.required_staff_by_date.get(day_key, {}).get(upper, required.get(upper))
+        if min_required is None:
+          min_required = self.shift_min_staff.get(upper)
+        if min_required is None:
+          min_required = self.default_required_staff.get(upper)
+        if min_required is not None and eligible_count == 0:
+          min_required = None
+        max_allowed = self.shift_max_staff.get(upper)
+        if min_required is not None:
+          if max_allowed is None:
+            max_allowed = min_required
+          else:
+            max_allowed = max(max_allowed, min_required)
+        if min_required is None and max_allowed is None:
+          continue
+        lower_bound = min_required if min_required is not None else 0
+        upper_bound = max_allowed if max_allowed is not None else INF
+        indices = list(self.day_shift_vars.get((day_key, code), []))
+        self._add_row(indices, [1] * len(indices), lower_bound, upper_bound, f"staff_{day_key}_{code}")
+        if min_required is not None and min_required > 0:
+          self.staffing_requirements[(day_key, code)] = min_required
+        if max_allowed is not None:
+          self.total_staff_capacity += max_allowed
+
+  def _add_team_coverage_constraints(self):
+    if not self.team_ids:
+      return
+    for day in self.date_range:
+      day_key = day.isoformat()
+      for code in self.shift_codes:
+        for team_id in self.team_ids:
+          if code.upper() not in self.team_coverage_shift_codes:
+            continue
+          eligible = self.eligibility.team_eligible(team_id, day, code)
+          if not eligible:
+            continue
+          slack_var = self._new_var(f"team_cover_slack_{day_key}_{code}_{team_id}", 0, len(eligible))
+          indices = [self.variables[(emp.id, day_key, code)] for emp in eligible]
+          indices.append(slack_var)
+          self._add_row(indices, [1] * len(indices), 1, INF, f"team_cover_{day_key}_{code}_{team_id}")
+          self.team_slacks[(day_key, code, team_id)] = slack_var
+          self.team_requirements[(day_key, code, team_id)] = 1
+
+  def _add_career_group_constraints(self):
+    if not self.career_group_aliases:
+      return
+    for day in self.date_range:
+      day_key = day.isoformat()
+      for code in self.shift_codes:
+        if code.upper() not in self.team_coverage_shift_codes:
+          continue
+        for group_alias in self.career_group_aliases:
+          eligible = self.eligibility.group_eligible(group_alias, day, code)
+          if not eligible:
+            continue
+          slack_var = self._new_var(f"career_cover_slack_{day_key}_{code}_{group_alias}", 0, len(eligible))
+          indices = [self.variables[(emp.id, day_key, code)] for emp in eligible]
+          indices.append(slack_var)
+          self._add_row(indices, [1] * len(indices), 1, INF, f"career_cover_{day_key}_{code}_{group_alias}")
+          self.career_group_slacks[(day_key, code, group_alias)] = slack_var
+
+  def _add_pairwise_balance(
+    self, total_vars: Dict[str, int], key_a: str, key_b: str, tolerance: int, bound: int, prefix: str, suffix: str
+  ) -> int:
+    slack = self._new_var(f"{prefix}_{suffix}", 0, bound)
+    self._add_row([total_vars[key_a], total_vars[key_b], slack], [1, -1, -1], -INF, tolerance, f"{prefix}_constraint_{suffix}")
+    return slack
+
+  def _use_spread(self, group_size: int) -> bool:
+    if self.balance_formulation == "auto":
+      return group_size >= SPREAD_MIN_GROUP_SIZE
+    return self.balance_formulation == "spread"
+
+  def _add_spread_balance(
+    self, total_vars: Dict[str, int], keys: List[str], tolerance: int, bound: int, prefix: str, suffix: str
+  ) -> Dict[str, Any]:
+    # max - min <= tolerance + slack: 3 columns and 2n + 1 rows instead of n(n - 1) of each.
+    max_var = self._new_var(f"{prefix}_max_{suffix}", 0, bound)
+    min_var = self._new_var(f"{prefix}_min_{suffix}", 0, bound)
+    slack = self._new_var(f"{prefix}_spread_{suffix}", 0, bound)
+    for key in keys:
+      self._add_row([total_vars[key], max_var], [1, -1], -INF, 0, f"{prefix}_max_{suffix}_{key}")
+      self._add_row([total_vars[key], min_var], [1, -1], 0, INF, f"{prefix}_min_{suffix}_{key}")
+    self._add_row([max_var, min_var, slack], [1, -1, -1], -INF, tolerance, f"{prefix}_spread_constraint_{suffix}")
+    return {"var": slack, "keys": list(keys), "tolerance": tolerance}
+
+  def _add_career_group_balance_constraints(self, tolerance: int = 1):
+    if len(self.career_group_aliases) < 2 or not self.career_group_balance_shift_codes:
+      return
+    total_days = len(self.date_range)
+    max_assignments = total_days * len(self.schedule.employees)
+    for alias in self.career_group_aliases:
+      total_var = self._new_var(f"career_group_total_{alias}", 0, max_assignments)
+      self.career_group_total_vars[alias] = total_var
+      indices: List[int] = []
+      for emp in self.schedule.employees:
+        if emp.careerGroupAlias != alias:
+          continue
+        for day in self.date_range:
+          day_key = day.isoformat()
+          for code in self.career_group_balance_shift_codes:
+            var = self.variables.get((emp.id, day_key, code))
+            if var is not None:
+              indices.append(var)
+      coefs = [1] * len(indices)
+      indices.append(total_var)
+      coefs.append(-1)
+      self._add_row(indices, coefs, 0, 0, f"career_group_total_eq_{alias}")
+    if self._use_spread(len(self.career_group_aliases)):
+      self.career_group_balance_spreads.append(
+        self._add_spread_balance(
+          self.career_group_total_vars, self.career_group_aliases, tolerance, max_assignments, "career_group_balance", "all"
+        )
+      )
+      return
+    for i in range(len(self.career_group_aliases)):
+      for j in range(i + 1, len(self.career_group_aliases)):
+        alias_i = self.career_group_aliases[i]
+        alias_j = self.career_group_aliases[j]
+        self.career_group_balance_slacks.append(
+          self._add_pairwise_balance(
+            self.career_group_total_vars, alias_i, alias_j, tolerance, max_assignments, "career_group_balance", f"{alias_i}_{alias_j}"
+          )
+        )
+        self.career_group_balance_slacks.append(
+          self._add_pairwise_balance(
+            self.career_group_total_vars, alias_j, alias_i, tolerance, max_assignments, "career_group_balance", f"{alias_j}_{alias_i}"
+          )
+        )
+
+  def _add_team_balance_constraints(self, tolerance: int = 2):
+    if len(self.team_ids) < 2:
+      return
+    total_days = len(self.date_range)
+    max_assignments = len(self.schedule.employees) * total_days
+    relevant_shifts = {code for code in self.shift_codes if code.upper() not in {"O", "A"}}
+    for team_id in self.team_ids:
+      total_var = self._new_var(f"team_total_{team_id}", 0, max_assignments)
+      self.team_total_vars[team_id] = total_var
+      indices: List[int] = []
+      for emp in self.schedule.employees:
+        if emp.teamId != team_id:
+          continue
+        for day in self.date_range:
+          day_key = day.isoformat()
+          for code in relevant_shifts:
+            var = self.variables.get((emp.id, day_key, code))
+            if var is not None:
+              indices.append(var)
+      coefs = [1] * len(indices)
+      indices.append(total_var)
+      coefs.append(-1)
+      self._add_row(indices, coefs, 0, 0, f"team_total_eq_{team_id}")
+    if self._use_spread(len(self.team_ids)):
+      entry = self._add_spread_balance(self.team_total_vars, self.team_ids, tolerance, max_assignments, "team_balance", "all")
+      self.team_balance_entries.append({**entry, "kind": "spread"})
+      return
+    for i in range(len(self.team_ids)):
+      for j in range(i + 1, len(self.team_ids)):
+        team_i = self.team_ids[i]
+        team_j = self.team_ids[j]
+        for team_a, team_b in ((team_i, team_j), (team_j, team_i)):
+          slack = self._add_pairwise_balance(
+            self.team_total_vars, team_a, team_b, tolerance, max_assignments, "team_balance", f"{team_a}_{team_b}"
+          )
+          self.team_balance_entries.append(
+            {
+              "var": slack,
+              "teamA": team_a,
+              "teamB": team_b,
+              "tolerance": tolerance,
+            }
+          )
+
+  def _add_off_day_constraints(self):
+    total_days = len(self.date_range)
+    total_assignments = len(self.schedule.employees) * total_days
+    off_eligible_count = sum(1 for emp in self.schedule.employees if emp.workPatternType != "weekday-only")
+    off_per_employee_hint = 0
+    if off_eligible_count > 0:
+      off_per_employee_hint = math.ceil(max(0, total_assignments - self.total_staff_capacity) / off_eligible_count)
+
+    for emp in self.schedule.employees:
+      off_count_var = self._new_var(f"off_count_{emp.id}", 0, total_days)
+      self.off_count_vars[emp.id] = off_count_var
+      indices = [var for var in self.employee_vars.get(emp.id, []) if self.assignment_keys[var][2] in ("O", "V")]
+      coefs = [1] * len(indices)
+      indices.append(off_count_var)
+      coefs.append(-1)
+      self._add_row(indices, coefs, 0, 0, f"offcount_eq_{emp.id}")
+      target = self.required_off.get(emp.id)
+      if target is None:
+        continue
+      if emp.workPatternType == "night-intensive":
+        lower_bound, upper_bound = target, INF
+      else:
+        lower_bound = max(0, target - off_day_slack(self.csp_options))
+        upper_bound = max(target + 2, off_per_employee_hint, lower_bound)
+        upper_bound = min(upper_bound, total_days)
+      self._add_row([off_count_var], [1], lower_bound, upper_bound, f"offdays_{emp.id}")
+
+  def _add_off_balance_constraints(self, tolerance: int = 2):
+    total_days = len(self.date_range)
+    for team_id, members in self.team_members_map.items():
+      if len(members) < 2:
+        continue
+      if self._use_spread(len(members)):
+        keys = [emp.id for emp in members if emp.id in self.off_count_vars]
+        if len(keys) >= 2:
+          entry = self._add_spread_balance(self.off_count_vars, keys, tolerance, total_days, "off_balance", team_id)
+          self.off_balance_spreads.append(entry)
+        continue
+      for i in range(len(members)):
+        for j in range(i + 1, len(members)):
+          emp_a = members[i]
+          emp_b = members[j]
+          if emp_a.id not in self.off_count_vars or emp_b.id not in self.off_count_vars:
+            continue
+          self.off_balance_slacks.append(
+            self._add_pairwise_balance(
+              self.off_count_vars, emp_a.id, emp_b.id, tolerance, total_days, "off_balance", f"{team_id}_{emp_a.id}_{emp_b.id}"
+            )
+          )
+          self.off_balance_slacks.append(
+            self._add_pairwise_balance(
+              self.off_count_vars, emp_b.id, emp_a.id, tolerance, total_days, "off_balance", f"{team_id}_{emp_b.id}_{emp_a.id}"
+            )
+          )
+
+  def _add_daily_headcount_balance_constraints(self):
+    if not self.daily_balance_config.get("enabled", True):
+      return
+    tolerance = max(0.0, float(self.daily_balance_config.get("tolerance", 0)))
+    employee_count = len(self.schedule.employees)
+    for day in self.date_range:
+      day_key = day.isoformat()
+      work_vars = [
+        var for var in self.day_vars.get(day_key, []) if self.assignment_keys[var][2].upper() not in self.off_like_codes
+      ]
+      if not work_vars:
+        continue
+      total_var = self._new_var(f"daily_total_{day_key}", 0, employee_count)
+      coefs = [-1] * len(work_vars)
+      self._add_row([total_var] + work_vars, [1] + coefs, 0, 0, f"daily_total_eq_{day_key}")
+
+      target = float(self._daily_target_for_day(day))
+      # Continuous for CBC; cp_model lowering rounds the row bounds outward.
+      slack_bound = max(employee_count, math.ceil(target + tolerance))
+      over_slack = self._new_var(f"daily_over_{day_key}", 0, slack_bound, integer=False)
+      under_slack = self._new_var(f"daily_under_{day_key}", 0, slack_bound, integer=False)
+      self._add_row([total_var, over_slack], [1, -1], -INF, target + tolerance, f"daily_upper_{day_key}")
+      self._add_row([total_var, under_slack], [1, 1], target - tolerance, INF, f"daily_lower_{day_key}")
+
+      self.daily_balance_entries.append(
+        {
+          "day": day_key,
+          "target": target,
+          "tolerance": tolerance,
+          "over_var": over_slack,
+          "under_var": under_slack,
+          "total_var": total_var,
+        }
+      )
+
+  def _add_shift_repeat_constraints(self, max_same_shift: int = 2):
+    window = max_same_shift + 1
+    for emp in self.schedule.employees:
+      if window > len(self.date_range):
+        continue
+      for code in self.shift_codes:
+        upper = code.upper()
+        if upper in {"O"}:
+          continue
+        for start in range(0, len(self.date_range) - window + 1):
+          indices: List[int] = []
+          for offset in range(window):
+            day_key = self.date_range[start + offset].isoformat()
+            var = self.variables.get((emp.id, day_key, code))
+            if var is not None:
+              indices.append(var)
+          if not indices:
+            continue
+          slack = self._new_var(f"repeat_slack_{emp.id}_{upper}_{start}", 0, window)
+          coefs = [1] * len(indices)
+          indices.append(slack)
+          coefs.append(-1)
+          self._add_row(indices, coefs, -INF, max_same_shift, f"repeat_{emp.id}_{upper}_{start}")
+          self.shift_repeat_entries.append(
+            {
+              "kind": "repeat",
+              "employeeId": emp.id,
+              "shiftType": upper,
+              "startDate": self.date_range[start].isoformat(),
+              "window": window,
+              "var": slack,
+            }
+          )
+
+  def _add_consecutive_constraints(self):
+    total_days = len(self.date_range)
+    for emp in self.schedule.employees:
+      max_consecutive_days = getattr(emp, "maxConsecutiveDaysPreferred", None)
+      if isinstance(max_consecutive_days, int) and max_consecutive_days >= 0:
+        window = max_consecutive_days + 1
+        if window <= total_days:
+          for start in range(0, total_days - max_consecutive_days):
+            indices: List[int] = []
+            for offset in range(window):
+              day_key = self.date_range[start + offset].isoformat()
+              for code in ("O", "V"):
+                var = self.variables.get((emp.id, day_key, code))
+                if var is not None:
+                  indices.append(var)
+            self._add_row(indices, [1] * len(indices), 1, INF, f"max_consecutive_work_{emp.id}_{start}")
+      max_consecutive_nights = getattr(emp, "maxConsecutiveNightsPreferred", None)
+      if (
+        isinstance(max_consecutive_nights, int)
+        and max_consecutive_nights >= 0
+        and "N" in self.shift_code_set
+      ):
+        window = max_consecutive_nights + 1
+        if window <= total_days:
+          for start in range(0, total_days - max_consecutive_nights):
+            indices = []
+            for offset in range(window):
+              day_key = self.date_range[start + offset].isoformat()
+              night_var = self.variables.get((emp.id, day_key, "N"))
+              if night_var is not None:
+                indices.append(night_var)
+            if indices:
+              self._add_row(indices, [1] * len(indices), 0, max_consecutive_nights, f"max_consecutive_nights_{emp.id}_{start}")
+
+  def _add_night_intensive_pattern_constraints(self):
+    total_days = len(self.date_range)
+    if total_days == 0:
+      return
+    for emp in self.schedule.employees:
+      if emp.workPatternType != "night-intensive":
+        continue
+      if total_days >= 4:
+        for start in range(0, total_days - 3):
+          indices: List[int] = []
+          for offset in range(4):
+            day_key = self.date_range[start + offset].isoformat()
+            night_var = self.variables.get((emp.id, day_key, "N"))
+            if night_var is not None:
+              indices.append(night_var)
+          if not indices:
+            continue
+          slack = self._new_var(f"night_limit_slack_{emp.id}_{start}", 0, len(indices))
+          coefs = [1] * len(indices)
+          indices.append(slack)
+          coefs.append(-1)
+          self._add_row(indices, coefs, -INF, 3, f"night_limit_{emp.id}_{start}")
+          self.shift_repeat_entries.append(
+            {
+              "kind": "night_limit",
+              "employeeId": emp.id,
+              "shiftType": "N",
+              "startDate": self.date_range[start].isoformat(),
+              "window": 4,
+              "var": slack,
+            }
+          )
+      if total_days >= 5:
+        for start in range(0, total_days - 4):
+          indices = []
+          for offset in range(5):
+            day_key = self.date_range[start + offset].isoformat()
+            off_var = self.variables.get((emp.id, day_key, "O"))
+            if off_var is not None:
+              indices.append(off_var)
+          if not indices:
+            continue
+          slack = self._new_var(f"night_off_slack_{emp.id}_{start}", 0, len(indices))
+          indices.append(slack)
+          self._add_row(indices, [1] * len(indices), 2, INF, f"night_off_buffer_{emp.id}_{start}")
+          self.shift_repeat_entries.append(
+            {
+              "kind": "night_off_buffer",
+              "employeeId": emp.id,
+              "shiftType": "O",
+              "startDate": self.date_range[start].isoformat(),
+              "window": 5,
+              "var": slack,
+            }
+          )
+
+  def _add_rest_after_night_constraints(self):
+    if "N" not in self.shift_code_set:
+      return
+    for emp in self.schedule.employees:
+      for day_index, day in enumerate(self.date_range[:-1]):
+        day_key = day.isoformat()
+        next_key = self.date_range[day_index + 1].isoformat()
+        night_var = self.variables.get((emp.id, day_key, "N"))
+        if night_var is None:
+          continue
+        for early_shift in ("D", "E"):
+          next_var = self.variables.get((emp.id, next_key, early_shift))
+          if next_var is None:
+            continue
+          name = f"rest_after_night_{emp.id}_{day_key}_{early_shift}"
+          slack = self._new_var(name, 0, 1)
+          self._add_row([night_var, next_var, slack], [1, 1, -1], -INF, 1, name)
+          self.rest_after_night_entries.append(
+            {
+              "employeeId": emp.id,
+              "shiftType": f"N->{early_shift}",
+              "startDate": day_key,
+              "window": 2,
+              "var": slack,
+            }
+          )
+
+  def _add_shift_balance_constraints(self, tolerance: Optional[int] = None):
+    effective_tolerance = tolerance if tolerance is not None else self.shift_balance_tolerance
+    core_shifts = [code for code in ("D", "E", "N") if code in self.shift_code_set]
+    if len(core_shifts) < 2:
+      return
+    total_days = len(self.date_range)
+    for emp in self.schedule.employees:
+      if emp.workPatternType != "three-shift":
+        continue
+      counts: Dict[str, int] = {}
+      for code in core_shifts:
+        count_var = self._new_var(f"shift_count_{emp.id}_{code}", 0, total_days)
+        counts[code] = count_var
+        indices: List[int] = []
+        for day in self.date_range:
+          day_key = day.isoformat()
+          var = self.variables.get((emp.id, day_key, code))
+          if var is not None:
+            indices.append(var)
+        coefs = [1] * len(indices)
+        indices.append(count_var)
+        coefs.append(-1)
+        self._add_row(indices, coefs, 0, 0, f"shift_count_eq_{emp.id}_{code}")
+      for i in range(len(core_shifts)):
+        for j in range(i + 1, len(core_shifts)):
+          code_i = core_shifts[i]
+          code_j = core_shifts[j]
+          for code_a, code_b in ((code_i, code_j), (code_j, code_i)):
+            slack = self._add_pairwise_balance(
+              counts, code_a, code_b, effective_tolerance, total_days, "shift_balance", f"{emp.id}_{code_a}_{code_b}"
+            )
+            self.shift_balance_entries.append(
+              {
+                "var": slack,
+                "employeeId": emp.id,
+                "shiftA": code_a,
+                "shiftB": code_b,
+                "tolerance": effective_tolerance,
+              }
+            )
+
+  def _run_preflight_checks(self) -> List[Dict[str, Any]]:
+    return run_preflight_checks(self.schedule, self.date_range, self.required_staff_map, self.required_off)
+
+  def build_model(self):
+    self._create_variables()
+    self._add_daily_assignment_constraints()
+    self._add_warm_start_hints()
+    self._add_special_request_constraints()
+    self._add_avoid_pattern_constraints()
+    self._add_staffing_constraints()
+    self._add_team_coverage_constraints()
+    self._add_career_group_constraints()
+    self._add_career_group_balance_constraints()
+    if self.team_ids:
+      self._add_team_balance_constraints()
+    self._add_off_day_constraints()
+    self._add_off_balance_constraints()
+    self._add_shift_repeat_constraints(self.max_same_shift)
+    self._add_consecutive_constraints()
+    self._add_night_intensive_pattern_constraints()
+    self._add_rest_after_night_constraints()
+    self._add_daily_headcount_balance_constraints()
+    self._add_shift_balance_constraints()
+    self._add_symmetry_breaking_constraints()
+
+  def _employee_classes(self) -> List[List[Any]]:
+    # Staff whose every model-relevant field matches are interchangeable: swapping
+    # their rows of the schedule keeps each row and the objective unchanged.
+    # Special requests and warm-start hints are tied to one person, so those staff stay out.
+    pinned = {req.employeeId for req in (self.schedule.specialRequests or [])}
+    pinned.update(self.assignment_keys[idx][0] for idx in self.warm_start_hints)
+    identity = {"id", "name", "alias"}
+    groups: Dict[Tuple[Any, ...], List[Any]] = {}
+    for emp in self.schedule.employees:
+      if emp.id in pinned:
+        continue
+      key = tuple(
+        repr(sorted(value.items())) if isinstance(value, dict) else value
+        for name, value in vars(emp).items()
+        if name not in identity
+      )
+      groups.setdefault(key + (self.required_off.get(emp.id),), []).append(emp)
+    return [members for members in groups.values() if len(members) > 1]
+
+  def _add_symmetry_breaking_constraints(self):
+    """Orders each class of interchangeable staff so the solvers skip their permutations.
+
+    ``count`` (default) keeps off-day counters non-increasing along a class. ``lex``
+    reads the first ``prefixDays`` as a base-K number (K shift codes, code rank as
+    digit) and keeps those non-decreasing instead; it cuts more permutations but the
+    large coefficients slow CBC's LP. Any solution can be permuted within a class to
+    satisfy either order, so no schedule is lost.
+    """
+    settings = self.symmetry_settings
+    if not settings["enabled"] or not self.shift_codes:
+      return
+    base = len(self.shift_codes)
+    prefix = min(settings["prefixDays"], len(self.date_range))
+    while prefix > 1 and base ** prefix > 10 ** 6:
+      prefix -= 1
+    rank = {code: position for position, code in enumerate(self.shift_codes)}
+    rows = 0
+    for members in self._employee_classes():
+      self.symmetry_classes.append([emp.id for emp in members])
+      for emp_a, emp_b in zip(members, members[1:]):
+        indices: List[int] = []
+        coefs: List[int] = []
+        if settings["mode"] == "lex":
+          for offset, day in enumerate(self.date_range[:prefix]):
+            place = base ** (prefix - 1 - offset)
+            day_key = day.isoformat()
+            for code in self.shift_codes:
+              for emp, sign in ((emp_a, 1), (emp_b, -1)):
+                var = self.variables.get((emp.id, day_key, code))
+                if var is not None and rank[code]:
+                  indices.append(var)
+                  coefs.append(sign * rank[code] * place)
+        elif emp_a.id in self.off_count_vars and emp_b.id in self.off_count_vars:
+          indices = [self.off_count_vars[emp_b.id], self.off_count_vars[emp_a.id]]
+          coefs = [1, -1]
+        if indices:
+          self._add_row(indices, coefs, -INF, 0, f"symmetry_{emp_a.id}_{emp_b.id}")
+          rows += 1
+    if self.symmetry_classes:
+      self.symmetry_stats = {
+        "mode": settings["mode"],
+        "classSizes": sorted((len(members) for members in self.symmetry_classes), reverse=True),
+        "employees": sum(len(members) for members in self.symmetry_classes),
+        "rows": rows,
+      }
+      if settings["mode"] == "lex":
+        self.symmetry_stats["prefixDays"] = prefix
+
+  def presolve(self):
+    """Fold fixed columns into row bounds, turn singleton rows into column bounds
+    and drop rows that can no longer bind. Rows found infeasible are kept so the
+    backend reports them."""
+    eps = 1e-9
+    var_lb, var_ub, var_fixed, var_integer = self.var_lb, self.var_ub, self.var_fixed, self.var_integer
+
+    def fix(idx: int, value: float):
+      var_lb[idx] = var_ub[idx] = value
+      var_fixed[idx] = value
+
+    for idx in range(self.num_vars):
+      if var_lb[idx] == var_ub[idx]:
+        var_fixed[idx] = var_lb[idx]
+    rows = list(zip(self.row_indices, self.row_coefs, self.row_lb, self.row_ub, self.row_names))
+    original_rows = len(rows)
+    passes = 0
+    changed = True
+    while changed and passes < 10:
+      changed = False
+      passes += 1
+      kept = []
+      for indices, coefs, lb, ub, name in rows:
+        if any(var_fixed[idx] is not None for idx in indices):
+          free_indices: List[int] = []
+          free_coefs: List[int] = []
+          for idx, coef in zip(indices, coefs):
+            value = var_fixed[idx]
+            if value is None:
+              free_indices.append(idx)
+              free_coefs.append(coef)
+            else:
+              lb -= coef * value
+              ub -= coef * value
+          indices, coefs = free_indices, free_coefs
+        if not indices:
+          if lb > eps or ub < -eps:
+            kept.append((indices, coefs, lb, ub, name))
+          continue
+        if len(indices) == 1:
+          idx, coef = indices[0], coefs[0]
+          new_lb, new_ub = (lb / coef, ub / coef) if coef > 0 else (ub / coef, lb / coef)
+          if var_integer[idx]:
+            new_lb = math.ceil(new_lb - eps) if new_lb != -INF else new_lb
+            new_ub = math.floor(new_ub + eps) if new_ub != INF else new_ub
+          new_lb = max(var_lb[idx], new_lb)
+          new_ub = min(var_ub[idx], new_ub)
+          if new_lb > new_ub + eps:
+            kept.append((indices, coefs, lb, ub, name))
+            continue
+          var_lb[idx], var_ub[idx] = new_lb, new_ub
+          if new_ub - new_lb <= eps:
+            fix(idx, new_lb)
+            changed = True
+          continue
+        min_activity = 0.0
+        max_activity = 0.0
+        for idx, coef in zip(indices, coefs):
+          if coef > 0:
+            min_activity += coef * var_lb[idx]
+            max_activity += coef * var_ub[idx]
+          else:
+            min_activity += coef * var_ub[idx]
+            max_activity += coef * var_lb[idx]
+        if min_activity >= lb - eps and max_activity <= ub + eps:
+          continue
+        if abs(max_activity - lb) <= eps:
+          for idx, coef in zip(indices, coefs):
+            fix(idx, var_ub[idx] if coef > 0 else var_lb[idx])
+          changed = True
+          continue
+        if abs(min_activity - ub) <= eps:
+          for idx, coef in zip(indices, coefs):
+            fix(idx, var_lb[idx] if coef > 0 else var_ub[idx])
+          changed = True
+          continue
+        kept.append((indices, coefs, lb, ub, name))
+      rows = kept
+
+    # Every objective coefficient is non-negative, so a column left without rows sits at its lower bound.
+    used = [False] * self.num_vars
+    for indices, _, _, _, _ in rows:
+      for idx in indices:
+        used[idx] = True
+    for idx in range(self.num_vars):
+      if var_fixed[idx] is None and not used[idx]:
+        fix(idx, var_lb[idx])
+
+    self.row_indices = [row[0] for row in rows]
+    self.row_coefs = [row[1] for row in rows]
+    self.row_lb = [row[2] for row in rows]
+    self.row_ub = [row[3] for row in rows]
+    self.row_names = [row[4] for row in rows]
+    self.free_assignment_indices = [idx for idx in range(self.num_assignment_vars) if var_fixed[idx] is None]
+    self.fixed_active = [
+      idx for idx in range(self.num_assignment_vars) if var_fixed[idx] is not None and var_fixed[idx] >= 0.5
+    ]
+    self.presolve_stats = {
+      "skippedCells": self.skipped_cells,
+      "fixedCells": self.num_assignment_vars - len(self.free_assignment_indices),
+      "fixedVariables": sum(1 for value in var_fixed if value is not None),
+      "droppedRows": original_rows - len(rows),
+      "passes": passes,
+    }
+
+  def objective_terms(self, weights: Dict[str, float]) -> List[Tuple[int, float]]:
+    terms: List[Tuple[int, float]] = []
+    for var, (employee_id, day_key, shift_code) in enumerate(self.assignment_keys):
+      penalty = self.preference_penalty_map.get((employee_id, day_key, shift_code.upper()), 0.0)
+      if penalty:
+        terms.append((var, penalty))
+    for slack_var in self.team_slacks.values():
+      terms.append((slack_var, weights["team"]))
+    for slack_var in self.special_request_slacks.values():
+      terms.append((slack_var, weights["special"]))
+    for slack_var in self.career_group_slacks.values():
+      terms.append((slack_var, weights["career"]))
+    for slack_var in self.career_group_balance_slacks:
+      terms.append((slack_var, weights["careerBalance"]))
+    # A spread slack stands in for up to len(keys) - 1 pairwise slacks.
+    for entry in self.career_group_balance_spreads:
+      terms.append((entry["var"], weights["careerBalance"] * (len(entry["keys"]) - 1)))
+    for entry in self.team_balance_entries:
+      terms.append((entry["var"], weights["team"] * max(1, len(entry.get("keys", ())) - 1)))
+    for slack_var in self.off_balance_slacks:
+      terms.append((slack_var, weights["offBalance"]))
+    for entry in self.off_balance_spreads:
+      terms.append((entry["var"], weights["offBalance"] * (len(entry["keys"]) - 1)))
+    for entry in self.shift_repeat_entries:
+      terms.append((entry["var"], weights["repeat"]))
+    for entry in self.rest_after_night_entries:
+      terms.append((entry["var"], weights["rest"]))
+    for entry in self.shift_balance_entries:
+      terms.append((entry["var"], weights["shiftBalance"]))
+    for entry in self.daily_balance_entries:
+      terms.append((entry["over_var"], weights["daily"]))
+      terms.append((entry["under_var"], weights["daily"]))
+    return terms
+
+  def stats(self) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {
+      "variables": sum(1 for value in self.var_fixed if value is None),
+      "rows": self.num_rows,
+      "buildMs": self.build_ms,
+      "presolve": self.presolve_stats,
+    }
+    if self.warm_start_stats:
+      stats["warmStart"] = self.warm_start_stats
+    if self.symmetry_stats:
+      stats["symmetry"] = self.symmetry_stats
+    return stats
+
+  def free_hints(self) -> List[Tuple[int, int]]:
+    return [(idx, value) for idx, value in self.warm_start_hints.items() if self.var_fixed[idx] is None]
+
+  def assignment_indices(self, assignments: Iterable[Assignment]) -> List[int]:
+    """Columns of a schedule built from this IR, e.g. another engine's (postprocessed) result."""
+    index = {(employee_id, day_key, code.upper()): idx for (employee_id, day_key, code), idx in self.variables.items()}
+    keys = ((item.employeeId, item.date, (item.shiftType or "").upper()) for item in assignments)
+    return sorted({index[key] for key in keys if key in index})
+
+  def incumbent_hints(self, active: Iterable[int]) -> List[Tuple[int, int]]:
+    # A full solution pins every free cell column, on or off.
+    chosen = set(active)
+    return [(idx, 1 if idx in chosen else 0) for idx in self.free_assignment_indices]
+
+  def has_solution(self, values: Sequence[float]) -> bool:
+    if not self.free_assignment_indices:
+      return True
+    return any(values[idx] >= 0.5 for idx in self.free_assignment_indices)
+
+  def active_assignment_indices(self, values: Sequence[float]) -> List[int]:
+    return [idx for idx in range(self.num_assignment_vars) if values[idx] >= 0.5]
+
+  def build_assignments(self, active: Iterable[int]) -> List[Assignment]:
+    assignments: List[Assignment] = []
+    for idx in active:
+      employee_id, day_key, shift_code = self.assignment_keys[idx]
+      is_locked = (employee_id, day_key, shift_code.upper()) in self.special_request_targets
+      assignments.append(
+        Assignment(
+          employeeId=employee_id,
+          date=day_key,
+          shiftId=self._get_shift_id(shift_code),
+          shiftType=shift_code.upper(),
+          isLocked=is_locked,
+        )
+      )
+    return assignments
+
+  def build_assignments_from_names(self, active_names: Set[str]) -> List[Assignment]:
+    active: List[int] = []
+    for name in active_names:
+      key = self.variable_name_map.get(name)
+      if key:
+        active.append(self.variables[key])
+    return self.build_assignments(sorted(active))
+
+  def _collect_staffing_shortages(self, values: Sequence[float]):
+    shortages = []
+    if not self.staffing_requirements:
+      return shortages
+    for (day_key, code), required in self.staffing_requirements.items():
+      covered_value = 0.0
+      for var in self.day_shift_vars.get((day_key, code), []):
+        value = values[var]
+        if value is not None and value > 1e-6:
+          covered_value += value
+      if covered_value + 1e-6 < required:
+        shortages.append(
+          {
+            "date": day_key,
+            "shiftType": code.upper(),
+            "required": required,
+            "covered": int(round(covered_value)),
+            "shortage": int(round(required - covered_value)),
+          }
+        )
+    return shortages
+
+  def _collect_team_shortages(self, values: Sequence[float]):
+    gaps = []
+    for (day_key, code, team_id), slack_var in self.team_slacks.items():
+      shortage = values[slack_var]
+      if shortage is None:
+        continue
+      if shortage > 1e-6:
+        gaps.append(
+          {
+            "date": day_key,
+            "shiftType": code.upper(),
+            "teamId": team_id,
+            "shortage": int(round(shortage)),
+          }
+        )
+    return gaps
+
+  def _collect_career_group_gaps(self, values: Sequence[float]):
+    gaps = []
+    for (day_key, code, group_alias), slack_var in self.career_group_slacks.items():
+      shortage = values[slack_var]
+      if shortage is None:
+        continue
+      if shortage > 1e-6:
+        gaps.append(
+          {
+            "date": day_key,
+            "shiftType": code.upper(),
+            "careerGroupAlias": group_alias,
+            "shortage": int(round(shortage)),
+          }
+        )
+    return gaps
+
+  def _collect_special_request_misses(self, values: Sequence[float]):
+    misses = []
+    for (employee_id, day_key, code), slack_var in self.special_request_slacks.items():
+      value = values[slack_var]
+      if value is None:
+        continue
+      if value > 0.5:
+        misses.append(
+          {
+            "employeeId": employee_id,
+            "date": day_key,
+            "shiftType": code,
+          }
+        )
+    return misses
+
+  def _collect_off_balance_gaps(self, values: Sequence[float], tolerance: int = 2):
+    gaps = []
+    for team_id, members in self.team_members_map.items():
+      if len(members) < 2:
+        continue
+      for i in range(len(members)):
+        for j in range(i + 1, len(members)):
+          if members[i].id not in self.off_count_vars or members[j].id not in self.off_count_vars:
+            continue
+          count_a = values[self.off_count_vars[members[i].id]]
+          count_b = values[self.off_count_vars[members[j].id]]
+          if count_a is None or count_b is None:
+            continue
+          diff = abs(count_a - count_b)
+          if diff > tolerance + 1e-6:
+            gaps.append(
+              {
+                "teamId": team_id,
+                "employeeA": members[i].id,
+                "employeeB": members[j].id,
+                "difference": int(round(diff)),
+                "tolerance": tolerance,
+              }
+            )
+    return gaps
+
+  def _collect_team_balance_gaps(self, values: Sequence[float]):
+    gaps = []
+    for entry in self.team_balance_entries:
+      if entry.get("kind") == "spread":
+        gaps.extend(self._spread_pair_gaps(values, entry))
+        continue
+      value = values[entry["var"]]
+      if value is None or value <= 1e-6:
+        continue
+      gaps.append(
+        {
+          "teamA": entry["teamA"],
+          "teamB": entry["teamB"],
+          "difference": int(round(value + entry["tolerance"])),
+          "tolerance": entry["tolerance"],
+        }
+      )
+    return gaps
+
+  def _spread_pair_gaps(self, values: Sequence[float], entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Same shape as the pairwise entries: one gap per ordered pair whose difference exceeds tolerance.
+    totals = {team_id: values[self.team_total_vars[team_id]] for team_id in entry["keys"]}
+    gaps = []
+    for team_a in entry["keys"]:
+      for team_b in entry["keys"]:
+        if team_a == team_b or totals[team_a] is None or totals[team_b] is None:
+          continue
+        difference = totals[team_a] - totals[team_b]
+        if difference > entry["tolerance"] + 1e-6:
+          gaps.append(
+            {
+              "teamA": team_a,
+              "teamB": team_b,
+              "difference": int(round(difference)),
+              "tolerance": entry["tolerance"],
+            }
+          )
+    return gaps
+
+  def _collect_shift_pattern_breaks(self, values: Sequence[float]):
+    violations = []
+    for entry in self.shift_repeat_entries + self.rest_after_night_entries:
+      value = values[entry["var"]]
+      if value is None or value <= 1e-6:
+        continue
+      violations.append(
+        {
+          "employeeId": entry["employeeId"],
+          "shiftType": entry["shiftType"],
+          "startDate": entry["startDate"],
+          "window": entry["window"],
+          "excess": int(round(value)),
+        }
+      )
+    return violations
+
+  def _collect_shift_balance_gaps(self, values: Sequence[float]):
+    gaps = []
+    for entry in self.shift_balance_entries:
+      value = values[entry["var"]]
+      if value is None or value <= 1e-6:
+        continue
+      gaps.append(
+        {
+          "employeeId": entry["employeeId"],
+          "shiftA": entry["shiftA"],
+          "shiftB": entry["shiftB"],
+          "difference": int(round(value + entry["tolerance"])),
+          "tolerance": entry["tolerance"],
+        }
+      )
+    return gaps
+
+  def _collect_daily_headcount_gaps(self, values: Sequence[float]):
+    gaps = []
+    for entry in self.daily_balance_entries:
+      total = values[entry["total_var"]]
+      over = values[entry["over_var"]]
+      under = values[entry["under_var"]]
+      if total is None:
+        continue
+      over_val = over if over and over > 1e-6 else 0
+      under_val = under if under and under > 1e-6 else 0
+      if over_val <= 1e-6 and under_val <= 1e-6:
+        continue
+      gaps.append(
+        {
+          "date": entry["day"],
+          "target": entry["target"],
+          "tolerance": entry["tolerance"],
+          "actual": float(total),
+          "over": float(over_val) if over_val > 1e-6 else 0,
+          "under": float(under_val) if under_val > 1e-6 else 0,
+        }
+      )
+    return gaps
+
+  def collect_diagnostics(self, values: Sequence[float]) -> Dict[str, Any]:
+    return {
+      "staffingShortages": self._collect_staffing_shortages(values),
+      "teamCoverageGaps": self._collect_team_shortages(values),
+      "careerGroupCoverageGaps": self._collect_career_group_gaps(values),
+      "teamWorkloadGaps": self._collect_team_balance_gaps(values),
+      "offBalanceGaps": self._collect_off_balance_gaps(values),
+      "shiftPatternBreaks": self._collect_shift_pattern_breaks(values),
+      "specialRequestMisses": self._collect_special_request_misses(values),
+      "shiftBalanceGaps": self._collect_shift_balance_gaps(values),
+      "dailyHeadcountGaps": self._collect_daily_headcount_gaps(values),
+    }
+
+
+def _max_same_shift(csp_options: Dict[str, Any]) -> int:
+  raw = csp_options.get("maxSameShift")
+  try:
+    parsed = int(raw)
+    return max(1, min(parsed, 10))
+  except (TypeError, ValueError):
+    return 2
+
+
+def _shift_balance_tolerance(csp_options: Dict[str, Any]) -> int:
+  raw = csp_options.get("shiftBalanceTolerance")
+  try:
+    parsed = int(raw)
+    return max(1, min(parsed, 20))
+  except (TypeError, ValueError):
+    return 4
+
+
+def _warm_start_signature(warm_start) -> Optional[Tuple[Any, ...]]:
+  if not warm_start or not warm_start.assignments:
+    return None
+  return (
+    bool(warm_start.hard),
+    tuple((item.employeeId, item.date, item.shiftType, item.shiftId) for item in warm_start.assignments),
+  )
+
+
+def _balance_formulation(options: Dict[str, Any]) -> str:
+  raw = str(options.get("balanceFormulation", "auto")).lower()
+  return raw if raw in ("pairwise", "spread") else "auto"
+
+
+def _symmetry_settings(options: Dict[str, Any]) -> Dict[str, Any]:
+  raw = options.get("symmetryBreaking", True)
+  if not isinstance(raw, dict):
+    raw = {"enabled": raw}
+  try:
+    prefix_days = max(1, int(raw.get("prefixDays", 7)))
+  except (TypeError, ValueError):
+    prefix_days = 7
+  mode = raw.get("mode", "count")
+  return {
+    "enabled": raw.get("enabled", True) not in (False, "off"),
+    "mode": mode if mode in ("count", "lex") else "count",
+    "prefixDays": prefix_days,
+  }
+
+
+def model_signature(schedule: ScheduleInput) -> Tuple[Any, ...]:
+  """Everything the IR reads from ``options`` and ``warmStart``; constraintWeights only feed the objective."""
+  options = getattr(schedule, "options", {}) or {}
+  csp_options = options.get("cspSettings", {}) or {}
+  daily_cfg = options.get("dailyStaffingBalance", {}) or {}
+  return (
+    schedule.startDate,
+    schedule.endDate,
+    len(schedule.employees),
+    _max_same_shift(csp_options),
+    _shift_balance_tolerance(csp_options),
+    off_day_slack(csp_options),
+    bool(daily_cfg.get("enabled", True)),
+    daily_cfg.get("targetMode", "auto"),
+    daily_cfg.get("targetValue"),
+    daily_cfg.get("tolerance", 2),
+    daily_cfg.get("weekendScale", 1),
+    _warm_start_signature(getattr(schedule, "warmStart", None)),
+    tuple(sorted((day, tuple(sorted(codes.items()))) for day, codes in required_staff_by_date(options).items())),
+    tuple(sorted(_symmetry_settings(options).items())),
+    _balance_formulation(options),
+  )
+
+
+def get_model_ir(schedule: ScheduleInput) -> ScheduleModelIR:
+  signature = model_signature(schedule)
+  model_ir = getattr(schedule, "_model_ir", None)
+  if model_ir is not None and model_ir.signature == signature:
+    return model_ir
+  if not MODEL_CACHE.enabled:
+    model_ir = ScheduleModelIR(schedule)
+    schedule._model_ir = model_ir
+    return model_ir
+  # Repeated "generate" clicks for the same department/month only differ in weights;
+  # reuse the IR and its lowered solver models from an earlier job.
+  fingerprint = structural_fingerprint(schedule, signature)
+  model_ir = MODEL_CACHE.get(fingerprint)
+  hit = model_ir is not None
+  if model_ir is None:
+    model_ir = ScheduleModelIR(schedule)
+    MODEL_CACHE.put(fingerprint, model_ir)
+  schedule._model_ir = model_ir
+  schedule._model_cache = {"hit": hit, "fingerprint": fingerprint[:16]}
+  return model_ir
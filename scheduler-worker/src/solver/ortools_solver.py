@@ -1,27 +1,72 @@
 from __future__ import annotations
 
-import math
+import copy
+import multiprocessing
 import os
 import time
 import threading
-from datetime import date, timedelta
-from typing import Any, Dict, List, Tuple, Set, Optional
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Set, Optional, Sequence
 
 from ortools.linear_solver import pywraplp
 
 from models import Assignment, ScheduleInput
 from solver.exceptions import SolverFailure
-from solver.types import SolveResult, SolveStatus, CancellationToken
-
-DEFAULT_REQUIRED_STAFF = {"D": 5, "E": 4, "N": 3}
+from solver.incumbents import publish_incumbent
+from solver.model_cache import model_cache_info
+from solver.model_ir import INF, ScheduleModelIR, get_model_ir, objective_weights
+from solver.stop_criteria import gap_stop, objective_report, resolve_stop_criteria
+from solver.types import CANCEL_POLL_SECONDS, SolveResult, SolveStatus, CancellationToken
+
+
+_SESSION_LOCK = threading.Lock()
+# pywraplp's CBC ignores InterruptSolve, so a cancellable solve runs in a worker process
+# that can be killed ("process"); "thread" keeps it in-process and lets it run out its time limit.
+CBC_CANCEL_MODE = os.environ.get("MILP_CBC_CANCEL_MODE", "process").lower()
+# Idle CBC workers kept alive between solves, and lowered sessions each one keeps.
+CBC_IDLE_WORKERS = int(os.environ.get("MILP_CBC_IDLE_WORKERS", 2))
+CBC_WORKER_SESSIONS = max(1, int(os.environ.get("MILP_CBC_WORKER_SESSIONS", os.environ.get("MILP_MODEL_CACHE_SIZE", 8))))
+# Sliding-window families lazy mode leaves out until an incumbent violates them.
+LAZY_ROW_PREFIXES = (
+  "repeat_",
+  "max_consecutive_work_",
+  "max_consecutive_nights_",
+  "rest_after_night_",
+  "night_limit_",
+  "night_off_buffer_",
+)
+
+
+def lazy_window_settings(options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+  raw = (options or {}).get("lazyWindows") or False
+  if not isinstance(raw, dict):
+    raw = {"enabled": raw}
+  try:
+    max_rounds = max(1, int(raw.get("maxRounds", 6)))
+  except (TypeError, ValueError):
+    max_rounds = 6
+  return {"enabled": bool(raw.get("enabled", True)), "maxRounds": max_rounds}
 
 
 class OrToolsMilpSolver:
-  def __init__(self, schedule: ScheduleInput):
+  def __init__(self, schedule: ScheduleInput, model_ir: Optional[ScheduleModelIR] = None, lazy: Optional[bool] = None):
+    self.model_ir = model_ir or get_model_ir(schedule)
+    self.solver = pywraplp.Solver.CreateSolver("CBC_MIXED_INTEGER_PROGRAMMING")
+    if not self.solver:
+      raise RuntimeError("Failed to initialize CBC solver")
+    self.vars: List[Optional[pywraplp.Variable]] = []
+    # Lazy sessions keep the window rows they have added so far; re-solves start from those.
+    self.lazy = lazy_window_settings(getattr(schedule, "options", {}) or {})["enabled"] if lazy is None else lazy
+    self.pending_rows: List[int] = []
+    self.built = False
+    self.lock = threading.Lock()
+    self.bind(schedule)
+
+  def bind(self, schedule: ScheduleInput):
+    # Jitter and relaxation only touch weights and time limits; rows stay lowered.
     self.schedule = schedule
     self.options = getattr(schedule, "options", {}) or {}
-    self.constraint_weights = self.options.get("constraintWeights", {}) or {}
-    self.csp_options = self.options.get("cspSettings", {}) or {}
     raw_max_time = self.options.get("maxSolveTimeMs") if isinstance(self.options, dict) else None
     try:
       self.max_solve_time_ms = int(raw_max_time) if raw_max_time is not None else 0
@@ -33,1179 +78,83 @@ class OrToolsMilpSolver:
         self.max_solve_time_ms = max(0, env_limit)
       except (TypeError, ValueError):
         self.max_solve_time_ms = 300000
-    self.date_range = self._build_date_range()
-    self.special_request_targets = self._build_special_request_targets()
-    self.special_request_codes = {code for (_, _, code) in self.special_request_targets}
-    self.required_staff_map = self._build_required_staff_map()
-    self.default_required_staff = DEFAULT_REQUIRED_STAFF
-    self.shift_codes = self._build_shift_codes()
-    self.shift_code_set = {code.upper() for code in self.shift_codes}
-    self.solver = pywraplp.Solver.CreateSolver("CBC_MIXED_INTEGER_PROGRAMMING")
-    if not self.solver:
-      raise RuntimeError("Failed to initialize CBC solver")
-    self.variables: Dict[Tuple[str, str, str], pywraplp.Variable] = {}
-    self.variable_name_map: Dict[str, Tuple[str, str, str]] = {}
-    self.staffing_requirements: Dict[Tuple[str, str], int] = {}
-    self.shift_min_staff: Dict[str, int] = {}
-    self.shift_max_staff: Dict[str, int] = {}
-    self.team_slacks: Dict[Tuple[str, str, str], pywraplp.Variable] = {}
-    self.team_requirements: Dict[Tuple[str, str, str], int] = {}
-    self.special_request_slacks: Dict[Tuple[str, str, str], pywraplp.Variable] = {}
-    self.career_group_slacks: Dict[Tuple[str, str, str], pywraplp.Variable] = {}
-    self.off_balance_slacks: List[pywraplp.Variable] = []
-    self.off_count_vars: Dict[str, pywraplp.Variable] = {}
-    self.shift_repeat_entries: List[Dict[str, Any]] = []
-    self.rest_after_night_entries: List[Dict[str, Any]] = []
-    self.shift_balance_entries: List[Dict[str, Any]] = []
-    self.preference_penalty_map: Dict[Tuple[str, str, str], float] = {}
-    self.team_total_vars: Dict[str, pywraplp.Variable] = {}
-    self.team_balance_entries: List[Dict[str, Any]] = []
-    self.team_ids: List[str] = sorted(
-      {emp.teamId for emp in self.schedule.employees if getattr(emp, "teamId", None)}
-    )
-    self.team_members_map: Dict[str, List[Any]] = {}
-    for emp in self.schedule.employees:
-      if emp.teamId:
-        self.team_members_map.setdefault(emp.teamId, []).append(emp)
-    self.career_group_aliases: List[str] = sorted(
-      {emp.careerGroupAlias for emp in self.schedule.employees if getattr(emp, "careerGroupAlias", None)}
-    )
-    self.career_group_total_vars: Dict[str, pywraplp.Variable] = {}
-    self.career_group_balance_slacks: List[pywraplp.Variable] = []
-    self.holiday_set = {holiday.date for holiday in (schedule.holidays or [])}
-    self.team_coverage_shift_codes = {
-      code
-      for code, value in self.required_staff_map.items()
-      if value and code not in {"O", "A"}
-    }
-    self.career_group_balance_shift_codes = {
-      code
-      for code, value in self.required_staff_map.items()
-      if value and code not in {"O", "A", "N"}
-    }
-    for shift in self.schedule.shifts:
-      code = (shift.code or shift.name or shift.id).upper()
-      if shift.minStaff is not None:
-        self.shift_min_staff[code] = max(0, int(shift.minStaff))
-      if shift.maxStaff is not None:
-        self.shift_max_staff[code] = max(0, int(shift.maxStaff))
-    self.max_same_shift = self._get_max_same_shift()
-    self.shift_balance_tolerance = self._get_shift_balance_tolerance()
-    self.required_off = self._calculate_required_off_days()
-    self.preflight_issues = self._run_preflight_checks()
-    self._init_preference_penalties()
-    self.total_staff_capacity = 0
-    self.off_like_codes = self._build_off_like_codes()
-    self.daily_balance_config = self._get_daily_balance_config()
-    self.daily_balance_entries: List[Dict[str, Any]] = []
-
-  def _build_date_range(self) -> List[date]:
-    current = self.schedule.startDate
-    dates: List[date] = []
-    while current <= self.schedule.endDate:
-      dates.append(current)
-      current += timedelta(days=1)
-    return dates
-
-  @staticmethod
-  def _sanitize_shift_code(code: Optional[str]) -> Optional[str]:
-    if not code:
-      return None
-    normalized = code.replace("^", "").strip().upper()
-    return normalized or None
-
-  @staticmethod
-  def _normalize_day_key(raw: str) -> str:
-    try:
-      return date.fromisoformat(raw).isoformat()
-    except ValueError:
-      return raw
-
-  def _build_special_request_targets(self) -> Set[Tuple[str, str, str]]:
-    targets: Set[Tuple[str, str, str]] = set()
-    for request in self.schedule.specialRequests or []:
-      shift_code = self._sanitize_shift_code(request.shiftTypeCode)
-      if not shift_code:
-        continue
-      day_key = self._normalize_day_key(request.date)
-      targets.add((request.employeeId, day_key, shift_code))
-    return targets
-
-  def _build_required_staff_map(self) -> Dict[str, int]:
-    required: Dict[str, int] = {}
-    raw_required = self.schedule.requiredStaffPerShift or {}
-    for code, value in raw_required.items():
-      if not code:
-        continue
-      try:
-        parsed = int(value)
-      except (TypeError, ValueError):
-        continue
-      required[code.upper()] = max(0, parsed)
-    for code, default_value in DEFAULT_REQUIRED_STAFF.items():
-      required.setdefault(code, default_value)
-    return required
-
-  def _build_shift_codes(self) -> List[str]:
-    codes: Set[str] = {
-      code for code, value in self.required_staff_map.items() if value and value > 0
-    }
-    if any(emp.workPatternType == "weekday-only" for emp in self.schedule.employees):
-      codes.add("A")
-    codes.add("O")
-    codes.update(self.special_request_codes)
-    return sorted(codes)
-
-  def _var_name(self, employee_id: str, date_key: str, shift_code: str) -> str:
-    safe_emp = employee_id.replace("-", "_")
-    safe_date = date_key.replace("-", "_")
-    safe_shift = shift_code.replace("-", "_")
-    return f"x_{safe_emp}_{safe_date}_{safe_shift}"
-
-  def _get_shift_id(self, shift_code: str) -> str:
-    upper = shift_code.upper()
-    for shift in self.schedule.shifts:
-      code = (shift.code or shift.name or "").upper()
-      if code == upper:
-        return shift.id
-    return f"shift-{upper.lower()}"
-
-  @staticmethod
-  def _is_weekend(day: date) -> bool:
-    return day.weekday() >= 5
-
-  def _is_weekend_or_holiday(self, day: date) -> bool:
-    return self._is_weekend(day) or day.isoformat() in self.holiday_set
-
-  def _is_shift_allowed(self, emp, day: date, shift_code: str) -> bool:
-    upper = shift_code.replace("^", "").upper()
-    if upper == "V":
-      return True
-    if emp.workPatternType == "night-intensive":
-      return upper in ("N", "O", "V")
-    if emp.workPatternType == "weekday-only":
-      if self._is_weekend_or_holiday(day):
-        return upper in ("O", "V")
-      return upper in ("A", "V")
-    if upper == "A":
-      return False
-    return True
-
-  def _calculate_required_off_days(self) -> Dict[str, int]:
-    required: Dict[str, int] = {}
-    weekend_holiday_count = sum(1 for day in self.date_range if self._is_weekend_or_holiday(day))
-    night_bonus = max(0, int(getattr(self.schedule, "nightIntensivePaidLeaveDays", 0) or 0))
-    for emp in self.schedule.employees:
-      base = max(0, self.schedule.previousOffAccruals.get(emp.id, 0))
-      if emp.workPatternType == "three-shift":
-        target = weekend_holiday_count + base
-        if target > 0:
-          required[emp.id] = target
-      elif emp.workPatternType == "night-intensive":
-        target = weekend_holiday_count + base + night_bonus
-        if target > 0:
-          required[emp.id] = target
-    return required
-
-  def _get_max_same_shift(self) -> int:
-    raw = self.csp_options.get("maxSameShift")
-    try:
-      parsed = int(raw)
-      return max(1, min(parsed, 10))
-    except (TypeError, ValueError):
-      return 2
-
-  def _get_shift_balance_tolerance(self) -> int:
-    raw = self.csp_options.get("shiftBalanceTolerance")
-    try:
-      parsed = int(raw)
-      return max(1, min(parsed, 20))
-    except (TypeError, ValueError):
-      return 4
-
-  def _build_off_like_codes(self) -> Set[str]:
-    codes: Set[str] = {"O", "V"}
-    for shift in self.schedule.shifts:
-      code = (shift.code or shift.name or shift.id).upper()
-      if shift.type in {"off", "leave"}:
-        codes.add(code)
-    return codes
-
-  def _get_daily_balance_config(self) -> Dict[str, Any]:
-    options = getattr(self.schedule, "options", {}) or {}
-    cfg = options.get("dailyStaffingBalance", {}) or {}
-    return {
-      "enabled": bool(cfg.get("enabled", True)),
-      "targetMode": cfg.get("targetMode", "auto"),
-      "targetValue": cfg.get("targetValue"),
-      "tolerance": float(cfg.get("tolerance", 2)),
-      "weight": float(cfg.get("weight", self.constraint_weights.get("dailyBalance", 1.0) or 1.0)),
-      "weekendScale": float(cfg.get("weekendScale", 1)),
-    }
-
-  def _daily_target_for_day(self, day: date) -> float:
-    mode = self.daily_balance_config.get("targetMode", "auto")
-    manual = self.daily_balance_config.get("targetValue")
-    if mode == "manual" and isinstance(manual, (int, float)) and manual >= 0:
-      base_target = float(manual)
-    else:
-      total_days = max(1, len(self.date_range))
-      total_required_off = sum(self.required_off.values())
-      base_target = max(
-        0.0,
-        (len(self.schedule.employees) * total_days - total_required_off) / total_days,
-      )
-    if self._is_weekend_or_holiday(day):
-      return base_target * float(self.daily_balance_config.get("weekendScale", 1) or 1)
-    return base_target
-
-  def _create_variables(self):
-    for emp in self.schedule.employees:
-      for day in self.date_range:
-        day_key = day.isoformat()
-        for code in self.shift_codes:
-          var = self.solver.BoolVar(self._var_name(emp.id, day_key, code))
-          self.variables[(emp.id, day_key, code)] = var
-          self.variable_name_map[var.name()] = (emp.id, day_key, code)
-
-  def _init_preference_penalties(self):
-    team_pattern = getattr(self.schedule, "teamPattern", None)
-    pattern_sequence: List[str] = []
-    if team_pattern and getattr(team_pattern, "pattern", None):
-      pattern_sequence = [
-        str(code).upper() for code in team_pattern.pattern if isinstance(code, str) and code.strip()
-      ]
-    team_pattern_penalty = 40.0
-    preference_penalty_base = 20.0
-    for day_index, day in enumerate(self.date_range):
-      day_key = day.isoformat()
-      expected_shift = None
-      if pattern_sequence:
-        expected_shift = pattern_sequence[day_index % len(pattern_sequence)]
-      for emp in self.schedule.employees:
-        pref_map: Dict[str, float] = {}
-        if emp.preferredShiftTypes:
-          pref_map = {
-            key.upper(): float(value)
-            for key, value in emp.preferredShiftTypes.items()
-            if isinstance(key, str) and isinstance(value, (int, float))
-          }
-        for code in self.shift_codes:
-          upper = code.upper()
-          penalty = 0.0
-          if expected_shift and emp.workPatternType == "three-shift":
-            if upper != expected_shift:
-              penalty += team_pattern_penalty
-          if pref_map:
-            weight = pref_map.get(upper)
-            if weight is not None:
-              penalty += max(0.0, 1.0 - max(0.0, min(1.0, weight))) * preference_penalty_base
-          if penalty > 0:
-            self.preference_penalty_map[(emp.id, day_key, upper)] = penalty
-
-  def _add_daily_assignment_constraints(self):
-    for emp in self.schedule.employees:
-      for day in self.date_range:
-        day_key = day.isoformat()
-        constraint = self.solver.RowConstraint(1, 1, f"daily_{emp.id}_{day_key}")
-        for code in self.shift_codes:
-          constraint.SetCoefficient(self.variables[(emp.id, day_key, code)], 1)
-
-  def _add_special_request_constraints(self):
-    for req_index, req in enumerate(self.schedule.specialRequests or []):
-      if not req.shiftTypeCode:
-        continue
-      target_code = self._sanitize_shift_code(req.shiftTypeCode)
-      if not target_code:
-        continue
-      day_key = self._normalize_day_key(req.date)
-      var = self.variables.get((req.employeeId, day_key, target_code))
-      if not var:
-        continue
-      slack = self.solver.BoolVar(f"special_req_slack_{req.employeeId}_{day_key}_{target_code}_{req_index}")
-      constraint = self.solver.RowConstraint(1, self.solver.infinity(), f"special_req_{req.employeeId}_{day_key}_{target_code}")
-      constraint.SetCoefficient(var, 1)
-      constraint.SetCoefficient(slack, 1)
-      self.special_request_slacks[(req.employeeId, day_key, target_code)] = slack
-
-  def _restrict_special_only_shifts(self):
-    special_only_codes = {
-      code for code in self.special_request_codes if code not in self.required_staff_map and code not in {"A", "O"}
-    }
-    if not special_only_codes:
-      return
-    for emp in self.schedule.employees:
-      for day in self.date_range:
-        day_key = day.isoformat()
-        for code in special_only_codes:
-          if (emp.id, day_key, code) in self.special_request_targets:
-            continue
-          var = self.variables.get((emp.id, day_key, code))
-          if var:
-            self.solver.Add(var == 0)
-
-  def _add_pattern_constraints(self):
-    for emp in self.schedule.employees:
-      for day in self.date_range:
-        day_key = day.isoformat()
-        for code in self.shift_codes:
-          var = self.variables[(emp.id, day_key, code)]
-          if not self._is_shift_allowed(emp, day, code):
-            self.solver.Add(var == 0)
-
-  def _add_avoid_pattern_constraints(self):
-    team_pattern = getattr(self.schedule, "teamPattern", None)
-    avoid_patterns = getattr(team_pattern, "avoidPatterns", None) if team_pattern else None
-    if not avoid_patterns:
-      return
-    normalized_patterns: List[List[str]] = []
-    for pattern in avoid_patterns:
-      if not isinstance(pattern, list):
-        continue
-      normalized = [str(code).upper() for code in pattern if isinstance(code, str) and code.strip()]
-      if normalized:
-        normalized_patterns.append(normalized)
-    if not normalized_patterns:
-      return
-    for emp in self.schedule.employees:
-      for pattern in normalized_patterns:
-        pattern_length = len(pattern)
-        if pattern_length > len(self.date_range):
-          continue
-        for start in range(0, len(self.date_range) - pattern_length + 1):
-          constraint = self.solver.RowConstraint(-self.solver.infinity(), pattern_length - 1, f"avoid_{emp.id}_{pattern_length}_{start}")
-          for offset, code in enumerate(pattern):
-            day_key = self.date_range[start + offset].isoformat()
-            var = self.variables.get((emp.id, day_key, code))
-            if var:
-              constraint.SetCoefficient(var, 1)
-
-  def _add_staffing_constraints(self):
-    self.total_staff_capacity = 0
-    required = self.required_staff_map
-    for day in self.date_range:
-      day_key = day.isoformat()
-      for code in self.shift_codes:
-        upper = code.upper()
-        eligible_count = sum(1 for emp in self.schedule.employees if self._is_shift_allowed(emp, day, code))
-        min_required = required.get(upper)
-        if min_required is None:
-          min_required = self.shift_min_staff.get(upper)
-        if min_required is None:
-          min_required = self.default_required_staff.get(upper)
-        if min_required is not None and eligible_count == 0:
-          min_required = None
-        max_allowed = self.shift_max_staff.get(upper)
-        if min_required is not None:
-          if max_allowed is None:
-            max_allowed = min_required
-          else:
-            max_allowed = max(max_allowed, min_required)
-        if min_required is None and max_allowed is None:
-          continue
-        lower_bound = min_required if min_required is not None else 0
-        upper_bound = max_allowed if max_allowed is not None else self.solver.infinity()
-        constraint = self.solver.RowConstraint(lower_bound, upper_bound, f"staff_{day_key}_{code}")
-        for emp in self.schedule.employees:
-          constraint.SetCoefficient(self.variables[(emp.id, day_key, code)], 1)
-        if min_required is not None and min_required > 0:
-          self.staffing_requirements[(day_key, code)] = min_required
-        if upper_bound < self.solver.infinity():
-          self.total_staff_capacity += upper_bound
+    self.preflight_issues = list(self.model_ir.preflight_issues)
 
-  def _add_team_coverage_constraints(self):
-    if not self.team_ids:
-      return
-    for day in self.date_range:
-      day_key = day.isoformat()
-      for code in self.shift_codes:
-        for team_id in self.team_ids:
-          if code.upper() not in self.team_coverage_shift_codes:
-            continue
-          eligible = [
-            emp for emp in self.schedule.employees if emp.teamId == team_id and self._is_shift_allowed(emp, day, code)
-          ]
-          if not eligible:
-            continue
-          constraint = self.solver.RowConstraint(1, self.solver.infinity(), f"team_cover_{day_key}_{code}_{team_id}")
-          for emp in eligible:
-            constraint.SetCoefficient(self.variables[(emp.id, day_key, code)], 1)
-          slack_var = self.solver.IntVar(0, self.solver.infinity(), f"team_cover_slack_{day_key}_{code}_{team_id}")
-          constraint.SetCoefficient(slack_var, 1)
-          self.team_slacks[(day_key, code, team_id)] = slack_var
-          self.team_requirements[(day_key, code, team_id)] = 1
-
-  def _add_career_group_constraints(self):
-    if not self.career_group_aliases:
-      return
-    for day in self.date_range:
-      day_key = day.isoformat()
-      for code in self.shift_codes:
-        if code.upper() not in self.team_coverage_shift_codes:
-          continue
-        for group_alias in self.career_group_aliases:
-          eligible = [
-            emp
-            for emp in self.schedule.employees
-            if emp.careerGroupAlias == group_alias and self._is_shift_allowed(emp, day, code)
-          ]
-          if not eligible:
-            continue
-          constraint = self.solver.RowConstraint(
-            1, self.solver.infinity(), f"career_cover_{day_key}_{code}_{group_alias}"
-          )
-          for emp in eligible:
-            constraint.SetCoefficient(self.variables[(emp.id, day_key, code)], 1)
-          slack_var = self.solver.IntVar(
-            0, self.solver.infinity(), f"career_cover_slack_{day_key}_{code}_{group_alias}"
-          )
-          constraint.SetCoefficient(slack_var, 1)
-          self.career_group_slacks[(day_key, code, group_alias)] = slack_var
-  def _add_career_group_balance_constraints(self, tolerance: int = 1):
-    if len(self.career_group_aliases) < 2 or not self.career_group_balance_shift_codes:
-      return
-    total_days = len(self.date_range)
-    max_assignments = total_days * len(self.schedule.employees)
-    for alias in self.career_group_aliases:
-      total_var = self.solver.IntVar(0, max_assignments, f"career_group_total_{alias}")
-      self.career_group_total_vars[alias] = total_var
-      equality = self.solver.RowConstraint(0, 0, f"career_group_total_eq_{alias}")
-      for emp in self.schedule.employees:
-        if emp.careerGroupAlias != alias:
-          continue
-        for day in self.date_range:
-          day_key = day.isoformat()
-          for code in self.career_group_balance_shift_codes:
-            var = self.variables.get((emp.id, day_key, code))
-            if var:
-              equality.SetCoefficient(var, 1)
-      equality.SetCoefficient(total_var, -1)
-    for i in range(len(self.career_group_aliases)):
-      for j in range(i + 1, len(self.career_group_aliases)):
-        alias_i = self.career_group_aliases[i]
-        alias_j = self.career_group_aliases[j]
-        slack_ij = self.solver.IntVar(0, self.solver.infinity(), f"career_group_balance_{alias_i}_{alias_j}")
-        constraint_ij = self.solver.RowConstraint(
-          -self.solver.infinity(), tolerance, f"career_group_balance_constraint_{alias_i}_{alias_j}"
-        )
-        constraint_ij.SetCoefficient(self.career_group_total_vars[alias_i], 1)
-        constraint_ij.SetCoefficient(self.career_group_total_vars[alias_j], -1)
-        constraint_ij.SetCoefficient(slack_ij, -1)
-        self.career_group_balance_slacks.append(slack_ij)
-        slack_ji = self.solver.IntVar(0, self.solver.infinity(), f"career_group_balance_{alias_j}_{alias_i}")
-        constraint_ji = self.solver.RowConstraint(
-          -self.solver.infinity(), tolerance, f"career_group_balance_constraint_{alias_j}_{alias_i}"
-        )
-        constraint_ji.SetCoefficient(self.career_group_total_vars[alias_j], 1)
-        constraint_ji.SetCoefficient(self.career_group_total_vars[alias_i], -1)
-        constraint_ji.SetCoefficient(slack_ji, -1)
-        self.career_group_balance_slacks.append(slack_ji)
-
-  def _add_team_balance_constraints(self, tolerance: int = 2):
-    if len(self.team_ids) < 2:
+  def build_model(self):
+    if self.built:
       return
-    total_days = len(self.date_range)
-    relevant_shifts = {code for code in self.shift_codes if code.upper() not in {"O", "A"}}
-    for team_id in self.team_ids:
-      total_var = self.solver.IntVar(0, len(self.schedule.employees) * total_days, f"team_total_{team_id}")
-      self.team_total_vars[team_id] = total_var
-      equality = self.solver.RowConstraint(0, 0, f"team_total_eq_{team_id}")
-      for emp in self.schedule.employees:
-        if emp.teamId != team_id:
-          continue
-        for day in self.date_range:
-          day_key = day.isoformat()
-          for code in relevant_shifts:
-            var = self.variables.get((emp.id, day_key, code))
-            if var:
-              equality.SetCoefficient(var, 1)
-      equality.SetCoefficient(total_var, -1)
-    for i in range(len(self.team_ids)):
-      for j in range(i + 1, len(self.team_ids)):
-        team_i = self.team_ids[i]
-        team_j = self.team_ids[j]
-        slack_ij = self.solver.IntVar(0, self.solver.infinity(), f"team_balance_{team_i}_{team_j}")
-        constraint_ij = self.solver.RowConstraint(-self.solver.infinity(), tolerance, f"team_balance_constraint_{team_i}_{team_j}")
-        constraint_ij.SetCoefficient(self.team_total_vars[team_i], 1)
-        constraint_ij.SetCoefficient(self.team_total_vars[team_j], -1)
-        constraint_ij.SetCoefficient(slack_ij, -1)
-        self.team_balance_entries.append(
-          {
-            "var": slack_ij,
-            "teamA": team_i,
-            "teamB": team_j,
-            "tolerance": tolerance,
-          }
-        )
-        slack_ji = self.solver.IntVar(0, self.solver.infinity(), f"team_balance_{team_j}_{team_i}")
-        constraint_ji = self.solver.RowConstraint(-self.solver.infinity(), tolerance, f"team_balance_constraint_{team_j}_{team_i}")
-        constraint_ji.SetCoefficient(self.team_total_vars[team_j], 1)
-        constraint_ji.SetCoefficient(self.team_total_vars[team_i], -1)
-        constraint_ji.SetCoefficient(slack_ji, -1)
-        self.team_balance_entries.append(
-          {
-            "var": slack_ji,
-            "teamA": team_j,
-            "teamB": team_i,
-            "tolerance": tolerance,
-          }
-        )
-
-  def _add_off_day_constraints(self):
-    total_assignments = len(self.schedule.employees) * len(self.date_range)
-    off_eligible_count = sum(1 for emp in self.schedule.employees if emp.workPatternType != "weekday-only")
-    off_per_employee_hint = 0
-    if off_eligible_count > 0:
-      off_per_employee_hint = math.ceil(max(0, total_assignments - self.total_staff_capacity) / off_eligible_count)
-
-    for emp in self.schedule.employees:
-      off_count_var = self.solver.IntVar(0, len(self.date_range), f"off_count_{emp.id}")
-      self.off_count_vars[emp.id] = off_count_var
-      equality = self.solver.RowConstraint(0, 0, f"offcount_eq_{emp.id}")
-      for day in self.date_range:
-        day_key = day.isoformat()
-        off_var = self.variables[(emp.id, day_key, "O")]
-        equality.SetCoefficient(off_var, 1)
-        vacation_var = self.variables.get((emp.id, day_key, "V"))
-        if vacation_var:
-          equality.SetCoefficient(vacation_var, 1)
-      equality.SetCoefficient(off_count_var, -1)
-      target = self.required_off.get(emp.id)
-      if target is None:
+    ir = self.model_ir
+    infinity = self.solver.infinity()
+    for name, lb, ub, integer, fixed in zip(ir.var_names, ir.var_lb, ir.var_ub, ir.var_integer, ir.var_fixed):
+      if fixed is not None:
+        self.vars.append(None)
         continue
-      if emp.workPatternType == "night-intensive":
-        constraint = self.solver.RowConstraint(target, self.solver.infinity(), f"offdays_{emp.id}")
-      elif emp.workPatternType == "three-shift":
-        lower_bound = max(0, target - 2)
-        upper_bound = max(target + 2, off_per_employee_hint, lower_bound)
-        upper_bound = min(upper_bound, len(self.date_range))
-        constraint = self.solver.RowConstraint(lower_bound, upper_bound, f"offdays_{emp.id}")
+      self.vars.append(self.solver.Var(lb, ub if ub != INF else infinity, integer, name))
+    for position, name in enumerate(ir.row_names):
+      if self.lazy and name.startswith(LAZY_ROW_PREFIXES):
+        self.pending_rows.append(position)
       else:
-        lower_bound = max(0, target - 2)
-        upper_bound = max(target + 2, off_per_employee_hint, lower_bound)
-        upper_bound = min(upper_bound, len(self.date_range))
-        constraint = self.solver.RowConstraint(lower_bound, upper_bound, f"offdays_{emp.id}")
-      for day in self.date_range:
-        day_key = day.isoformat()
-        var = self.variables[(emp.id, day_key, "O")]
-        constraint.SetCoefficient(var, 1)
-        vacation_var = self.variables.get((emp.id, day_key, "V"))
-        if vacation_var:
-          constraint.SetCoefficient(vacation_var, 1)
-
-  def _add_off_balance_constraints(self, tolerance: int = 2):
-    for team_id, members in self.team_members_map.items():
-      if len(members) < 2:
-        continue
-      for i in range(len(members)):
-        for j in range(i + 1, len(members)):
-          emp_a = members[i]
-          emp_b = members[j]
-          if emp_a.id not in self.off_count_vars or emp_b.id not in self.off_count_vars:
-            continue
-          slack_ab = self.solver.IntVar(0, self.solver.infinity(), f"off_balance_{team_id}_{emp_a.id}_{emp_b.id}")
-          constraint_ab = self.solver.RowConstraint(
-            -self.solver.infinity(), tolerance, f"off_balance_constraint_{team_id}_{emp_a.id}_{emp_b.id}"
-          )
-          constraint_ab.SetCoefficient(self.off_count_vars[emp_a.id], 1)
-          constraint_ab.SetCoefficient(self.off_count_vars[emp_b.id], -1)
-          constraint_ab.SetCoefficient(slack_ab, -1)
-          self.off_balance_slacks.append(slack_ab)
-          slack_ba = self.solver.IntVar(0, self.solver.infinity(), f"off_balance_{team_id}_{emp_b.id}_{emp_a.id}")
-          constraint_ba = self.solver.RowConstraint(
-            -self.solver.infinity(), tolerance, f"off_balance_constraint_{team_id}_{emp_b.id}_{emp_a.id}"
-          )
-          constraint_ba.SetCoefficient(self.off_count_vars[emp_b.id], 1)
-          constraint_ba.SetCoefficient(self.off_count_vars[emp_a.id], -1)
-          constraint_ba.SetCoefficient(slack_ba, -1)
-          self.off_balance_slacks.append(slack_ba)
-
-  def _add_daily_headcount_balance_constraints(self):
-    if not self.daily_balance_config.get("enabled", True):
-      return
-    tolerance = max(0.0, float(self.daily_balance_config.get("tolerance", 0)))
-    for day in self.date_range:
-      day_key = day.isoformat()
-      work_vars = [
-        var
-        for (emp_id, key, code), var in self.variables.items()
-        if key == day_key and code.upper() not in self.off_like_codes
-      ]
-      if not work_vars:
-        continue
-      total_var = self.solver.IntVar(0, len(self.schedule.employees), f"daily_total_{day_key}")
-      total_constraint = self.solver.RowConstraint(0, 0, f"daily_total_eq_{day_key}")
-      total_constraint.SetCoefficient(total_var, 1)
-      for var in work_vars:
-        total_constraint.SetCoefficient(var, -1)
-
-      target = float(self._daily_target_for_day(day))
-      over_slack = self.solver.NumVar(0, self.solver.infinity(), f"daily_over_{day_key}")
-      under_slack = self.solver.NumVar(0, self.solver.infinity(), f"daily_under_{day_key}")
-
-      upper_constraint = self.solver.RowConstraint(-self.solver.infinity(), target + tolerance, f"daily_upper_{day_key}")
-      upper_constraint.SetCoefficient(total_var, 1)
-      upper_constraint.SetCoefficient(over_slack, -1)
-
-      lower_constraint = self.solver.RowConstraint(target - tolerance, self.solver.infinity(), f"daily_lower_{day_key}")
-      lower_constraint.SetCoefficient(total_var, 1)
-      lower_constraint.SetCoefficient(under_slack, 1)
-
-      self.daily_balance_entries.append(
-        {
-          "day": day_key,
-          "target": target,
-          "tolerance": tolerance,
-          "over_var": over_slack,
-          "under_var": under_slack,
-          "total_var": total_var,
-        }
-      )
-
-  def _add_shift_repeat_constraints(self, max_same_shift: int = 2):
-    window = max_same_shift + 1
-    for emp in self.schedule.employees:
-      if window > len(self.date_range):
-        continue
-      for code in self.shift_codes:
-        upper = code.upper()
-        if upper in {"O"}:
-          continue
-        for start in range(0, len(self.date_range) - window + 1):
-          constraint = self.solver.RowConstraint(
-            -self.solver.infinity(), max_same_shift, f"repeat_{emp.id}_{upper}_{start}"
-          )
-          has_var = False
-          for offset in range(window):
-            day_key = self.date_range[start + offset].isoformat()
-            var = self.variables.get((emp.id, day_key, code))
-            if not var:
-              continue
-            has_var = True
-            constraint.SetCoefficient(var, 1)
-          if not has_var:
-            continue
-          slack = self.solver.IntVar(0, self.solver.infinity(), f"repeat_slack_{emp.id}_{upper}_{start}")
-          constraint.SetCoefficient(slack, -1)
-          self.shift_repeat_entries.append(
-            {
-              "employeeId": emp.id,
-              "shiftType": upper,
-              "startDate": self.date_range[start].isoformat(),
-              "window": window,
-              "var": slack,
-            }
-          )
-
-  def _add_consecutive_constraints(self):
-    total_days = len(self.date_range)
-    for emp in self.schedule.employees:
-      max_consecutive_days = getattr(emp, "maxConsecutiveDaysPreferred", None)
-      if isinstance(max_consecutive_days, int) and max_consecutive_days >= 0:
-        window = max_consecutive_days + 1
-        if window <= total_days:
-          for start in range(0, total_days - max_consecutive_days):
-            constraint = self.solver.RowConstraint(
-              1, self.solver.infinity(), f"max_consecutive_work_{emp.id}_{start}"
-            )
-            for offset in range(window):
-              day_key = self.date_range[start + offset].isoformat()
-              constraint.SetCoefficient(self.variables[(emp.id, day_key, "O")], 1)
-      max_consecutive_nights = getattr(emp, "maxConsecutiveNightsPreferred", None)
-      if (
-        isinstance(max_consecutive_nights, int)
-        and max_consecutive_nights >= 0
-        and "N" in self.shift_code_set
-      ):
-        window = max_consecutive_nights + 1
-        if window <= total_days:
-          for start in range(0, total_days - max_consecutive_nights):
-            constraint = self.solver.RowConstraint(
-              0, max_consecutive_nights, f"max_consecutive_nights_{emp.id}_{start}"
-            )
-            for offset in range(window):
-              day_key = self.date_range[start + offset].isoformat()
-              night_var = self.variables.get((emp.id, day_key, "N"))
-              if night_var:
-                constraint.SetCoefficient(night_var, 1)
-
-  def _add_night_intensive_pattern_constraints(self):
-    total_days = len(self.date_range)
-    if total_days == 0:
-      return
-    for emp in self.schedule.employees:
-      if emp.workPatternType != "night-intensive":
-        continue
-      if total_days >= 4:
-        for start in range(0, total_days - 3):
-          constraint = self.solver.RowConstraint(-self.solver.infinity(), 3, f"night_limit_{emp.id}_{start}")
-          slack = self.solver.IntVar(0, self.solver.infinity(), f"night_limit_slack_{emp.id}_{start}")
-          for offset in range(4):
-            day_key = self.date_range[start + offset].isoformat()
-            night_var = self.variables.get((emp.id, day_key, "N"))
-            if night_var:
-              constraint.SetCoefficient(night_var, 1)
-          constraint.SetCoefficient(slack, -1)
-          self.shift_repeat_entries.append(
-            {
-              "employeeId": emp.id,
-              "shiftType": "N",
-              "startDate": self.date_range[start].isoformat(),
-              "window": 4,
-              "var": slack,
-            }
-          )
-      if total_days >= 5:
-        for start in range(0, total_days - 4):
-          constraint = self.solver.RowConstraint(2, self.solver.infinity(), f"night_off_buffer_{emp.id}_{start}")
-          slack = self.solver.IntVar(0, self.solver.infinity(), f"night_off_slack_{emp.id}_{start}")
-          for offset in range(5):
-            day_key = self.date_range[start + offset].isoformat()
-            off_var = self.variables.get((emp.id, day_key, "O"))
-            if off_var:
-              constraint.SetCoefficient(off_var, 1)
-          constraint.SetCoefficient(slack, 1)
-          self.shift_repeat_entries.append(
-            {
-              "employeeId": emp.id,
-              "shiftType": "O",
-              "startDate": self.date_range[start].isoformat(),
-              "window": 5,
-              "var": slack,
-            }
-          )
-
-  def _add_shift_balance_constraints(self, tolerance: Optional[int] = None):
-    effective_tolerance = tolerance if tolerance is not None else self.shift_balance_tolerance
-    core_shifts = [code for code in ("D", "E", "N") if code in self.shift_code_set]
-    if len(core_shifts) < 2:
-      return
-    total_days = len(self.date_range)
-    for emp in self.schedule.employees:
-      if emp.workPatternType != "three-shift":
-        continue
-      counts: Dict[str, pywraplp.Variable] = {}
-      for code in core_shifts:
-        count_var = self.solver.IntVar(0, total_days, f"shift_count_{emp.id}_{code}")
-        counts[code] = count_var
-        equality = self.solver.RowConstraint(0, 0, f"shift_count_eq_{emp.id}_{code}")
-        for day in self.date_range:
-          day_key = day.isoformat()
-          var = self.variables.get((emp.id, day_key, code))
-          if var:
-            equality.SetCoefficient(var, 1)
-        equality.SetCoefficient(count_var, -1)
-      for i in range(len(core_shifts)):
-        for j in range(i + 1, len(core_shifts)):
-          code_i = core_shifts[i]
-          code_j = core_shifts[j]
-          slack_ij = self.solver.IntVar(0, self.solver.infinity(), f"shift_balance_{emp.id}_{code_i}_{code_j}")
-          constraint_ij = self.solver.RowConstraint(-self.solver.infinity(), effective_tolerance, f"shift_balance_constraint_{emp.id}_{code_i}_{code_j}")
-          constraint_ij.SetCoefficient(counts[code_i], 1)
-          constraint_ij.SetCoefficient(counts[code_j], -1)
-          constraint_ij.SetCoefficient(slack_ij, -1)
-          self.shift_balance_entries.append(
-            {
-              "var": slack_ij,
-              "employeeId": emp.id,
-              "shiftA": code_i,
-              "shiftB": code_j,
-              "tolerance": effective_tolerance,
-            }
-          )
-          slack_ji = self.solver.IntVar(0, self.solver.infinity(), f"shift_balance_{emp.id}_{code_j}_{code_i}")
-          constraint_ji = self.solver.RowConstraint(-self.solver.infinity(), effective_tolerance, f"shift_balance_constraint_{emp.id}_{code_j}_{code_i}")
-          constraint_ji.SetCoefficient(counts[code_j], 1)
-          constraint_ji.SetCoefficient(counts[code_i], -1)
-          constraint_ji.SetCoefficient(slack_ji, -1)
-          self.shift_balance_entries.append(
-            {
-              "var": slack_ji,
-              "employeeId": emp.id,
-              "shiftA": code_j,
-              "shiftB": code_i,
-              "tolerance": effective_tolerance,
-            }
-          )
-
-  def _add_rest_after_night_constraints(self):
-    if "N" not in self.shift_code_set:
-      return
-    for emp in self.schedule.employees:
-      for day_index, day in enumerate(self.date_range[:-1]):
-        day_key = day.isoformat()
-        next_key = self.date_range[day_index + 1].isoformat()
-        night_var = self.variables.get((emp.id, day_key, "N"))
-        if not night_var:
-          continue
-        for early_shift in ("D", "E"):
-          next_var = self.variables.get((emp.id, next_key, early_shift))
-          if not next_var:
-            continue
-          slack = self.solver.IntVar(0, 1, f"rest_after_night_{emp.id}_{day_key}_{early_shift}")
-          constraint = self.solver.RowConstraint(-self.solver.infinity(), 1, f"rest_after_night_{emp.id}_{day_key}_{early_shift}")
-          constraint.SetCoefficient(night_var, 1)
-          constraint.SetCoefficient(next_var, 1)
-          constraint.SetCoefficient(slack, -1)
-          self.rest_after_night_entries.append(
-            {
-              "employeeId": emp.id,
-              "shiftType": f"N->{early_shift}",
-              "startDate": day_key,
-              "window": 2,
-              "var": slack,
-            }
-          )
-
-  def _run_preflight_checks(self) -> List[Dict[str, Any]]:
-    issues: List[Dict[str, Any]] = []
-    required = {code: value for code, value in self.required_staff_map.items() if value and value > 0}
-    employee_map = {emp.id: emp for emp in self.schedule.employees}
-    total_days = len(self.date_range)
-
-    for emp in self.schedule.employees:
-      target = self.required_off.get(emp.id)
-      if target and target > total_days:
-        issues.append(
-          {
-            "type": "offRequirementImpossible",
-            "employeeId": emp.id,
-            "requiredOffDays": target,
-            "availableDays": total_days,
-          }
-        )
-
-    for day in self.date_range:
-      day_key = day.isoformat()
-      for code, min_required in required.items():
-        available = sum(1 for emp in self.schedule.employees if self._is_shift_allowed(emp, day, code))
-        if available < min_required:
-          issues.append(
-            {
-              "type": "insufficientPotentialStaff",
-              "date": day_key,
-              "shiftType": code.upper(),
-              "required": min_required,
-              "available": available,
-            }
-          )
-        for team_id in self.team_ids:
-          if code.upper() not in self.team_coverage_shift_codes:
-            continue
-          team_available = sum(
-            1
-            for emp in self.schedule.employees
-            if emp.teamId == team_id and self._is_shift_allowed(emp, day, code)
-          )
-          if team_available == 0:
-            issues.append(
-              {
-                "type": "teamCoverageImpossible",
-                "date": day_key,
-                "shiftType": code.upper(),
-                "teamId": team_id,
-              }
-            )
-        for group_alias in self.career_group_aliases:
-          if code.upper() not in self.team_coverage_shift_codes:
-            continue
-          group_available = sum(
-            1
-            for emp in self.schedule.employees
-            if emp.careerGroupAlias == group_alias and self._is_shift_allowed(emp, day, code)
-          )
-          if group_available == 0:
-            issues.append(
-              {
-                "type": "careerGroupCoverageImpossible",
-                "date": day_key,
-                "shiftType": code.upper(),
-                "careerGroupAlias": group_alias,
-              }
-            )
-
-    for req in self.schedule.specialRequests or []:
-      if not req.shiftTypeCode:
-        continue
-      emp = employee_map.get(req.employeeId)
-      if not emp:
-        issues.append({"type": "specialRequestUnknownEmployee", "employeeId": req.employeeId, "date": req.date})
-        continue
-      try:
-        req_date = date.fromisoformat(req.date)
-      except ValueError:
-        issues.append({"type": "specialRequestInvalidDate", "employeeId": req.employeeId, "date": req.date})
-        continue
-      if not self._is_shift_allowed(emp, req_date, req.shiftTypeCode):
-        issues.append(
-          {
-            "type": "specialRequestPatternConflict",
-            "employeeId": emp.id,
-            "date": req.date,
-            "requestedShift": req.shiftTypeCode,
-            "workPatternType": emp.workPatternType,
-          }
-        )
-
-    return issues
-
-  def build_model(self):
-    self._create_variables()
-    self._add_daily_assignment_constraints()
-    self._add_special_request_constraints()
-    self._restrict_special_only_shifts()
-    self._add_pattern_constraints()
-    self._add_avoid_pattern_constraints()
-    self._add_staffing_constraints()
-    self._add_team_coverage_constraints()
-    self._add_career_group_constraints()
-    self._add_career_group_balance_constraints()
-    if self.team_ids:
-      self._add_team_balance_constraints()
-    self._add_off_day_constraints()
-    self._add_off_balance_constraints()
-    self._add_shift_repeat_constraints(self.max_same_shift)
-    self._add_consecutive_constraints()
-    self._add_night_intensive_pattern_constraints()
-    self._add_rest_after_night_constraints()
-    self._add_daily_headcount_balance_constraints()
-    self._add_shift_balance_constraints()
-
-  def _collect_staffing_shortages(self):
-    shortages = []
-    if not self.staffing_requirements:
-      return shortages
-    coverage: Dict[Tuple[str, str], float] = {}
-    for (employee_id, day_key, code), var in self.variables.items():
-      key = (day_key, code)
-      if key not in self.staffing_requirements:
-        continue
-      value = var.solution_value()
-      if value is None or value <= 1e-6:
-        continue
-      coverage[key] = coverage.get(key, 0.0) + value
-    for (day_key, code), required in self.staffing_requirements.items():
-      covered_value = coverage.get((day_key, code), 0.0)
-      if covered_value + 1e-6 < required:
-        shortages.append(
-          {
-            "date": day_key,
-            "shiftType": code.upper(),
-            "required": required,
-            "covered": int(round(covered_value)),
-            "shortage": int(round(required - covered_value)),
-          }
-        )
-    return shortages
-
-  def _collect_team_shortages(self):
-    gaps = []
-    for (day_key, code, team_id), slack_var in self.team_slacks.items():
-      shortage = slack_var.solution_value()
-      if shortage is None:
-        continue
-      if shortage > 1e-6:
-        gaps.append(
-          {
-            "date": day_key,
-            "shiftType": code.upper(),
-            "teamId": team_id,
-            "shortage": int(round(shortage)),
-          }
-        )
-    return gaps
-
-  def _collect_career_group_gaps(self):
-    gaps = []
-    for (day_key, code, group_alias), slack_var in self.career_group_slacks.items():
-      shortage = slack_var.solution_value()
-      if shortage is None:
-        continue
-      if shortage > 1e-6:
-        gaps.append(
-          {
-            "date": day_key,
-            "shiftType": code.upper(),
-            "careerGroupAlias": group_alias,
-            "shortage": int(round(shortage)),
-          }
-        )
-    return gaps
-
-  def _collect_special_request_misses(self):
-    misses = []
-    for (employee_id, day_key, code), slack_var in self.special_request_slacks.items():
-      value = slack_var.solution_value()
-      if value is None:
-        continue
-      if value > 0.5:
-        misses.append(
-          {
-            "employeeId": employee_id,
-            "date": day_key,
-            "shiftType": code,
-          }
-        )
-    return misses
-
-  def _collect_off_balance_gaps(self, tolerance: int = 2):
-    gaps = []
-    for team_id, members in self.team_members_map.items():
-      if len(members) < 2:
-        continue
-      for i in range(len(members)):
-        for j in range(i + 1, len(members)):
-          if members[i].id not in self.off_count_vars or members[j].id not in self.off_count_vars:
-            continue
-          count_a = self.off_count_vars[members[i].id].solution_value()
-          count_b = self.off_count_vars[members[j].id].solution_value()
-          if count_a is None or count_b is None:
-            continue
-          diff = abs(count_a - count_b)
-          if diff > tolerance + 1e-6:
-            gaps.append(
-              {
-                "teamId": team_id,
-                "employeeA": members[i].id,
-                "employeeB": members[j].id,
-                "difference": int(round(diff)),
-                "tolerance": tolerance,
-              }
-            )
-    return gaps
-
-  def _collect_team_balance_gaps(self):
-    gaps = []
-    for entry in self.team_balance_entries:
-      value = entry["var"].solution_value()
-      if value is None or value <= 1e-6:
-        continue
-      gaps.append(
-        {
-          "teamA": entry["teamA"],
-          "teamB": entry["teamB"],
-          "difference": int(round(value + entry["tolerance"])),
-          "tolerance": entry["tolerance"],
-        }
-      )
-    return gaps
-
-  def _collect_shift_repeat_breaks(self):
-    violations = []
-    for entry in self.shift_repeat_entries:
-      slack_var = entry["var"]
-      value = slack_var.solution_value()
-      if value is None or value <= 1e-6:
-        continue
-      violations.append(
-        {
-          "employeeId": entry["employeeId"],
-          "shiftType": entry["shiftType"],
-          "startDate": entry["startDate"],
-          "window": entry["window"],
-          "excess": int(round(value)),
-        }
-      )
-    for entry in self.rest_after_night_entries:
-      slack_var = entry["var"]
-      value = slack_var.solution_value()
-      if value is None or value <= 1e-6:
-        continue
-      violations.append(
-        {
-          "employeeId": entry["employeeId"],
-          "shiftType": entry["shiftType"],
-          "startDate": entry["startDate"],
-          "window": entry["window"],
-          "excess": int(round(value)),
-        }
-      )
-    return violations
-
-  def _collect_shift_balance_gaps(self):
-    gaps = []
-    for entry in self.shift_balance_entries:
-      value = entry["var"].solution_value()
-      if value is None or value <= 1e-6:
-        continue
-      gaps.append(
-        {
-          "employeeId": entry["employeeId"],
-          "shiftA": entry["shiftA"],
-          "shiftB": entry["shiftB"],
-          "difference": int(round(value + entry["tolerance"])),
-          "tolerance": entry["tolerance"],
-        }
-      )
-    return gaps
-
-  def _collect_daily_headcount_gaps(self):
-    gaps = []
-    for entry in self.daily_balance_entries:
-      total = entry["total_var"].solution_value()
-      over = entry["over_var"].solution_value()
-      under = entry["under_var"].solution_value()
-      if total is None:
-        continue
-      over_val = over if over and over > 1e-6 else 0
-      under_val = under if under and under > 1e-6 else 0
-      if over_val <= 1e-6 and under_val <= 1e-6:
-        continue
-      gaps.append(
-        {
-          "date": entry["day"],
-          "target": entry["target"],
-          "tolerance": entry["tolerance"],
-          "actual": float(total),
-          "over": float(over_val) if over_val > 1e-6 else 0,
-          "under": float(under_val) if under_val > 1e-6 else 0,
-        }
-      )
-    return gaps
-
-  def solve(self, cancel_token: Optional[CancellationToken] = None) -> SolveResult:
-    self.build_model()
-    staffing_penalty = 1000 * self._weight_scalar("staffing", 1.0)
-    team_penalty = 500 * self._weight_scalar("teamBalance", 1.0)
-    special_request_penalty = 1200
-    career_group_penalty = 450 * self._weight_scalar("careerBalance", 1.0)
-    career_group_balance_penalty = 600 * self._weight_scalar("careerBalance", 1.0)
-    off_balance_penalty = 800 * self._weight_scalar("offBalance", 1.0)
-    shift_repeat_penalty = 350 * self._weight_scalar("shiftPattern", 1.0)
-    rest_penalty = 500 * self._weight_scalar("shiftPattern", 1.0)
-    shift_balance_penalty = 250 * self._weight_scalar("shiftPattern", 1.0)
-    daily_balance_penalty = 400 * self._weight_scalar(
-      "dailyBalance", self.daily_balance_config.get("weight", 1.0)
+        self._add_row(position)
+    self.built = True
+
+  def _add_row(self, position: int):
+    ir = self.model_ir
+    infinity = self.solver.infinity()
+    lb, ub = ir.row_lb[position], ir.row_ub[position]
+    constraint = self.solver.RowConstraint(
+      lb if lb != -INF else -infinity, ub if ub != INF else infinity, ir.row_names[position]
     )
+    for idx, coef in zip(ir.row_indices[position], ir.row_coefs[position]):
+      constraint.SetCoefficient(self.vars[idx], coef)
+
+  def _violated_rows(self, values: Sequence[float]) -> List[int]:
+    """Pending rows the incumbent breaks, plus pending rows sharing a cell with them.
+
+    Fixing one window tends to push the run into its neighbour; adding the
+    overlapping windows up front saves a CBC restart per shift.
+    """
+    ir = self.model_ir
+    violated: List[int] = []
+    for position in self.pending_rows:
+      activity = sum(coef * values[idx] for idx, coef in zip(ir.row_indices[position], ir.row_coefs[position]))
+      if activity < ir.row_lb[position] - 1e-6 or activity > ir.row_ub[position] + 1e-6:
+        violated.append(position)
+    if not violated:
+      return violated
+    cells = {idx for position in violated for idx in ir.row_indices[position] if idx < ir.num_assignment_vars}
+    return [position for position in self.pending_rows if not cells.isdisjoint(ir.row_indices[position])]
+
+  def _set_objective(self):
     objective = self.solver.Objective()
-    for (employee_id, day_key, shift_code), var in self.variables.items():
-      penalty = self.preference_penalty_map.get((employee_id, day_key, shift_code.upper()), 0.0)
-      objective.SetCoefficient(var, penalty)
-    for slack_var in self.team_slacks.values():
-      objective.SetCoefficient(slack_var, team_penalty)
-    for slack_var in self.special_request_slacks.values():
-      objective.SetCoefficient(slack_var, special_request_penalty)
-    for slack_var in self.career_group_slacks.values():
-      objective.SetCoefficient(slack_var, career_group_penalty)
-    for slack_var in self.career_group_balance_slacks:
-      objective.SetCoefficient(slack_var, career_group_balance_penalty)
-    for entry in self.team_balance_entries:
-      objective.SetCoefficient(entry["var"], team_penalty)
-    for slack_var in self.off_balance_slacks:
-      objective.SetCoefficient(slack_var, off_balance_penalty)
-    for entry in self.shift_repeat_entries:
-      objective.SetCoefficient(entry["var"], shift_repeat_penalty)
-    for entry in self.rest_after_night_entries:
-      objective.SetCoefficient(entry["var"], rest_penalty)
-    for entry in self.shift_balance_entries:
-      objective.SetCoefficient(entry["var"], shift_balance_penalty)
-    for entry in self.daily_balance_entries:
-      objective.SetCoefficient(entry["over_var"], daily_balance_penalty)
-      objective.SetCoefficient(entry["under_var"], daily_balance_penalty)
+    objective.Clear()
+    offset = 0.0
+    for idx, coef in self.model_ir.objective_terms(objective_weights(self.schedule)):
+      var = self.vars[idx]
+      if var is None:
+        offset += coef * self.model_ir.var_fixed[idx]
+      else:
+        objective.SetCoefficient(var, coef)
+    objective.SetOffset(offset)
     objective.SetMinimization()
 
-    if self.max_solve_time_ms > 0:
-      self.solver.SetTimeLimit(self.max_solve_time_ms)
+  def _set_hints(self):
+    # CBC ignores MIP hints in this OR-Tools build; hard warm starts still apply via the IR rows.
+    hints = self.model_ir.free_hints()
+    if hints:
+      self.solver.SetHint([self.vars[idx] for idx, _ in hints], [float(value) for _, value in hints])
+
+  def solve(self, cancel_token: Optional[CancellationToken] = None) -> SolveResult:
+    lowering_start = time.perf_counter()
+    reused = self.built
+    self.build_model()
+    self._set_objective()
+    self._set_hints()
+    lowering = {"reused": reused, "ms": int((time.perf_counter() - lowering_start) * 1000)}
+    if getattr(cancel_token, "cancelled", False):
+      raise SolverFailure(
+        "Solver cancelled",
+        diagnostics={"preflightIssues": self.preflight_issues, "solverStatus": "cancelled", "lowering": lowering},
+      )
 
     cancel_event = threading.Event()
 
@@ -1217,22 +166,69 @@ class OrToolsMilpSolver:
           finally:
             cancel_event.set()
             break
-        time.sleep(0.05)
+        time.sleep(CANCEL_POLL_SECONDS)
 
     monitor_thread: Optional[threading.Thread] = None
     if cancel_token:
       monitor_thread = threading.Thread(target=_monitor_cancel, daemon=True)
       monitor_thread.start()
 
+    # pywraplp exposes only CBC's relative gap; it has no incumbent callback for the other stops.
+    stop_criteria = resolve_stop_criteria(self.options)
+    params = pywraplp.MPSolverParameters()
+    if stop_criteria["relativeGap"] is not None:
+      params.SetDoubleParam(pywraplp.MPSolverParameters.RELATIVE_MIP_GAP, stop_criteria["relativeGap"])
     start = time.perf_counter()
-    solver_status = self.solver.Solve()
+    settings = lazy_window_settings(self.options)
+    # Every round is a cold CBC start: this build's CBC ignores MIP starts, so the
+    # previous round's incumbent only decides which rows get added.
+    lazy_stats: Dict[str, Any] = {"deferredRows": len(self.pending_rows), "rounds": 0, "addedRows": 0}
+    force_final = False
+    while True:
+      lazy_stats["rounds"] += 1
+      spent_ms = (time.perf_counter() - start) * 1000
+      final_round = not self.pending_rows or force_final or lazy_stats["rounds"] >= settings["maxRounds"]
+      if self.max_solve_time_ms > 0:
+        remaining_ms = max(1.0, self.max_solve_time_ms - spent_ms)
+        # Cut rounds get half of what is left so a full final round always has time.
+        self.solver.SetTimeLimit(int(remaining_ms if final_round else remaining_ms / 2))
+      if self.pending_rows and final_round:
+        for position in self.pending_rows:
+          self._add_row(position)
+        lazy_stats["addedRows"] += len(self.pending_rows)
+        self.pending_rows = []
+      solver_status = self.solver.Solve(params)
+      values = [
+        fixed if var is None else var.solution_value() for var, fixed in zip(self.vars, self.model_ir.var_fixed)
+      ]
+      has_solution = self.model_ir.has_solution(values)
+      if not self.pending_rows or getattr(cancel_token, "cancelled", False):
+        break
+      if not has_solution:
+        # A relaxation of the full model: infeasible here is infeasible there. Otherwise the cut
+        # round ran out of its half of the budget; spend the rest on the full model.
+        if solver_status == pywraplp.Solver.INFEASIBLE:
+          break
+        lazy_stats["timedOutRound"] = lazy_stats["rounds"]
+        force_final = True
+        continue
+      violated = self._violated_rows(values)
+      if not violated:
+        break
+      for position in violated:
+        self._add_row(position)
+      violated_set = set(violated)
+      self.pending_rows = [position for position in self.pending_rows if position not in violated_set]
+      lazy_stats["addedRows"] += len(violated)
     elapsed_ms = int((time.perf_counter() - start) * 1000)
     cancel_event.set()
     if monitor_thread:
       monitor_thread.join(timeout=0.2)
+    if self.lazy:
+      lazy_stats["pendingRows"] = len(self.pending_rows)
+      lowering["lazyWindows"] = lazy_stats
 
-    wall_time_ms = int(self.solver.wall_time())
-    has_solution = any(var.solution_value() >= 0.5 for var in self.variables.values())
+    wall_time_ms = elapsed_ms
     timed_out = bool(self.max_solve_time_ms and wall_time_ms >= max(0, self.max_solve_time_ms - 1))
     if getattr(cancel_token, "cancelled", False):
       status_label: SolveStatus = "cancelled"
@@ -1258,76 +254,205 @@ class OrToolsMilpSolver:
         },
       )
 
-    assignments: List[Assignment] = []
-    for (employee_id, day_key, shift_code), var in self.variables.items():
-      if var.solution_value() >= 0.9:
-        is_locked = (employee_id, day_key, shift_code.upper()) in self.special_request_targets
-        assignments.append(
-          Assignment(
-            employeeId=employee_id,
-            date=day_key,
-            shiftId=self._get_shift_id(shift_code),
-            shiftType=shift_code.upper(),
-            isLocked=is_locked,
-          )
-        )
-    diagnostics: Dict[str, Any] = {
-      "staffingShortages": self._collect_staffing_shortages(),
-      "teamCoverageGaps": self._collect_team_shortages(),
-      "careerGroupCoverageGaps": self._collect_career_group_gaps(),
-      "teamWorkloadGaps": self._collect_team_balance_gaps(),
-      "offBalanceGaps": self._collect_off_balance_gaps(),
-      "shiftPatternBreaks": self._collect_shift_repeat_breaks(),
-      "specialRequestMisses": self._collect_special_request_misses(),
-      "shiftBalanceGaps": self._collect_shift_balance_gaps(),
-      "dailyHeadcountGaps": self._collect_daily_headcount_gaps(),
-      "preflightIssues": self.preflight_issues,
-      "solverStatus": status_label,
-      "solverWallTimeMs": wall_time_ms,
-      "solverRawStatus": solver_status,
-      "solverTimedOut": timed_out,
-    }
+    objective = objective_report(self.solver.Objective().Value(), self.solver.Objective().BestBound())
+    active = self.model_ir.active_assignment_indices(values)
+    # No incumbent callback in pywraplp's CBC: publish once it returns, ahead of postprocessing.
+    publish_incumbent(cancel_token, self.model_ir, lambda: active, objective["value"], "cbc")
+    assignments = self.model_ir.build_assignments(active)
+    diagnostics: Dict[str, Any] = self.model_ir.collect_diagnostics(values)
+    diagnostics.update(
+      {
+        "preflightIssues": self.preflight_issues,
+        "solverStatus": status_label,
+        "solverWallTimeMs": wall_time_ms,
+        "solverRawStatus": solver_status,
+        "solverTimedOut": timed_out,
+        "model": self.model_ir.stats(),
+        "lowering": lowering,
+        "modelCache": model_cache_info(self.schedule),
+        "objective": objective,
+        "stopCriteria": dict(
+          stop_criteria,
+          stoppedBy=gap_stop(objective, stop_criteria["relativeGap"], None)
+          if solver_status == pywraplp.Solver.OPTIMAL
+          else None,
+          unsupported=[key for key in ("absoluteGap", "noImprovementMs") if stop_criteria[key] is not None],
+        ),
+      }
+    )
     return SolveResult(
       assignments=assignments,
       diagnostics=diagnostics,
       status=status_label,
       solve_time_ms=max(elapsed_ms, wall_time_ms),
-      best_objective=None,
+      best_objective=objective["value"],
       timed_out=timed_out,
     )
 
   def build_assignments_from_names(self, active_names: Set[str]) -> List[Assignment]:
-    assignments: List[Assignment] = []
-    for name in active_names:
-      key = self.variable_name_map.get(name)
-      if not key:
-        continue
-      employee_id, day_key, shift_code = key
-      is_locked = (employee_id, day_key, shift_code.upper()) in self.special_request_targets
-      assignments.append(
-        Assignment(
-          employeeId=employee_id,
-          date=day_key,
-          shiftId=self._get_shift_id(shift_code),
-          shiftType=shift_code.upper(),
-          isLocked=is_locked,
-        )
-      )
-    return assignments
+    return self.model_ir.build_assignments_from_names(active_names)
+
 
-  def _weight_scalar(self, key: str, default: float) -> float:
-    value = self.constraint_weights.get(key)
-    if value is None:
-      return default
+class _CbcWorker:
+  """A spawned process that keeps lowered CBC sessions between solves.
+
+  Sessions are keyed by the parent IR's handle, so re-solves of a cached IR
+  (jitter, relaxation, later jobs) reuse the child's lowered model and lazy
+  rows exactly like the in-process session does. Only a cancel kills it.
+  """
+
+  def __init__(self):
+    context = multiprocessing.get_context("spawn")
+    self.conn, child_conn = context.Pipe()
+    self.process = context.Process(target=_cbc_worker_main, args=(child_conn,), daemon=True)
+    self.process.start()
+    child_conn.close()
+    self.held: Set[str] = set()
+
+  @property
+  def alive(self) -> bool:
+    return self.process.is_alive()
+
+  def close(self):
     try:
-      scalar = float(value)
-      return max(0.1, scalar)
-    except (TypeError, ValueError):
-      return default
+      self.conn.close()
+    finally:
+      if self.process.is_alive():
+        self.process.kill()
+      self.process.join()
+
+
+def _cbc_worker_main(conn):
+  sessions: "OrderedDict[str, OrToolsMilpSolver]" = OrderedDict()
+  while True:
+    try:
+      handle, lazy, schedule, model_ir = conn.recv()
+    except (EOFError, OSError):
+      return
+    try:
+      solver = sessions.get(handle)
+      if solver is None and model_ir is None:
+        conn.send(("missing", None))
+        continue
+      if solver is None:
+        solver = OrToolsMilpSolver(schedule, model_ir, lazy)
+        sessions[handle] = solver
+        while len(sessions) > CBC_WORKER_SESSIONS:
+          sessions.popitem(last=False)
+      sessions.move_to_end(handle)
+      schedule._model_ir = solver.model_ir
+      solver.bind(schedule)
+      outcome: Any = solver.solve()
+    except Exception as exc:
+      outcome = exc
+    try:
+      conn.send(("result", outcome))
+    except Exception as exc:  # pragma: no cover - unpicklable exception
+      conn.send(("result", RuntimeError(repr(exc))))
+
+
+_IDLE_WORKERS: List[_CbcWorker] = []
+_WORKERS_LOCK = threading.Lock()
+
+
+def _acquire_worker(handle: str) -> _CbcWorker:
+  with _WORKERS_LOCK:
+    live = [worker for worker in _IDLE_WORKERS if worker.alive]
+    for worker in set(_IDLE_WORKERS) - set(live):
+      worker.close()
+    worker = next((worker for worker in live if handle in worker.held), None) or (live[0] if live else None)
+    _IDLE_WORKERS[:] = [candidate for candidate in live if candidate is not worker]
+  return worker or _CbcWorker()
+
+
+def _release_worker(worker: _CbcWorker):
+  with _WORKERS_LOCK:
+    if worker.alive and len(_IDLE_WORKERS) < CBC_IDLE_WORKERS:
+      _IDLE_WORKERS.append(worker)
+      return
+  worker.close()
+
+
+def _remote_handle(model_ir: ScheduleModelIR, session_key: str) -> str:
+  # The parent-side "session" for a worker-held model is just the name the worker files it under.
+  with _SESSION_LOCK:
+    handle = model_ir.sessions.get(f"{session_key}:remote")
+    if handle is None:
+      handle = f"{uuid.uuid4().hex}:{session_key}"
+      model_ir.sessions[f"{session_key}:remote"] = handle
+  return handle
+
+
+def _solve_in_worker(
+  schedule: ScheduleInput, cancel_token: CancellationToken, model_ir: ScheduleModelIR, lazy: bool, session_key: str
+) -> SolveResult:
+  """Solves in a persistent CBC worker process and kills it once the token trips."""
+  handle = _remote_handle(model_ir, session_key)
+  worker = _acquire_worker(handle)
+  # The schedule travels without its IR; the worker only needs that the first time it sees the handle.
+  request = copy.copy(schedule)
+  request.__dict__.pop("_model_ir", None)
+  healthy = False
+  try:
+    worker.conn.send((handle, lazy, request, None if handle in worker.held else model_ir))
+    while True:
+      while not worker.conn.poll(CANCEL_POLL_SECONDS):
+        if getattr(cancel_token, "cancelled", False):
+          raise SolverFailure(
+            "Solver cancelled",
+            diagnostics={"preflightIssues": list(model_ir.preflight_issues), "solverStatus": "cancelled"},
+          )
+        if not worker.alive and not worker.conn.poll():
+          raise SolverFailure(
+            "CBC worker process exited without a result",
+            diagnostics={"solverStatus": "error", "exitCode": worker.process.exitcode},
+          )
+      kind, outcome = worker.conn.recv()
+      if kind != "missing":
+        break
+      # The worker evicted this session since we last used it.
+      worker.held.discard(handle)
+      worker.conn.send((handle, lazy, request, model_ir))
+    worker.held.add(handle)
+    healthy = True
+  finally:
+    if healthy:
+      _release_worker(worker)
+    else:
+      worker.close()
+  if isinstance(outcome, BaseException):
+    raise outcome
+  lowering = outcome.diagnostics.setdefault("lowering", {})
+  lowering["isolated"] = True
+  # The worker's own cache never sees a lookup; the parent's is the one the job hit.
+  outcome.diagnostics["modelCache"] = model_cache_info(schedule)
+  publish_incumbent(
+    cancel_token, model_ir, lambda: model_ir.assignment_indices(outcome.assignments), outcome.best_objective, "cbc"
+  )
+  return outcome
 
 
 def solve_with_ortools(
-  schedule: ScheduleInput, cancel_token: Optional[CancellationToken] = None
+  schedule: ScheduleInput,
+  cancel_token: Optional[CancellationToken] = None,
+  model_ir: Optional[ScheduleModelIR] = None,
 ) -> SolveResult:
-  solver = OrToolsMilpSolver(schedule)
-  return solver.solve(cancel_token)
+  model_ir = model_ir or get_model_ir(schedule)
+  # Multi-run pool workers are daemonic and cannot spawn; the pool is terminated on cancel instead.
+  lazy = lazy_window_settings(getattr(schedule, "options", {}) or {})["enabled"]
+  session_key = "cbc:lazy" if lazy else "cbc"
+  if cancel_token is not None and CBC_CANCEL_MODE == "process" and not multiprocessing.current_process().daemon:
+    return _solve_in_worker(schedule, cancel_token, model_ir, lazy, session_key)
+  with _SESSION_LOCK:
+    solver = model_ir.sessions.get(session_key)
+    if solver is None:
+      solver = OrToolsMilpSolver(schedule, model_ir, lazy)
+      model_ir.sessions[session_key] = solver
+  if not solver.lock.acquire(blocking=False):
+    # The cached session is busy (hybrid race, concurrent attempts); lower a private copy.
+    return OrToolsMilpSolver(schedule, model_ir, lazy).solve(cancel_token)
+  try:
+    solver.bind(schedule)
+    return solver.solve(cancel_token)
+  finally:
+    solver.lock.release()
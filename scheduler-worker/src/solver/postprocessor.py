@@ -6,10 +6,14 @@ import os
 from collections import Counter, defaultdict, deque
 from math import exp
 import random
+from array import array
 from datetime import date, timedelta
-from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
 
 from models import Assignment, Employee, ScheduleInput
+from solver.delta_evaluator import DeltaEvaluator
+from solver.eligibility import get_eligibility
+from solver.progress import POSTPROCESS_EVENT_EVERY
 
 MAX_SAME_SHIFT = int(os.getenv("MILP_POSTPROCESS_MAX_SAME_SHIFT", "2"))
 IGNORE_SHIFT_CODES = {"O", "V"}
@@ -19,6 +23,7 @@ DEFAULT_TABU_SIZE = int(os.getenv("MILP_POSTPROCESS_TABU_SIZE", "32"))
 DEFAULT_ANNEALING_TEMP = float(os.getenv("MILP_POSTPROCESS_ANNEAL_TEMP", "5.0"))
 DEFAULT_ANNEALING_COOL = float(os.getenv("MILP_POSTPROCESS_ANNEAL_COOL", "0.92"))
 OFF_BALANCE_TOLERANCE = int(os.getenv("MILP_POSTPROCESS_OFF_TOLERANCE", "2"))
+VERIFY_DELTA = os.getenv("MILP_POSTPROCESS_VERIFY_DELTA", "false").lower() in {"1", "true", "yes"}
 DEFAULT_REQUIRED_STAFF = {"D": 5, "E": 4, "N": 3}
 
 
@@ -38,73 +43,122 @@ def _build_date_range(start: date, end: date) -> List[date]:
 class ScheduleState:
   def __init__(self, schedule: ScheduleInput, assignments: List[Assignment]):
     self.schedule = schedule
-    self.assignments = assignments
     self.date_range = _build_date_range(schedule.startDate, schedule.endDate)
     self.day_keys = [day.isoformat() for day in self.date_range]
     self.day_lookup = {day.isoformat(): day for day in self.date_range}
-    self.assignment_map: Dict[Tuple[str, str], Assignment] = {}
-    self.assignments_by_day: Dict[str, Dict[str, Assignment]] = defaultdict(dict)
-    for assignment in assignments:
-      day_key = assignment.date
-      self.assignment_map[(assignment.employeeId, day_key)] = assignment
-      self.assignments_by_day[day_key][assignment.employeeId] = assignment
+    self.day_index: Dict[str, int] = {day_key: idx for idx, day_key in enumerate(self.day_keys)}
+    self.num_days = len(self.day_keys)
     self.employee_map: Dict[str, Employee] = {emp.id: emp for emp in schedule.employees}
+    self.employee_ids: List[str] = []
+    self.employee_index: Dict[str, int] = {}
+    for emp in schedule.employees:
+      if emp.id in self.employee_index:
+        continue
+      self.employee_index[emp.id] = len(self.employee_ids)
+      self.employee_ids.append(emp.id)
+    # slot 0 is the empty cell; every other slot is an interned (shiftId, shiftType) pair
+    self.shift_slots: List[Tuple[Optional[str], Optional[str]]] = [(None, None)]
+    self.slot_codes: List[Optional[str]] = [None]
+    self._slot_lookup: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+    size = len(self.employee_ids) * self.num_days
+    cells = [0] * size
+    self.locked = bytearray(size)
+    self.fixed_assignments: List[Assignment] = []
+    placed: List[Optional[Assignment]] = [None] * size
+    for assignment in assignments:
+      cell = self.cell_index(assignment.employeeId, assignment.date)
+      if cell is None:
+        self.fixed_assignments.append(assignment)
+        continue
+      if placed[cell] is not None:
+        self.fixed_assignments.append(placed[cell])
+      placed[cell] = assignment
+      cells[cell] = self._intern_slot(assignment.shiftId, assignment.shiftType)
+      self.locked[cell] = 1 if assignment.isLocked else 0
+    self.codes = array("b" if len(self.shift_slots) <= 127 else "h", cells)
+    self.eligible = self._build_eligibility()
 
-  def swap_assignments(self, day_key: str, employee_a: str, employee_b: str) -> bool:
-    assignment_a = self.assignment_map.get((employee_a, day_key))
-    assignment_b = self.assignment_map.get((employee_b, day_key))
-    if not assignment_a or not assignment_b:
-      return False
-    if assignment_a.isLocked or assignment_b.isLocked:
+  def _intern_slot(self, shift_id: Optional[str], shift_type: Optional[str]) -> int:
+    key = (shift_id, shift_type)
+    slot = self._slot_lookup.get(key)
+    if slot is None:
+      slot = len(self.shift_slots)
+      self._slot_lookup[key] = slot
+      self.shift_slots.append(key)
+      self.slot_codes.append(_normalize_shift_code(shift_type))
+    return slot
+
+  def _build_eligibility(self) -> List[int]:
+    tensor = get_eligibility(self.schedule)
+    eligible = [0] * len(self.codes)
+    for slot in range(1, len(self.shift_slots)):
+      shift_type = self.shift_slots[slot][1]
+      if not shift_type:
+        continue
+      bit = 1 << slot
+      for emp_idx, employee_id in enumerate(self.employee_ids):
+        employee = self.employee_map[employee_id]
+        base = emp_idx * self.num_days
+        for day_idx, day in enumerate(self.date_range):
+          if tensor.is_allowed(employee, day, shift_type):
+            eligible[base + day_idx] |= bit
+    return eligible
+
+  def cell_index(self, employee_id: str, day_key: str) -> Optional[int]:
+    emp_idx = self.employee_index.get(employee_id)
+    day_idx = self.day_index.get(day_key)
+    if emp_idx is None or day_idx is None:
+      return None
+    return emp_idx * self.num_days + day_idx
+
+  def code_at(self, cell: int) -> Optional[str]:
+    return self.slot_codes[self.codes[cell]]
+
+  def can_swap_cells(self, cell_a: int, cell_b: int) -> bool:
+    slot_a = self.codes[cell_a]
+    slot_b = self.codes[cell_b]
+    if not slot_a or not slot_b:
       return False
-    new_shift_a = assignment_b.shiftType
-    new_shift_b = assignment_a.shiftType
-    if not self._is_shift_allowed(employee_a, day_key, new_shift_a):
+    if self.locked[cell_a] or self.locked[cell_b]:
       return False
-    if not self._is_shift_allowed(employee_b, day_key, new_shift_b):
+    return bool((self.eligible[cell_a] >> slot_b) & 1 and (self.eligible[cell_b] >> slot_a) & 1)
+
+  def swap_cells(self, cell_a: int, cell_b: int) -> bool:
+    if not self.can_swap_cells(cell_a, cell_b):
       return False
-    assignment_a.shiftId, assignment_b.shiftId = assignment_b.shiftId, assignment_a.shiftId
-    assignment_a.shiftType, assignment_b.shiftType = new_shift_a, new_shift_b
+    self.codes[cell_a], self.codes[cell_b] = self.codes[cell_b], self.codes[cell_a]
     return True
 
+  def swap_assignments(self, day_key: str, employee_a: str, employee_b: str) -> bool:
+    return self.swap_pair(day_key, employee_a, day_key, employee_b)
+
   def swap_pair(self, day_a: str, employee_a: str, day_b: str, employee_b: str) -> bool:
-    if day_a == day_b:
-      return self.swap_assignments(day_a, employee_a, employee_b)
-    assignment_a = self.assignment_map.get((employee_a, day_a))
-    assignment_b = self.assignment_map.get((employee_b, day_b))
-    if not assignment_a or not assignment_b:
-      return False
-    if assignment_a.isLocked or assignment_b.isLocked:
-      return False
-    new_shift_a = assignment_b.shiftType
-    new_shift_b = assignment_a.shiftType
-    if not self._is_shift_allowed(employee_a, day_a, new_shift_a):
+    cell_a = self.cell_index(employee_a, day_a)
+    cell_b = self.cell_index(employee_b, day_b)
+    if cell_a is None or cell_b is None:
       return False
-    if not self._is_shift_allowed(employee_b, day_b, new_shift_b):
-      return False
-    assignment_a.shiftId, assignment_b.shiftId = assignment_b.shiftId, assignment_a.shiftId
-    assignment_a.shiftType, assignment_b.shiftType = new_shift_a, new_shift_b
-    return True
+    return self.swap_cells(cell_a, cell_b)
 
-  def _is_shift_allowed(self, employee_id: str, day_key: str, shift_code: Optional[str]) -> bool:
-    employee = self.employee_map.get(employee_id)
-    if not employee or not shift_code:
-      return False
-    upper = shift_code.replace("^", "").upper()
-    day = self.day_lookup.get(day_key)
-    if not day:
-      return False
-    if upper == "V":
-      return True
-    if employee.workPatternType == "night-intensive":
-      return upper in {"N", "O", "V"}
-    if employee.workPatternType == "weekday-only":
-      if day.weekday() >= 5:
-        return upper in {"O", "V"}
-      return upper in {"A", "V"}
-    if upper == "A":
-      return False
-    return True
+  def to_assignments(self) -> List[Assignment]:
+    assignments: List[Assignment] = []
+    for emp_idx, employee_id in enumerate(self.employee_ids):
+      base = emp_idx * self.num_days
+      for day_idx, day_key in enumerate(self.day_keys):
+        slot = self.codes[base + day_idx]
+        if not slot:
+          continue
+        shift_id, shift_type = self.shift_slots[slot]
+        assignments.append(
+          Assignment(
+            employeeId=employee_id,
+            date=day_key,
+            shiftId=shift_id,
+            shiftType=shift_type,
+            isLocked=bool(self.locked[base + day_idx]),
+          )
+        )
+    assignments.extend(self.fixed_assignments)
+    return assignments
 
 
 class SchedulePostProcessor:
@@ -114,10 +168,16 @@ class SchedulePostProcessor:
     assignments: List[Assignment],
     base_diagnostics: Dict[str, List[Dict[str, str]]],
     solver_options: Optional[Dict[str, Any]] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancel_token: Any = None,
   ):
     self.schedule = schedule
     self.options = solver_options or {}
+    self.progress = progress
+    self.cancel_token = cancel_token
+    self.cancelled = False
     self.state = ScheduleState(schedule, assignments)
+    self.eligibility = get_eligibility(schedule)
     raw_required = schedule.requiredStaffPerShift or {}
     normalized_required: Dict[str, int] = {}
     for code, value in raw_required.items():
@@ -165,8 +225,8 @@ class SchedulePostProcessor:
     self.off_balance_tolerance = int(csp_options.get("offTolerance", OFF_BALANCE_TOLERANCE))
     self.shift_balance_tolerance = max(1, int(csp_options.get("shiftBalanceTolerance", 4)))
     self.team_workload_tolerance = max(1, self.off_balance_tolerance)
-    self.tabu_queue: Deque[Tuple[Tuple[str, str], Tuple[str, str]]] = deque(maxlen=self.tabu_size)
-    self.tabu_set: Set[Tuple[Tuple[str, str], Tuple[str, str]]] = set()
+    self.tabu_queue: Deque[Tuple[int, int]] = deque(maxlen=self.tabu_size)
+    self.tabu_set: Set[Tuple[int, int]] = set()
     self.current_penalty = None
     self.initial_penalty = None
     self.iterations = 0
@@ -178,6 +238,82 @@ class SchedulePostProcessor:
     self.cool_rate = float(annealing_options.get("coolingRate", default_cool))
     self.daily_balance_config = self._get_daily_balance_config()
     self.required_off = self._calculate_required_off_days()
+    self.daily_targets = [self._daily_target_for_day(day) for day in self.state.date_range]
+    employee_map = self.state.employee_map
+    self.employee_teams: List[Optional[str]] = [employee_map[emp_id].teamId for emp_id in self.state.employee_ids]
+    self.employee_aliases: List[Optional[str]] = [
+      getattr(employee_map[emp_id], "careerGroupAlias", None) for emp_id in self.state.employee_ids
+    ]
+    self.team_member_indices: Dict[str, List[int]] = {
+      team_id: [self.state.employee_index[member.id] for member in members]
+      for team_id, members in self.team_members.items()
+    }
+    self.coverage_teams: Dict[Tuple[int, str], List[str]] = {}
+    self.coverage_aliases: Dict[Tuple[int, str], List[str]] = {}
+    for day_idx, day_key in enumerate(self.state.day_keys):
+      for code in self.required_staff:
+        if code not in self.team_coverage_shift_codes:
+          continue
+        self.coverage_teams[(day_idx, code)] = [
+          team_id for team_id in self.team_ids if self._team_has_eligible_member(team_id, day_key, code)
+        ]
+        self.coverage_aliases[(day_idx, code)] = [
+          alias for alias in self.career_group_aliases if self._career_group_has_eligible(alias, day_key, code)
+        ]
+    self._index_fixed_assignments()
+    self._index_special_requests()
+    self.evaluator = DeltaEvaluator(self)
+    self.delta_evaluations = 0
+    self.delta_resyncs = 0
+
+  def _index_fixed_assignments(self):
+    # assignments outside the employee x day grid never move but still count towards the totals
+    state = self.state
+    self.fixed_shift_counts: Counter[Tuple[int, str]] = Counter()
+    self.fixed_team_counts: Counter[Tuple[int, str, str]] = Counter()
+    self.fixed_alias_counts: Counter[Tuple[int, str, str]] = Counter()
+    self.fixed_off_counts: Counter[str] = Counter()
+    self.fixed_workloads: Counter[str] = Counter()
+    self.fixed_daily_actuals = [0] * state.num_days
+    self.fixed_lookup: Dict[Tuple[str, str], Assignment] = {}
+    day_winners: Dict[Tuple[int, str], Assignment] = {}
+    for assignment in state.fixed_assignments:
+      code = _normalize_shift_code(assignment.shiftType)
+      employee = state.employee_map.get(assignment.employeeId)
+      day_idx = state.day_index.get(assignment.date)
+      if day_idx is not None:
+        self.fixed_shift_counts[(day_idx, code)] += 1
+        if employee and employee.teamId:
+          self.fixed_team_counts[(day_idx, code, employee.teamId)] += 1
+        if employee and employee.careerGroupAlias:
+          self.fixed_alias_counts[(day_idx, code, employee.careerGroupAlias)] += 1
+        if assignment.employeeId not in state.employee_index:
+          day_winners[(day_idx, assignment.employeeId)] = assignment
+      if code in {"O", "V"}:
+        self.fixed_off_counts[assignment.employeeId] += 1
+      if employee and employee.teamId and code not in {"O", "A", "V"}:
+        self.fixed_workloads[employee.teamId] += 1
+      if state.cell_index(assignment.employeeId, assignment.date) is None:
+        self.fixed_lookup[(assignment.employeeId, assignment.date)] = assignment
+    for (day_idx, _), assignment in day_winners.items():
+      if _normalize_shift_code(assignment.shiftType) not in self.off_like_codes:
+        self.fixed_daily_actuals[day_idx] += 1
+
+  def _index_special_requests(self):
+    self.special_requests: List[Tuple[str, str, str, Optional[int], bool]] = []
+    for request in self.schedule.specialRequests or []:
+      shift = _normalize_shift_code(request.shiftTypeCode)
+      day_key = request.date
+      try:
+        day_key = date.fromisoformat(request.date).isoformat()
+      except ValueError:
+        pass
+      cell = self.state.cell_index(request.employeeId, day_key)
+      missed = False
+      if cell is None:
+        assignment = self.fixed_lookup.get((request.employeeId, day_key))
+        missed = not assignment or bool(shift and _normalize_shift_code(assignment.shiftType) != shift)
+      self.special_requests.append((request.employeeId, day_key, shift, cell, missed))
 
   def run(self) -> Tuple[List[Assignment], Dict[str, List[Dict[str, str]]]]:
     start = time.perf_counter()
@@ -187,11 +323,19 @@ class SchedulePostProcessor:
     latest_diagnostics = diagnostics
     time_limit_sec = self.time_limit_ms / 1000
     while self.iterations < self.max_iterations and (time.perf_counter() - start) < time_limit_sec:
+      if getattr(self.cancel_token, "cancelled", False):
+        # Every state the search visits is a full schedule, so stopping here still returns one.
+        self.cancelled = True
+        break
       violation = self._pick_violation(latest_diagnostics)
       if not violation:
         break
       result = self._resolve_violation(violation)
       self.iterations += 1
+      if self.progress and self.iterations % POSTPROCESS_EVENT_EVERY == 0:
+        self.progress(
+          {"iterations": self.iterations, "penalty": self.current_penalty, "improvements": self.improvements}
+        )
       if result:
         new_penalty, latest_diagnostics = result
         if new_penalty + 1e-6 < (self.current_penalty or float("inf")):
@@ -205,11 +349,14 @@ class SchedulePostProcessor:
       "initialPenalty": self.initial_penalty,
       "finalPenalty": self.current_penalty,
       "iterations": self.iterations,
+      "cancelled": self.cancelled,
       "improvements": self.improvements,
       "acceptedWorse": self.accepted_worse_moves,
       "temperature": self.temperature,
+      "deltaEvaluations": self.delta_evaluations,
+      "deltaResyncs": self.delta_resyncs,
     }
-    return self.state.assignments, latest_diagnostics
+    return self.state.to_assignments(), latest_diagnostics
 
   def _pick_violation(self, diagnostics: Dict[str, List[Dict[str, str]]]) -> Optional[Dict[str, Dict[str, str]]]:
     priority_order = [
@@ -255,60 +402,58 @@ class SchedulePostProcessor:
       return self._resolve_special_request(data)
     return None
 
+  def _day_cells(self, day_idx: int):
+    # (employee index, cell, code) for every assigned, unlocked cell on the given day
+    state = self.state
+    for emp_idx in range(len(state.employee_ids)):
+      cell = emp_idx * state.num_days + day_idx
+      slot = state.codes[cell]
+      if slot and not state.locked[cell]:
+        yield emp_idx, cell, state.slot_codes[slot]
+
   def _resolve_shift_violation(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    employee_id = violation["employeeId"]
-    start_date = violation["startDate"]
+    state = self.state
+    emp_idx = state.employee_index.get(violation["employeeId"])
+    start_index = state.day_index.get(violation["startDate"])
+    if emp_idx is None or start_index is None:
+      return None
+    shift_code = _normalize_shift_code(violation["shiftType"])
     window = violation["window"]
-    try:
-      start_index = self.state.day_keys.index(start_date)
-    except ValueError:
-      return False
-    window_keys = self.state.day_keys[start_index : min(len(self.state.day_keys), start_index + window)]
-    candidates: List[Tuple[str, str, str, str]] = []
-    for day_key in window_keys:
-      assignment = self.state.assignment_map.get((employee_id, day_key))
-      if not assignment:
+    candidates: List[Tuple[int, int]] = []
+    for day_idx in range(start_index, min(state.num_days, start_index + window)):
+      cell = emp_idx * state.num_days + day_idx
+      if state.code_at(cell) != shift_code:
         continue
-      if _normalize_shift_code(assignment.shiftType) != _normalize_shift_code(violation["shiftType"]):
-        continue
-      day_assignments = self.state.assignments_by_day.get(day_key, {})
-      for other_id, other_assignment in day_assignments.items():
-        if other_id == employee_id or other_assignment.isLocked:
-          continue
-        if _normalize_shift_code(other_assignment.shiftType) == _normalize_shift_code(violation["shiftType"]):
+      for other_idx, other_cell, other_code in self._day_cells(day_idx):
+        if other_idx == emp_idx or other_code == shift_code:
           continue
-        if _normalize_shift_code(other_assignment.shiftType) in {"O", "V"}:
-          candidates.insert(0, (day_key, employee_id, day_key, other_id))
+        if other_code in {"O", "V"}:
+          candidates.insert(0, (cell, other_cell))
         else:
-          candidates.append((day_key, employee_id, day_key, other_id))
+          candidates.append((cell, other_cell))
     return self._apply_best_swap(candidates)
 
   def _resolve_shift_balance_violation(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    employee_id = violation["employeeId"]
+    state = self.state
+    emp_idx = state.employee_index.get(violation["employeeId"])
     dominant = violation.get("dominantShift")
     lacking = violation.get("lackingShift")
-    if not dominant or not lacking:
+    if emp_idx is None or not dominant or not lacking:
       return None
-    dominant_days = [
-      day_key
-      for day_key in self.state.day_keys
-      if (assignment := self.state.assignment_map.get((employee_id, day_key)))
-      and _normalize_shift_code(assignment.shiftType) == dominant
-    ]
-    candidates: List[Tuple[str, str, str, str]] = []
-    for day_key in dominant_days:
-      day_assignments = self.state.assignments_by_day.get(day_key, {})
-      for other_id, other_assignment in day_assignments.items():
-        if other_id == employee_id or other_assignment.isLocked:
+    candidates: List[Tuple[int, int]] = []
+    for day_idx in range(state.num_days):
+      cell = emp_idx * state.num_days + day_idx
+      if state.code_at(cell) != dominant:
+        continue
+      for other_idx, other_cell, other_code in self._day_cells(day_idx):
+        if other_idx == emp_idx:
           continue
-        other_code = _normalize_shift_code(other_assignment.shiftType)
         if other_code in {"O", "V", "A"} or other_code == dominant:
           continue
-        pair = (day_key, employee_id, day_key, other_id)
         if other_code == lacking:
-          candidates.insert(0, pair)
+          candidates.insert(0, (cell, other_cell))
         else:
-          candidates.append(pair)
+          candidates.append((cell, other_cell))
     if not candidates:
       return None
     return self._apply_best_swap(candidates)
@@ -321,93 +466,102 @@ class SchedulePostProcessor:
     return penalty, None
 
   def _resolve_team_gap(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    day_key = violation["date"]
-    shift_code = violation["shiftType"]
-    team_id = violation["teamId"]
-    day_assignments = self.state.assignments_by_day.get(day_key, {})
-    target_assignments = [
-      assignment for assignment in day_assignments.values() if _normalize_shift_code(assignment.shiftType) == shift_code
-    ]
-    other_assignments = [
-      assignment
-      for assignment in day_assignments.values()
-      if _normalize_shift_code(assignment.shiftType) != shift_code and self._employee_in_team(assignment.employeeId, team_id)
-    ]
-    candidates: List[Tuple[str, str, str, str]] = []
-    for assignment in target_assignments:
-      if self._employee_in_team(assignment.employeeId, team_id):
+    return self._resolve_group_gap(violation["date"], violation["shiftType"], self.employee_teams, violation["teamId"])
+
+  def _resolve_career_gap(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
+    return self._resolve_group_gap(
+      violation["date"], violation["shiftType"], self.employee_aliases, violation["careerGroupAlias"]
+    )
+
+  def _resolve_group_gap(
+    self, day_key: str, shift_code: str, groups: List[Optional[str]], group_id: str
+  ) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
+    state = self.state
+    day_idx = state.day_index.get(day_key)
+    if day_idx is None:
+      return None
+    target_cells: List[int] = []
+    other_cells: List[int] = []
+    for emp_idx in range(len(state.employee_ids)):
+      cell = emp_idx * state.num_days + day_idx
+      slot = state.codes[cell]
+      if not slot:
         continue
-      for other in other_assignments:
-        candidates.append((day_key, assignment.employeeId, day_key, other.employeeId))
+      in_group = groups[emp_idx] == group_id
+      if state.slot_codes[slot] == shift_code:
+        if not in_group:
+          target_cells.append(cell)
+      elif in_group:
+        other_cells.append(cell)
+    candidates = [(cell, other) for cell in target_cells for other in other_cells]
     return self._apply_best_swap(candidates)
 
   def _resolve_staffing_shortage(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    day_key = violation["date"]
+    state = self.state
+    day_idx = state.day_index.get(violation["date"])
+    if day_idx is None:
+      return None
     shift_code = violation["shiftType"]
-    candidates: List[Tuple[str, str, str, str]] = []
-    for employee in self.schedule.employees:
-      assignment_today = self.state.assignment_map.get((employee.id, day_key))
-      if not assignment_today or assignment_today.isLocked:
+    candidates: List[Tuple[int, int]] = []
+    for emp_idx in range(len(state.employee_ids)):
+      base = emp_idx * state.num_days
+      cell = base + day_idx
+      if not state.codes[cell] or state.locked[cell]:
         continue
-      for other_day in self.state.day_keys:
-        if other_day == day_key:
+      for other_day in range(state.num_days):
+        if other_day == day_idx:
           continue
-        other_assignment = self.state.assignment_map.get((employee.id, other_day))
-        if not other_assignment or other_assignment.isLocked:
+        other_cell = base + other_day
+        if not state.codes[other_cell] or state.locked[other_cell]:
           continue
-        if _normalize_shift_code(other_assignment.shiftType) != shift_code:
+        if state.code_at(other_cell) != shift_code:
           continue
-        candidates.append((day_key, employee.id, other_day, employee.id))
+        candidates.append((cell, other_cell))
     return self._apply_best_swap(candidates)
 
   def _resolve_team_workload_gap(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    donor_team = violation["teamA"]
-    receiver_team = violation["teamB"]
-    donor_members = self.team_members.get(donor_team, [])
-    receiver_members = self.team_members.get(receiver_team, [])
+    state = self.state
+    donor_members = self.team_member_indices.get(violation["teamA"], [])
+    receiver_members = self.team_member_indices.get(violation["teamB"], [])
     if not donor_members or not receiver_members:
       return None
-    candidates: List[Tuple[str, str, str, str]] = []
+    num_days = state.num_days
+    candidates: List[Tuple[int, int]] = []
     # Same-day swaps where receiver has OFF/행정
-    for day_key in self.state.day_keys:
-      day_assignments = self.state.assignments_by_day.get(day_key, {})
+    for day_idx in range(num_days):
       for donor in donor_members:
-        donor_assignment = day_assignments.get(donor.id)
-        if not donor_assignment or donor_assignment.isLocked:
+        donor_cell = donor * num_days + day_idx
+        if not state.codes[donor_cell] or state.locked[donor_cell]:
           continue
-        if _normalize_shift_code(donor_assignment.shiftType) in {"O"}:
+        if state.code_at(donor_cell) in {"O"}:
           continue
         for receiver in receiver_members:
-          receiver_assignment = day_assignments.get(receiver.id)
-          if not receiver_assignment or receiver_assignment.isLocked:
+          receiver_cell = receiver * num_days + day_idx
+          if not state.codes[receiver_cell] or state.locked[receiver_cell]:
             continue
-          if _normalize_shift_code(receiver_assignment.shiftType) in {"O", "A"}:
-            candidates.append((day_key, donor.id, day_key, receiver.id))
+          if state.code_at(receiver_cell) in {"O", "A"}:
+            candidates.append((donor_cell, receiver_cell))
     # Cross-day swap: donor working day ↔ receiver off day
     max_candidates = 80
     for donor in donor_members:
-      donor_work_days = [
-        day_key
-        for day_key in self.state.day_keys
-        if (assignment := self.state.assignment_map.get((donor.id, day_key)))
-        and not assignment.isLocked
-        and _normalize_shift_code(assignment.shiftType) not in {"O", "A"}
+      donor_work_cells = [
+        cell
+        for cell in range(donor * num_days, (donor + 1) * num_days)
+        if state.codes[cell] and not state.locked[cell] and state.code_at(cell) not in {"O", "A"}
       ]
-      if not donor_work_days:
+      if not donor_work_cells:
         continue
       for receiver in receiver_members:
-        receiver_off_days = [
-          day_key
-          for day_key in self.state.day_keys
-          if (assignment := self.state.assignment_map.get((receiver.id, day_key)))
-          and not assignment.isLocked
-          and _normalize_shift_code(assignment.shiftType) in {"O", "A"}
+        receiver_off_cells = [
+          cell
+          for cell in range(receiver * num_days, (receiver + 1) * num_days)
+          if state.codes[cell] and not state.locked[cell] and state.code_at(cell) in {"O", "A"}
         ]
-        for donor_day in donor_work_days:
+        for donor_cell in donor_work_cells:
           if len(candidates) >= max_candidates:
             break
-          for receiver_day in receiver_off_days:
-            candidates.append((donor_day, donor.id, receiver_day, receiver.id))
+          for receiver_cell in receiver_off_cells:
+            candidates.append((donor_cell, receiver_cell))
             if len(candidates) >= max_candidates:
               break
     if not candidates:
@@ -415,75 +569,51 @@ class SchedulePostProcessor:
     return self._apply_best_swap(candidates)
 
   def _resolve_avoid_pattern_violation(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    employee_id = violation["employeeId"]
+    state = self.state
+    emp_idx = state.employee_index.get(violation["employeeId"])
     start_index = violation.get("startIndex")
     pattern = violation.get("pattern") or []
-    if start_index is None or not pattern:
+    if emp_idx is None or start_index is None or not pattern:
       return None
-    candidates: List[Tuple[str, str, str, str]] = []
+    candidates: List[Tuple[int, int]] = []
     for offset, shift_code in enumerate(pattern):
-      day_position = start_index + offset
-      if day_position >= len(self.state.day_keys):
+      day_idx = start_index + offset
+      if day_idx >= state.num_days:
         break
-      day_key = self.state.day_keys[day_position]
-      day_assignments = self.state.assignments_by_day.get(day_key, {})
-      for other_id, assignment in day_assignments.items():
-        if other_id == employee_id or assignment.isLocked:
-          continue
-        if _normalize_shift_code(assignment.shiftType) == shift_code:
+      cell = emp_idx * state.num_days + day_idx
+      for other_idx, other_cell, other_code in self._day_cells(day_idx):
+        if other_idx == emp_idx or other_code == shift_code:
           continue
-        candidates.append((day_key, employee_id, day_key, other_id))
+        candidates.append((cell, other_cell))
     if not candidates:
       return None
     return self._apply_best_swap(candidates)
 
   def _resolve_special_request(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    employee_id = violation["employeeId"]
-    day_key = violation["date"]
+    state = self.state
+    cell = state.cell_index(violation["employeeId"], violation["date"])
+    if cell is None:
+      return None
     shift_code = violation["shiftType"]
-    candidates: List[Tuple[str, str, str, str]] = []
-    current_assignment = self.state.assignment_map.get((employee_id, day_key))
-    if current_assignment:
-      if _normalize_shift_code(current_assignment.shiftType) != shift_code and not current_assignment.isLocked:
-        day_assignments = self.state.assignments_by_day.get(day_key, {})
-        for other_id, assignment in day_assignments.items():
-          if assignment.isLocked:
-            continue
-          if _normalize_shift_code(assignment.shiftType) == shift_code:
-            candidates.append((day_key, employee_id, day_key, other_id))
-    for other_day in self.state.day_keys:
-      if other_day == day_key:
+    emp_idx, day_idx = divmod(cell, state.num_days)
+    candidates: List[Tuple[int, int]] = []
+    if state.codes[cell] and state.code_at(cell) != shift_code and not state.locked[cell]:
+      for _, other_cell, other_code in self._day_cells(day_idx):
+        if other_code == shift_code:
+          candidates.append((cell, other_cell))
+    base = emp_idx * state.num_days
+    for other_day in range(state.num_days):
+      if other_day == day_idx:
         continue
-      other_assignment = self.state.assignment_map.get((employee_id, other_day))
-      if not other_assignment or other_assignment.isLocked:
-        continue
-      if _normalize_shift_code(other_assignment.shiftType) == shift_code:
-        candidates.append((other_day, employee_id, day_key, employee_id))
-    return self._apply_best_swap(candidates)
-
-  def _resolve_career_gap(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    day_key = violation["date"]
-    shift_code = violation["shiftType"]
-    alias = violation["careerGroupAlias"]
-    day_assignments = self.state.assignments_by_day.get(day_key, {})
-    target_assignments = [
-      assignment for assignment in day_assignments.values() if _normalize_shift_code(assignment.shiftType) == shift_code
-    ]
-    other_assignments = [
-      assignment
-      for assignment in day_assignments.values()
-      if _normalize_shift_code(assignment.shiftType) != shift_code and self._employee_in_career_group(assignment.employeeId, alias)
-    ]
-    candidates: List[Tuple[str, str, str, str]] = []
-    for assignment in target_assignments:
-      if self._employee_in_career_group(assignment.employeeId, alias):
+      other_cell = base + other_day
+      if not state.codes[other_cell] or state.locked[other_cell]:
         continue
-      for other in other_assignments:
-        candidates.append((day_key, assignment.employeeId, day_key, other.employeeId))
+      if state.code_at(other_cell) == shift_code:
+        candidates.append((other_cell, cell))
     return self._apply_best_swap(candidates)
 
   def _resolve_off_balance_gap(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    team_id = violation["teamId"]
+    state = self.state
     employee_a = violation["employeeA"]
     employee_b = violation["employeeB"]
     counts = self._off_day_counts()
@@ -491,17 +621,21 @@ class SchedulePostProcessor:
       donor, receiver = employee_a, employee_b
     else:
       donor, receiver = employee_b, employee_a
-    candidates: List[Tuple[str, str, str, str]] = []
-    for day_key in self.state.day_keys:
-      donor_assignment = self.state.assignment_map.get((donor, day_key))
-      receiver_assignment = self.state.assignment_map.get((receiver, day_key))
-      if not donor_assignment or not receiver_assignment:
+    donor_idx = state.employee_index.get(donor)
+    receiver_idx = state.employee_index.get(receiver)
+    if donor_idx is None or receiver_idx is None:
+      return None
+    candidates: List[Tuple[int, int]] = []
+    for day_idx in range(state.num_days):
+      donor_cell = donor_idx * state.num_days + day_idx
+      receiver_cell = receiver_idx * state.num_days + day_idx
+      if not state.codes[donor_cell] or not state.codes[receiver_cell]:
         continue
-      if _normalize_shift_code(donor_assignment.shiftType) != "O":
+      if state.code_at(donor_cell) != "O":
         continue
-      if _normalize_shift_code(receiver_assignment.shiftType) == "O":
+      if state.code_at(receiver_cell) == "O":
         continue
-      candidates.append((day_key, donor, day_key, receiver))
+      candidates.append((donor_cell, receiver_cell))
     return self._apply_best_swap(candidates)
 
   def _resolve_daily_headcount_gap(self, violation: Dict[str, Any]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
@@ -516,26 +650,16 @@ class SchedulePostProcessor:
     )
     if not partner:
       return None
-    source_day = day_key if is_over else partner.get("date")
-    target_day = partner.get("date") if is_over else day_key
-    if not source_day or not target_day:
+    source_day = self.state.day_index.get(day_key if is_over else partner.get("date"))
+    target_day = self.state.day_index.get(partner.get("date") if is_over else day_key)
+    if source_day is None or target_day is None:
       return None
-    source_assignments = self.state.assignments_by_day.get(source_day, {})
-    target_assignments = self.state.assignments_by_day.get(target_day, {})
-    source_workers = [
-      emp_id
-      for emp_id, assignment in source_assignments.items()
-      if _normalize_shift_code(assignment.shiftType) not in self.off_like_codes and not assignment.isLocked
-    ]
-    target_off = [
-      emp_id
-      for emp_id, assignment in target_assignments.items()
-      if _normalize_shift_code(assignment.shiftType) in self.off_like_codes and not assignment.isLocked
-    ]
-    candidates: List[Tuple[str, str, str, str]] = []
-    for emp_over in source_workers:
-      for emp_under in target_off:
-        candidates.append((source_day, emp_over, target_day, emp_under))
+    source_workers = [cell for _, cell, code in self._day_cells(source_day) if code not in self.off_like_codes]
+    target_off = [cell for _, cell, code in self._day_cells(target_day) if code in self.off_like_codes]
+    candidates: List[Tuple[int, int]] = []
+    for over_cell in source_workers:
+      for under_cell in target_off:
+        candidates.append((over_cell, under_cell))
         if len(candidates) >= 100:
           break
       if len(candidates) >= 100:
@@ -557,15 +681,27 @@ class SchedulePostProcessor:
       "shiftBalanceGaps": [],
       "dailyHeadcountGaps": [],
     }
-    shift_lookup: Dict[Tuple[str, str], List[Assignment]] = defaultdict(list)
-    for assignment in self.state.assignments:
-      shift_code = _normalize_shift_code(assignment.shiftType)
-      shift_lookup[(assignment.date, shift_code)].append(assignment)
-    for day_key in self.state.day_keys:
+    state = self.state
+    shift_counts = Counter(self.fixed_shift_counts)
+    team_counts = Counter(self.fixed_team_counts)
+    alias_counts = Counter(self.fixed_alias_counts)
+    for emp_idx in range(len(state.employee_ids)):
+      team_id = self.employee_teams[emp_idx]
+      alias = self.employee_aliases[emp_idx]
+      base = emp_idx * state.num_days
+      for day_idx in range(state.num_days):
+        code = state.code_at(base + day_idx)
+        if code is None:
+          continue
+        shift_counts[(day_idx, code)] += 1
+        if team_id:
+          team_counts[(day_idx, code, team_id)] += 1
+        if alias:
+          alias_counts[(day_idx, code, alias)] += 1
+    for day_idx, day_key in enumerate(state.day_keys):
       for code, min_required in self.required_staff.items():
         upper = code.upper()
-        assigned = shift_lookup.get((day_key, upper), [])
-        covered = len(assigned)
+        covered = shift_counts[(day_idx, upper)]
         if min_required and covered < min_required:
           diagnostics["staffingShortages"].append(
             {
@@ -578,10 +714,8 @@ class SchedulePostProcessor:
           )
         if upper not in self.team_coverage_shift_codes:
           continue
-        for team_id in self.team_ids:
-          if not self._team_has_eligible_member(team_id, day_key, upper):
-            continue
-          if any(self._employee_in_team(a.employeeId, team_id) for a in assigned):
+        for team_id in self.coverage_teams[(day_idx, upper)]:
+          if team_counts[(day_idx, upper, team_id)]:
             continue
           diagnostics["teamCoverageGaps"].append(
             {
@@ -591,10 +725,8 @@ class SchedulePostProcessor:
               "shortage": 1,
             }
           )
-        for alias in self.career_group_aliases:
-          if not self._career_group_has_eligible(alias, day_key, upper):
-            continue
-          if any(self._employee_in_career_group(a.employeeId, alias) for a in assigned):
+        for alias in self.coverage_aliases[(day_idx, upper)]:
+          if alias_counts[(day_idx, upper, alias)]:
             continue
           diagnostics["careerGroupCoverageGaps"].append(
             {
@@ -614,40 +746,25 @@ class SchedulePostProcessor:
     return diagnostics
 
   def _team_has_eligible_member(self, team_id: str, day_key: str, shift_code: str) -> bool:
-    members = self.team_members.get(team_id, [])
     day = self.state.day_lookup.get(day_key)
     if not day:
       return False
-    for member in members:
-      if self._is_shift_allowed(member, day, shift_code):
-        return True
-    return False
+    return self.eligibility.team_count(team_id, day, shift_code) > 0
 
   def _career_group_has_eligible(self, alias: str, day_key: str, shift_code: str) -> bool:
     day = self.state.day_lookup.get(day_key)
     if not day:
       return False
-    for emp in self.schedule.employees:
-      if emp.careerGroupAlias == alias and self._is_shift_allowed(emp, day, shift_code):
-        return True
-    return False
+    return self.eligibility.group_count(alias, day, shift_code) > 0
 
   def _detect_special_request_misses(self) -> List[Dict[str, str]]:
     misses: List[Dict[str, str]] = []
-    lookup = self.state.assignment_map
-    for request in self.schedule.specialRequests or []:
-      shift = _normalize_shift_code(request.shiftTypeCode)
-      day_key = request.date
-      try:
-        day_key = date.fromisoformat(request.date).isoformat()
-      except ValueError:
-        pass
-      assignment = lookup.get((request.employeeId, day_key))
-      if not assignment:
-        misses.append({"employeeId": request.employeeId, "date": day_key, "shiftType": shift})
-        continue
-      if shift and _normalize_shift_code(assignment.shiftType) != shift:
-        misses.append({"employeeId": request.employeeId, "date": day_key, "shiftType": shift})
+    for employee_id, day_key, shift, cell, missed in self.special_requests:
+      if cell is not None:
+        code = self.state.code_at(cell)
+        missed = code is None or bool(shift and code != shift)
+      if missed:
+        misses.append({"employeeId": employee_id, "date": day_key, "shiftType": shift})
     return misses
 
   def _detect_off_balance_gaps(self) -> List[Dict[str, str]]:
@@ -671,15 +788,17 @@ class SchedulePostProcessor:
     return gaps
 
   def _detect_team_workload_gaps(self) -> List[Dict[str, str]]:
-    workloads: Counter[str] = Counter()
-    for assignment in self.state.assignments:
-      employee = self.state.employee_map.get(assignment.employeeId)
-      if not employee or not employee.teamId:
-        continue
-      code = _normalize_shift_code(assignment.shiftType)
-      if code in {"O", "A", "V"}:
+    state = self.state
+    workloads: Counter[str] = Counter(self.fixed_workloads)
+    for emp_idx, team_id in enumerate(self.employee_teams):
+      if not team_id:
         continue
-      workloads[employee.teamId] += 1
+      base = emp_idx * state.num_days
+      for cell in range(base, base + state.num_days):
+        code = state.code_at(cell)
+        if code is None or code in {"O", "A", "V"}:
+          continue
+        workloads[team_id] += 1
     gaps: List[Dict[str, str]] = []
     for i in range(len(self.team_ids)):
       for j in range(i + 1, len(self.team_ids)):
@@ -704,26 +823,21 @@ class SchedulePostProcessor:
   def _detect_avoid_pattern_violations(self) -> List[Dict[str, str]]:
     if not self.avoid_patterns:
       return []
+    state = self.state
     violations: List[Dict[str, str]] = []
-    total_days = len(self.state.day_keys)
-    for emp in self.schedule.employees:
+    total_days = state.num_days
+    for emp_idx, employee_id in enumerate(state.employee_ids):
+      base = emp_idx * total_days
       for pattern in self.avoid_patterns:
         pattern_length = len(pattern)
         if pattern_length == 0 or pattern_length > total_days:
           continue
         for start in range(0, total_days - pattern_length + 1):
-          matches = True
-          for offset, code in enumerate(pattern):
-            day_key = self.state.day_keys[start + offset]
-            assignment = self.state.assignment_map.get((emp.id, day_key))
-            if not assignment or _normalize_shift_code(assignment.shiftType) != code:
-              matches = False
-              break
-          if matches:
+          if all(state.code_at(base + start + offset) == code for offset, code in enumerate(pattern)):
             violations.append(
               {
-                "employeeId": emp.id,
-                "startDate": self.state.day_keys[start],
+                "employeeId": employee_id,
+                "startDate": state.day_keys[start],
                 "pattern": pattern,
                 "startIndex": start,
               }
@@ -735,28 +849,24 @@ class SchedulePostProcessor:
     gaps: List[Dict[str, str]] = []
     if len(self.core_shift_codes) < 2:
       return gaps
+    state = self.state
     tolerance = self.shift_balance_tolerance
-    for emp in self.schedule.employees:
-      if emp.workPatternType != "three-shift":
+    for emp_idx, employee_id in enumerate(state.employee_ids):
+      if state.employee_map[employee_id].workPatternType != "three-shift":
         continue
       counts: Dict[str, int] = {code: 0 for code in self.core_shift_codes}
-      for day_key in self.state.day_keys:
-        assignment = self.state.assignment_map.get((emp.id, day_key))
-        if not assignment:
-          continue
-        code = _normalize_shift_code(assignment.shiftType)
-        if code not in counts:
-          continue
-        counts[code] = counts.get(code, 0) + 1
-      if not counts:
-        continue
+      base = emp_idx * state.num_days
+      for cell in range(base, base + state.num_days):
+        code = state.code_at(cell)
+        if code in counts:
+          counts[code] += 1
       max_code, max_count = max(counts.items(), key=lambda item: item[1])
       min_code, min_count = min(counts.items(), key=lambda item: item[1])
       diff = max_count - min_count
       if diff > tolerance:
         gaps.append(
           {
-            "employeeId": emp.id,
+            "employeeId": employee_id,
             "dominantShift": max_code,
             "lackingShift": min_code,
             "difference": diff,
@@ -766,11 +876,13 @@ class SchedulePostProcessor:
     return gaps
 
   def _off_day_counts(self) -> Dict[str, int]:
-    counts: Dict[str, int] = Counter()
-    for assignment in self.state.assignments:
-      code = _normalize_shift_code(assignment.shiftType)
-      if code in {"O", "V"}:
-        counts[assignment.employeeId] += 1
+    state = self.state
+    counts: Dict[str, int] = Counter(self.fixed_off_counts)
+    for emp_idx, employee_id in enumerate(state.employee_ids):
+      base = emp_idx * state.num_days
+      for cell in range(base, base + state.num_days):
+        if state.code_at(cell) in {"O", "V"}:
+          counts[employee_id] += 1
     return counts
 
   def _get_daily_balance_config(self) -> Dict[str, Any]:
@@ -824,17 +936,16 @@ class SchedulePostProcessor:
   def _detect_daily_headcount_gaps(self) -> List[Dict[str, Any]]:
     if not self.daily_balance_config.get("enabled", True):
       return []
+    state = self.state
     tolerance = float(self.daily_balance_config.get("tolerance", 0))
     gaps: List[Dict[str, Any]] = []
-    for day_key in self.state.day_keys:
-      day = self.state.day_lookup.get(day_key)
-      target = self._daily_target_for_day(day)
-      assignments = self.state.assignments_by_day.get(day_key, {})
-      actual = sum(
-        1
-        for assignment in assignments.values()
-        if _normalize_shift_code(assignment.shiftType) not in self.off_like_codes
-      )
+    for day_idx, day_key in enumerate(state.day_keys):
+      target = self.daily_targets[day_idx]
+      actual = self.fixed_daily_actuals[day_idx]
+      for cell in range(day_idx, len(state.codes), state.num_days):
+        slot = state.codes[cell]
+        if slot and state.slot_codes[slot] not in self.off_like_codes:
+          actual += 1
       diff = actual - target
       over = max(0.0, diff - tolerance)
       under = max(0.0, -diff - tolerance)
@@ -853,15 +964,16 @@ class SchedulePostProcessor:
     return gaps
 
   def _detect_shift_pattern_breaks(self) -> List[Dict[str, str]]:
+    state = self.state
     violations: List[Dict[str, str]] = []
-    for emp in self.schedule.employees:
+    for emp_idx, employee_id in enumerate(state.employee_ids):
       last_code = None
       streak = 0
-      for idx, day_key in enumerate(self.state.day_keys):
-        assignment = self.state.assignment_map.get((emp.id, day_key))
-        if not assignment:
+      base = emp_idx * state.num_days
+      for idx in range(state.num_days):
+        code = state.code_at(base + idx)
+        if code is None:
           continue
-        code = _normalize_shift_code(assignment.shiftType)
         if code in IGNORE_SHIFT_CODES:
           last_code = code
           streak = 1
@@ -875,9 +987,9 @@ class SchedulePostProcessor:
           start_index = max(0, idx - self.max_same_shift)
           violations.append(
             {
-              "employeeId": emp.id,
+              "employeeId": employee_id,
               "shiftType": code,
-              "startDate": self.state.day_keys[start_index],
+              "startDate": state.day_keys[start_index],
               "window": self.max_same_shift + 1,
               "excess": streak - self.max_same_shift,
             }
@@ -903,21 +1015,21 @@ class SchedulePostProcessor:
       + 12 * daily_gap_penalty * self._weight("dailyBalance")
     )
 
-  def _apply_best_swap(self, candidates: List[Tuple[str, str, str, str]]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    best_improvement: Optional[Tuple[float, str, str, str, str]] = None
-    best_worse: Optional[Tuple[float, str, str, str, str]] = None
-    for day_a, emp_a, day_b, emp_b in candidates:
-      penalty = self._assess_swap_penalty(day_a, emp_a, day_b, emp_b)
+  def _apply_best_swap(self, candidates: List[Tuple[int, int]]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
+    best_improvement: Optional[Tuple[float, int, int]] = None
+    best_worse: Optional[Tuple[float, int, int]] = None
+    for cell_a, cell_b in candidates:
+      penalty = self._assess_swap_penalty(cell_a, cell_b)
       if penalty is None:
         continue
       current = self.current_penalty if self.current_penalty is not None else penalty
       delta = penalty - current
       if delta < -1e-6:
         if not best_improvement or penalty < best_improvement[0]:
-          best_improvement = (penalty, day_a, emp_a, day_b, emp_b)
+          best_improvement = (penalty, cell_a, cell_b)
       else:
         if not best_worse or penalty < best_worse[0]:
-          best_worse = (penalty, day_a, emp_a, day_b, emp_b)
+          best_worse = (penalty, cell_a, cell_b)
     chosen = None
     if best_improvement:
       chosen = best_improvement
@@ -926,77 +1038,80 @@ class SchedulePostProcessor:
       self.accepted_worse_moves += 1
     if not chosen:
       return None
-    _, day_a, emp_a, day_b, emp_b = chosen
-    if not self.state.swap_pair(day_a, emp_a, day_b, emp_b):
+    _, cell_a, cell_b = chosen
+    if not self.evaluator.apply_swap(cell_a, cell_b):
       return None
-    self._register_tabu(day_a, emp_a, day_b, emp_b)
+    self._register_tabu(cell_a, cell_b)
     penalty, diagnostics = self._evaluate(with_diagnostics=True)
+    if VERIFY_DELTA and abs(self.evaluator.penalty() - penalty) > 1e-6:
+      self.delta_resyncs += 1
+      self.evaluator.rebuild()
     return penalty, diagnostics
 
   def _resolve_pattern_violation(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    employee_id = violation["employeeId"]
+    state = self.state
+    emp_idx = state.employee_index.get(violation["employeeId"])
+    if emp_idx is None:
+      return None
     shift_code = violation["shiftType"]
-    candidates: List[Tuple[str, str, str, str]] = []
+    candidates: List[Tuple[int, int]] = []
     # swap 해당 직원의 한 날짜와 다른 직원의 다른 날짜
-    for other_day in self.state.day_keys:
-      other_assignment = self.state.assignment_map.get((employee_id, other_day))
-      if not other_assignment or other_assignment.isLocked:
+    for other_day in range(state.num_days):
+      cell = emp_idx * state.num_days + other_day
+      if not state.codes[cell] or state.locked[cell]:
         continue
-      if _normalize_shift_code(other_assignment.shiftType) != shift_code:
+      if state.code_at(cell) != shift_code:
         continue
-      for third_day in self.state.day_keys:
+      for third_day in range(state.num_days):
         if third_day == other_day:
           continue
-        third_assignments = self.state.assignments_by_day.get(third_day, {})
-        for other_emp, assignment in third_assignments.items():
-          if other_emp == employee_id or assignment.isLocked:
+        for other_idx, other_cell, _ in self._day_cells(third_day):
+          if other_idx == emp_idx:
             continue
-          candidates.append((other_day, employee_id, third_day, other_emp))
+          candidates.append((cell, other_cell))
     return self._apply_best_swap(candidates)
 
   def _resolve_multi_staffing(self, violation: Dict[str, str]) -> Optional[Tuple[float, Dict[str, List[Dict[str, str]]]]]:
-    day_key = violation["date"]
+    state = self.state
+    day_idx = state.day_index.get(violation["date"])
+    if day_idx is None:
+      return None
     shift_code = violation["shiftType"]
-    candidates: List[Tuple[str, str, str, str]] = []
-    day_assignments = self.state.assignments_by_day.get(day_key, {})
+    candidates: List[Tuple[int, int]] = []
     # try swapping any two employees across different days to free up staff for the shortage shift
-    for emp_id, assignment in day_assignments.items():
-      if _normalize_shift_code(assignment.shiftType) == shift_code:
-        continue
-      if assignment.isLocked:
+    for emp_idx, cell, code in self._day_cells(day_idx):
+      if code == shift_code:
         continue
-      for other_day in self.state.day_keys:
-        if other_day == day_key:
+      for other_day in range(state.num_days):
+        if other_day == day_idx:
           continue
-        other_assignment = self.state.assignment_map.get((emp_id, other_day))
-        if not other_assignment or other_assignment.isLocked:
+        other_cell = emp_idx * state.num_days + other_day
+        if not state.codes[other_cell] or state.locked[other_cell]:
           continue
-        if _normalize_shift_code(other_assignment.shiftType) == shift_code:
-          candidates.append((other_day, emp_id, day_key, emp_id))
+        if state.code_at(other_cell) == shift_code:
+          candidates.append((other_cell, cell))
     return self._apply_best_swap(candidates)
 
-  def _assess_swap_penalty(self, day_a: str, emp_a: str, day_b: str, emp_b: str) -> Optional[float]:
-    if self._is_tabu(day_a, emp_a, day_b, emp_b):
+  def _assess_swap_penalty(self, cell_a: int, cell_b: int) -> Optional[float]:
+    if self._is_tabu(cell_a, cell_b):
       return None
-    if not self.state.swap_pair(day_a, emp_a, day_b, emp_b):
+    if not self.state.can_swap_cells(cell_a, cell_b):
       return None
-    penalty, _ = self._evaluate(with_diagnostics=False)
-    self.state.swap_pair(day_a, emp_a, day_b, emp_b)
-    return penalty
+    self.delta_evaluations += 1
+    return self.evaluator.swap_penalty(cell_a, cell_b)
 
-  def _tabu_key(self, day_a: str, emp_a: str, day_b: str, emp_b: str) -> Tuple[Tuple[str, str], Tuple[str, str]]:
-    ordered = tuple(sorted([(day_a, emp_a), (day_b, emp_b)]))
-    return ordered  # type: ignore
+  def _tabu_key(self, cell_a: int, cell_b: int) -> Tuple[int, int]:
+    return (cell_a, cell_b) if cell_a <= cell_b else (cell_b, cell_a)
 
-  def _is_tabu(self, day_a: str, emp_a: str, day_b: str, emp_b: str) -> bool:
+  def _is_tabu(self, cell_a: int, cell_b: int) -> bool:
     if self.tabu_size <= 0:
       return False
-    return self._tabu_key(day_a, emp_a, day_b, emp_b) in self.tabu_set
+    return self._tabu_key(cell_a, cell_b) in self.tabu_set
 
-  def _register_tabu(self, day_a: str, emp_a: str, day_b: str, emp_b: str):
+  def _register_tabu(self, cell_a: int, cell_b: int):
     if self.tabu_size <= 0:
       return
-    key = self._tabu_key(day_a, emp_a, day_b, emp_b)
+    key = self._tabu_key(cell_a, cell_b)
     if key in self.tabu_set:
       return
     if len(self.tabu_queue) >= self.tabu_size:
@@ -1023,26 +1138,3 @@ class SchedulePostProcessor:
       return max(0.1, scalar)
     except (TypeError, ValueError):
       return default
-
-  @staticmethod
-  def _is_shift_allowed(employee: Employee, day: date, shift_code: str) -> bool:
-    upper = shift_code.replace("^", "").upper()
-    if upper == "V":
-      return True
-    if employee.workPatternType == "night-intensive":
-      return upper in {"N", "O", "V"}
-    if employee.workPatternType == "weekday-only":
-      if day.weekday() >= 5:
-        return upper in {"O", "V"}
-      return upper in {"A", "V"}
-    if upper == "A":
-      return False
-    return True
-
-  def _employee_in_team(self, employee_id: str, team_id: str) -> bool:
-    employee = self.state.employee_map.get(employee_id)
-    return bool(employee and employee.teamId == team_id)
-
-  def _employee_in_career_group(self, employee_id: str, alias: str) -> bool:
-    employee = self.state.employee_map.get(employee_id)
-    return bool(employee and employee.careerGroupAlias == alias)
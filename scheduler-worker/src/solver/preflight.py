@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from models import ScheduleInput
+from solver.eligibility import get_eligibility
+
+DEFAULT_REQUIRED_STAFF = {"D": 5, "E": 4, "N": 3}
+# Days below the off-day target the hard row allows staff outside night-intensive patterns.
+MIN_OFF_DAY_SLACK = 2
+
+
+def schedule_dates(schedule: ScheduleInput) -> List[date]:
+  dates: List[date] = []
+  current = schedule.startDate
+  while current <= schedule.endDate:
+    dates.append(current)
+    current += timedelta(days=1)
+  return dates
+
+
+def required_staff_map(schedule: ScheduleInput) -> Dict[str, int]:
+  required: Dict[str, int] = {}
+  raw_required = schedule.requiredStaffPerShift or {}
+  for code, value in raw_required.items():
+    if not code:
+      continue
+    try:
+      parsed = int(value)
+    except (TypeError, ValueError):
+      continue
+    required[code.upper()] = max(0, parsed)
+  for code, default_value in DEFAULT_REQUIRED_STAFF.items():
+    required.setdefault(code, default_value)
+  return required
+
+
+def required_staff_by_date(options: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+  # Per-day staffing overrides ({"2025-04-01": {"D": 4}}), e.g. a team cluster's share of the department.
+  raw = options.get("requiredStaffByDate") or {}
+  overrides: Dict[str, Dict[str, int]] = {}
+  if not isinstance(raw, dict):
+    return overrides
+  for day_key, codes in raw.items():
+    if not isinstance(codes, dict):
+      continue
+    for code, value in codes.items():
+      try:
+        overrides.setdefault(str(day_key)[:10], {})[str(code).upper()] = max(0, int(value))
+      except (TypeError, ValueError):
+        continue
+  return overrides
+
+
+def required_off_days(schedule: ScheduleInput, date_range: Sequence[date]) -> Dict[str, int]:
+  """Off days owed per employee over ``date_range``: weekends/holidays plus carried accruals."""
+  holiday_set = {holiday.date for holiday in (schedule.holidays or [])}
+  weekend_holiday_count = sum(1 for day in date_range if day.weekday() >= 5 or day.isoformat() in holiday_set)
+  night_bonus = max(0, int(getattr(schedule, "nightIntensivePaidLeaveDays", 0) or 0))
+  required: Dict[str, int] = {}
+  for emp in schedule.employees:
+    base = max(0, schedule.previousOffAccruals.get(emp.id, 0))
+    if emp.workPatternType == "three-shift":
+      target = weekend_holiday_count + base
+      if target > 0:
+        required[emp.id] = target
+    elif emp.workPatternType == "night-intensive":
+      target = weekend_holiday_count + base + night_bonus
+      if target > 0:
+        required[emp.id] = target
+  return required
+
+
+def run_preflight_checks(
+  schedule: ScheduleInput,
+  date_range: Optional[List[date]] = None,
+  required: Optional[Dict[str, int]] = None,
+  required_off: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, Any]]:
+  """Eligibility-only checks; nothing here builds a model, so it runs in milliseconds.
+
+  The IR passes the pieces it has already computed; callers without an IR
+  (``/scheduler/preflight``, ``solve_job``) let them be derived.
+  """
+  date_range = date_range if date_range is not None else schedule_dates(schedule)
+  required = required if required is not None else required_staff_map(schedule)
+  required_off = required_off if required_off is not None else required_off_days(schedule, date_range)
+  options = getattr(schedule, "options", {}) or {}
+  overrides = required_staff_by_date(options)
+  eligibility = get_eligibility(schedule)
+  positive = {code: value for code, value in required.items() if value and value > 0}
+  coverage_codes = {code for code in positive if code not in {"O", "A"}}
+  team_ids = sorted({emp.teamId for emp in schedule.employees if getattr(emp, "teamId", None)})
+  group_aliases = sorted(
+    {emp.careerGroupAlias for emp in schedule.employees if getattr(emp, "careerGroupAlias", None)}
+  )
+  employee_map = {emp.id: emp for emp in schedule.employees}
+  total_days = len(date_range)
+  issues: List[Dict[str, Any]] = []
+
+  for emp in schedule.employees:
+    target = required_off.get(emp.id)
+    if target and target > total_days:
+      issues.append(
+        {
+          "type": "offRequirementImpossible",
+          "employeeId": emp.id,
+          "requiredOffDays": target,
+          "availableDays": total_days,
+        }
+      )
+
+  for day in date_range:
+    day_key = day.isoformat()
+    demand = 0
+    staffed_mask = 0
+    for code, value in positive.items():
+      min_required = overrides.get(day_key, {}).get(code.upper(), value)
+      mask = eligibility.mask(day, code)
+      available = mask.bit_count()
+      if available < min_required:
+        issues.append(
+          {
+            "type": "insufficientPotentialStaff",
+            "date": day_key,
+            "shiftType": code.upper(),
+            "required": min_required,
+            "available": available,
+          }
+        )
+      if available and code.upper() not in {"O", "V"}:
+        demand += min_required
+        staffed_mask |= mask
+      if code.upper() in coverage_codes:
+        for team_id in team_ids:
+          if eligibility.team_count(team_id, day, code) == 0:
+            issues.append({"type": "teamCoverageImpossible", "date": day_key, "shiftType": code.upper(), "teamId": team_id})
+        for group_alias in group_aliases:
+          if eligibility.group_count(group_alias, day, code) == 0:
+            issues.append(
+              {
+                "type": "careerGroupCoverageImpossible",
+                "date": day_key,
+                "shiftType": code.upper(),
+                "careerGroupAlias": group_alias,
+              }
+            )
+    # Everyone works at most one shift a day, so the day's demand cannot exceed the staff able to fill it.
+    if demand > staffed_mask.bit_count():
+      issues.append(
+        {
+          "type": "dailyDemandExceedsStaff",
+          "date": day_key,
+          "required": demand,
+          "available": staffed_mask.bit_count(),
+        }
+      )
+
+  for req in schedule.specialRequests or []:
+    if not req.shiftTypeCode:
+      continue
+    emp = employee_map.get(req.employeeId)
+    if not emp:
+      issues.append({"type": "specialRequestUnknownEmployee", "employeeId": req.employeeId, "date": req.date})
+      continue
+    try:
+      req_date = date.fromisoformat(req.date)
+    except ValueError:
+      issues.append({"type": "specialRequestInvalidDate", "employeeId": req.employeeId, "date": req.date})
+      continue
+    if not eligibility.is_allowed(emp, req_date, req.shiftTypeCode):
+      issues.append(
+        {
+          "type": "specialRequestPatternConflict",
+          "employeeId": emp.id,
+          "date": req.date,
+          "requestedShift": req.shiftTypeCode,
+          "workPatternType": emp.workPatternType,
+        }
+      )
+
+  return issues
+
+
+def off_day_slack(csp_options: Dict[str, Any]) -> int:
+  # cspSettings.offTolerance widens the hard off-day row, never below the historical two days.
+  try:
+    parsed = int(csp_options.get("offTolerance", MIN_OFF_DAY_SLACK))
+  except (TypeError, ValueError):
+    parsed = MIN_OFF_DAY_SLACK
+  return max(MIN_OFF_DAY_SLACK, min(parsed, 31))
+
+
+def blocking_issues(schedule: ScheduleInput, issues: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+  """Issues that make the hard rows infeasible with the schedule's own settings.
+
+  Staffing rows are hard once anyone is eligible, so no relaxation removes a
+  staffing shortfall. The off-day row allows ``off_day_slack`` days below target
+  (none for night-intensive staff); relaxation levels widen that slack.
+  """
+  options = getattr(schedule, "options", {}) or {}
+  slack_days = off_day_slack(options.get("cspSettings", {}) or {})
+  employee_map = {emp.id: emp for emp in schedule.employees}
+  blocking: List[Dict[str, Any]] = []
+  for issue in issues:
+    issue_type = issue.get("type")
+    if issue_type == "insufficientPotentialStaff" and issue.get("available", 0) > 0:
+      blocking.append(issue)
+    elif issue_type == "dailyDemandExceedsStaff":
+      blocking.append(issue)
+    elif issue_type == "offRequirementImpossible":
+      emp = employee_map.get(issue.get("employeeId"))
+      slack = 0 if emp is not None and emp.workPatternType == "night-intensive" else slack_days
+      if issue["requiredOffDays"] - slack > issue["availableDays"]:
+        blocking.append(issue)
+  return blocking
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SUBSCRIBER_QUEUE_SIZE = 256
+# Postprocess progress is reported every this many local-search iterations.
+POSTPROCESS_EVENT_EVERY = 25
+
+
+def _deliver(queue: "asyncio.Queue[Any]", item: Any):
+  # Runs on the subscriber's loop; a slow client loses its oldest events, never the latest.
+  if queue.full():
+    queue.get_nowait()
+  queue.put_nowait(item)
+
+
+class JobEvents:
+  """In-process pub/sub for one job's progress.
+
+  Solver and pipeline threads ``emit``; SSE streams ``subscribe`` from the event
+  loop. With no subscribers ``emit`` returns before touching its payload, and
+  only the current phase is remembered so a late subscriber can start from it.
+  """
+
+  def __init__(self):
+    self.phase: Optional[Dict[str, Any]] = None
+    self.started = time.perf_counter()
+    self._lock = threading.Lock()
+    self._subscribers: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[Any]"]] = []
+
+  @property
+  def listening(self) -> bool:
+    return bool(self._subscribers)
+
+  def subscribe(self) -> "asyncio.Queue[Any]":
+    queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    with self._lock:
+      self._subscribers.append((asyncio.get_running_loop(), queue))
+    return queue
+
+  def unsubscribe(self, queue: "asyncio.Queue[Any]"):
+    with self._lock:
+      self._subscribers = [entry for entry in self._subscribers if entry[1] is not queue]
+
+  def _publish(self, item: Any):
+    with self._lock:
+      subscribers = list(self._subscribers)
+    for loop, queue in subscribers:
+      try:
+        loop.call_soon_threadsafe(_deliver, queue, item)
+      except RuntimeError:
+        # The subscriber's loop has shut down; its stream is gone.
+        self.unsubscribe(queue)
+
+  def _elapsed_ms(self) -> int:
+    return int((time.perf_counter() - self.started) * 1000)
+
+  def emit(self, event: str, data: Dict[str, Any] | Callable[[], Dict[str, Any]]):
+    if not self._subscribers:
+      return
+    payload = data() if callable(data) else data
+    self._publish((event, dict(payload, elapsedMs=self._elapsed_ms())))
+
+  def enter_phase(self, phase: str, **details: Any):
+    self.phase = dict(details, phase=phase, elapsedMs=self._elapsed_ms())
+    if self._subscribers:
+      self._publish(("phase", self.phase))
+
+  def close(self, data: Dict[str, Any]):
+    self.emit("done", data)
+    self._publish(None)
+
+
+def job_events(cancel_token: Any) -> Optional[JobEvents]:
+  # Like the incumbent sink, the job's event bus rides on its cancellation token.
+  return getattr(cancel_token, "events", None)
+
+
+def enter_phase(cancel_token: Any, phase: str, **details: Any):
+  events = job_events(cancel_token)
+  if events is not None:
+    events.enter_phase(phase, **details)
+
+
+def emit_event(cancel_token: Any, event: str, data: Dict[str, Any] | Callable[[], Dict[str, Any]]):
+  events = job_events(cancel_token)
+  if events is not None:
+    events.emit(event, data)
+
+
+def postprocess_progress(cancel_token: Any, label: str) -> Optional[Callable[[Dict[str, Any]], None]]:
+  events = job_events(cancel_token)
+  if events is None:
+    return None
+  return lambda stats: events.emit("postprocess", lambda: dict(stats, label=label))
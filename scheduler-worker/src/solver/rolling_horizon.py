@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from models import Assignment, ScheduleInput, WarmStart, WarmStartAssignment
+from solver.model_ir import ScheduleModelIR, _max_same_shift
+from solver.preflight import required_off_days
+
+
+def rolling_horizon_settings(schedule: ScheduleInput) -> Dict[str, Any]:
+  options = getattr(schedule, "options", {}) or {}
+  raw = options.get("rollingHorizon") or {}
+  if not isinstance(raw, dict):
+    raw = {"enabled": raw}
+
+  def _int(key: str, default: int) -> int:
+    try:
+      return int(raw.get(key, default))
+    except (TypeError, ValueError):
+      return default
+
+  window_days = max(2, _int("windowDays", 14))
+  return {
+    "enabled": raw.get("enabled", "auto"),
+    "minDays": _int("minDays", 42),
+    "windowDays": window_days,
+    "overlapDays": min(window_days - 1, max(0, _int("overlapDays", 3))),
+  }
+
+
+def should_roll(schedule: ScheduleInput, settings: Dict[str, Any]) -> bool:
+  enabled = settings.get("enabled")
+  if enabled is False or enabled == "off":
+    return False
+  total_days = (schedule.endDate - schedule.startDate).days + 1
+  if total_days <= settings["windowDays"]:
+    return False
+  if enabled is True or enabled == "on":
+    return True
+  return total_days >= settings["minDays"]
+
+
+@dataclass
+class HorizonWindow:
+  start: date  # first free day
+  end: date  # last day in the model
+  commit_end: date  # last day kept from this window; later days are re-solved by the next one
+
+
+def plan_windows(start: date, end: date, window_days: int, overlap_days: int) -> List[HorizonWindow]:
+  step = window_days - overlap_days
+  windows: List[HorizonWindow] = []
+  current = start
+  while current <= end:
+    window_end = min(end, current + timedelta(days=window_days - 1))
+    commit_end = window_end if window_end == end else current + timedelta(days=step - 1)
+    windows.append(HorizonWindow(start=current, end=window_end, commit_end=commit_end))
+    current = commit_end + timedelta(days=1)
+  return windows
+
+
+def history_days(schedule: ScheduleInput, overlap_days: int) -> int:
+  """Committed days prepended (fixed) to each window so sliding-window rows see the boundary."""
+  options = getattr(schedule, "options", {}) or {}
+  longest = max(overlap_days, _max_same_shift(options.get("cspSettings", {}) or {}) + 1, 2)
+  for emp in schedule.employees:
+    for value in (emp.maxConsecutiveDaysPreferred, emp.maxConsecutiveNightsPreferred):
+      if isinstance(value, int) and value >= 0:
+        longest = max(longest, value + 1)
+  return longest
+
+
+def period_off_targets(model_ir: ScheduleModelIR) -> Dict[str, float]:
+  """Off days each employee should end the period with.
+
+  The weekend/accrual minimum is usually far below what staffing leaves over, so the
+  capacity-implied average is used when larger; windows then hand extra off days to
+  whoever has fallen behind instead of balancing each window in isolation.
+  """
+  total_days = len(model_ir.date_range)
+  # Weekday-only staff fill "A", not the staffed D/E/N capacity, so they stay out of the average.
+  off_eligible = [emp for emp in model_ir.schedule.employees if emp.workPatternType != "weekday-only"]
+  expected = max(0, len(off_eligible) * total_days - model_ir.total_staff_capacity) / max(1, len(off_eligible))
+  return {
+    emp.id: max(float(model_ir.required_off.get(emp.id, 0)), expected)
+    for emp in off_eligible
+    if emp.id in model_ir.required_off
+  }
+
+
+def _date_range(start: date, end: date) -> List[date]:
+  return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def build_window_schedule(
+  schedule: ScheduleInput,
+  window: HorizonWindow,
+  history: List[Assignment],
+  off_targets: Dict[str, float],
+  committed_off: Dict[str, int],
+  max_solve_time_ms: int,
+) -> ScheduleInput:
+  """Sub-schedule for ``window`` with ``history`` pinned in front of it.
+
+  Each window owes whatever brings an employee's committed off days up to a
+  straight-line share of their period target, expressed through
+  ``previousOffAccruals`` on top of the window's own weekends. Without
+  ``off_targets`` only the weekends are owed.
+  """
+  model_start = min((date.fromisoformat(item.date) for item in history), default=window.start)
+  model_days = _date_range(model_start, window.end)
+  elapsed = (window.end - schedule.startDate).days + 1
+  free_days = (window.end - window.start).days + 1
+  total_days = (schedule.endDate - schedule.startDate).days + 1
+  history_off: Dict[str, int] = {}
+  for item in history:
+    if item.shiftType.upper() in {"O", "V"}:
+      history_off[item.employeeId] = history_off.get(item.employeeId, 0) + 1
+  window_weekends = required_off_days(
+    replace(schedule, previousOffAccruals={}, nightIntensivePaidLeaveDays=0), model_days
+  )
+  accruals: Dict[str, int] = {}
+  for emp in schedule.employees:
+    # Catch up to a straight-line share of the period target by the window's last day,
+    # but never ask one window for more than two days beyond its own share.
+    target = off_targets.get(emp.id, 0)
+    due = min(target * elapsed / total_days - committed_off.get(emp.id, 0), target * free_days / total_days + 2)
+    owed = history_off.get(emp.id, 0) + max(0, round(due))
+    accruals[emp.id] = max(0, owed - window_weekends.get(emp.id, 0))
+
+  day_keys = {day.isoformat() for day in model_days}
+  options = dict(getattr(schedule, "options", {}) or {})
+  for key in ("rollingHorizon", "decomposition", "multiRun", "hybrid"):
+    options.pop(key, None)
+  options["maxSolveTimeMs"] = max(1000, int(max_solve_time_ms))
+  warm_start = getattr(schedule, "warmStart", None)
+  seeds = [
+    WarmStartAssignment(employeeId=item.employeeId, date=item.date, shiftType=item.shiftType) for item in history
+  ]
+  if warm_start and warm_start.hard:
+    free_keys = {day.isoformat() for day in _date_range(window.start, window.end)}
+    seeds.extend(item for item in warm_start.assignments if item.date[:10] in free_keys)
+  return replace(
+    schedule,
+    startDate=model_start,
+    endDate=window.end,
+    specialRequests=[req for req in (schedule.specialRequests or []) if req.date[:10] in day_keys],
+    previousOffAccruals=accruals,
+    nightIntensivePaidLeaveDays=0,
+    options=options,
+    # Soft warm starts are dropped: one WarmStart cannot mix pinned history with hints.
+    warmStart=WarmStart(assignments=seeds, hard=True) if seeds else None,
+  )
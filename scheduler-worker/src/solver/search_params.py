@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from ortools.sat import sat_parameters_pb2
+
+from solver.stop_criteria import resolve_stop_criteria
+
+_inflight_lock = threading.Lock()
+_inflight_jobs = 0
+
+
+@contextmanager
+def track_inflight_job() -> Iterator[None]:
+  """Counts a job as in flight so CP-SAT runs can share the cores with it."""
+  global _inflight_jobs
+  with _inflight_lock:
+    _inflight_jobs += 1
+  try:
+    yield
+  finally:
+    with _inflight_lock:
+      _inflight_jobs -= 1
+
+
+def inflight_jobs() -> int:
+  with _inflight_lock:
+    return max(1, _inflight_jobs)
+
+
+def _parse_int(value: Any) -> Optional[int]:
+  if value is None or value == "":
+    return None
+  try:
+    return int(value)
+  except (TypeError, ValueError):
+    return None
+
+
+def available_cores() -> int:
+  override = _parse_int(os.environ.get("CPSAT_AVAILABLE_CORES"))
+  if override and override > 0:
+    return override
+  try:
+    return max(1, len(os.sched_getaffinity(0)))
+  except AttributeError:
+    return max(1, os.cpu_count() or 1)
+
+
+def _parse_float(value: Any) -> Optional[float]:
+  if value is None or value == "":
+    return None
+  try:
+    return float(value)
+  except (TypeError, ValueError):
+    return None
+
+
+def _parse_portfolio(value: Any) -> List[str]:
+  if isinstance(value, str):
+    value = value.split(",")
+  if not isinstance(value, (list, tuple)):
+    return []
+  return [str(name).strip() for name in value if str(name).strip()]
+
+
+def resolve_cpsat_params(options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+  settings = (options or {}).get("cpsatSettings") or {}
+  if not isinstance(settings, dict):
+    settings = {}
+  cores = available_cores()
+  jobs = inflight_jobs()
+
+  workers = _parse_int(settings.get("numWorkers"))
+  source = "job"
+  if workers is None or workers <= 0:
+    workers = _parse_int(os.environ.get("CPSAT_NUM_WORKERS"))
+    source = "env"
+  if workers is None or workers <= 0:
+    workers = max(1, cores // jobs)
+    source = "auto"
+
+  linearization = _parse_int(settings.get("linearizationLevel"))
+  if linearization is None:
+    linearization = _parse_int(os.environ.get("CPSAT_LINEARIZATION_LEVEL"))
+  if linearization is not None:
+    linearization = max(0, min(2, linearization))
+
+  portfolio = _parse_portfolio(settings.get("portfolio"))
+  if not portfolio:
+    portfolio = _parse_portfolio(os.environ.get("CPSAT_PORTFOLIO", ""))
+
+  # cpsatSettings.relativeGapLimit (also set by hybrid targetGap) wins over the engine-neutral stopCriteria.
+  stop = resolve_stop_criteria(options)
+  relative_gap = _parse_float(settings.get("relativeGapLimit"))
+  if relative_gap is None or relative_gap <= 0:
+    relative_gap = stop["relativeGap"]
+
+  return {
+    "numWorkers": workers,
+    "workerSource": source,
+    "availableCores": cores,
+    "inflightJobs": jobs,
+    "linearizationLevel": linearization,
+    "portfolio": portfolio,
+    "relativeGapLimit": relative_gap,
+    "absoluteGapLimit": stop["absoluteGap"],
+  }
+
+
+def apply_cpsat_params(parameters: sat_parameters_pb2.SatParameters, params: Dict[str, Any]) -> Dict[str, Any]:
+  """Writes resolved params onto a CpSolver and returns the values it will run with."""
+  parameters.num_workers = int(params["numWorkers"])
+  if params.get("linearizationLevel") is not None:
+    parameters.linearization_level = int(params["linearizationLevel"])
+  if params.get("portfolio"):
+    parameters.subsolvers.extend(params["portfolio"])
+  if params.get("relativeGapLimit") is not None:
+    parameters.relative_gap_limit = float(params["relativeGapLimit"])
+  if params.get("absoluteGapLimit") is not None:
+    parameters.absolute_gap_limit = float(params["absoluteGapLimit"])
+  return {
+    "numWorkers": parameters.num_workers,
+    "workerSource": params.get("workerSource"),
+    "availableCores": params.get("availableCores"),
+    "inflightJobs": params.get("inflightJobs"),
+    "linearizationLevel": parameters.linearization_level,
+    "portfolio": list(parameters.subsolvers),
+    "relativeGapLimit": parameters.relative_gap_limit,
+    "absoluteGapLimit": parameters.absolute_gap_limit,
+  }
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from itertools import product
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from solver.model_ir import ScheduleModelIR
+
+REST_CODES = ("O", "V")
+
+
+@dataclass(frozen=True)
+class SequenceRules:
+  """Hard per-employee sequence rules the IR spells out as sliding-window rows."""
+
+  max_work_run: Optional[int]
+  max_night_run: Optional[int]
+  avoid: Tuple[Tuple[str, ...], ...]
+
+
+def sequence_mode(options: Optional[Dict[str, Any]]) -> str:
+  settings = (options or {}).get("cpsatSettings") or {}
+  if not isinstance(settings, dict):
+    return "linear"
+  return "automaton" if settings.get("sequenceConstraints") == "automaton" else "linear"
+
+
+def employee_sequence_rules(model_ir: ScheduleModelIR, emp) -> Tuple[Optional[SequenceRules], Set[str]]:
+  """Rules for ``emp`` and the names of the IR rows they replace (same guards as the IR builders)."""
+  total_days = len(model_ir.date_range)
+  names: Set[str] = set()
+  max_work_run = emp.maxConsecutiveDaysPreferred
+  if isinstance(max_work_run, int) and max_work_run >= 0 and max_work_run + 1 <= total_days:
+    names.update(f"max_consecutive_work_{emp.id}_{start}" for start in range(total_days - max_work_run))
+  else:
+    max_work_run = None
+  max_night_run = emp.maxConsecutiveNightsPreferred
+  if (
+    isinstance(max_night_run, int)
+    and max_night_run >= 0
+    and "N" in model_ir.shift_code_set
+    and max_night_run + 1 <= total_days
+  ):
+    names.update(f"max_consecutive_nights_{emp.id}_{start}" for start in range(total_days - max_night_run))
+  else:
+    max_night_run = None
+  avoid = tuple(tuple(pattern) for pattern in model_ir.avoid_patterns if len(pattern) <= total_days)
+  for pattern in avoid:
+    names.update(f"avoid_{emp.id}_{len(pattern)}_{start}" for start in range(total_days - len(pattern) + 1))
+  if max_work_run is None and max_night_run is None and not avoid:
+    return None, names
+  return SequenceRules(max_work_run, max_night_run, avoid), names
+
+
+def build_transitions(codes: Sequence[str], rules: SequenceRules) -> Tuple[int, List[int], List[Tuple[int, int, int]]]:
+  """Automaton over shift-code labels (index into ``codes``) that accepts exactly the legal sequences.
+
+  A state is (current work run, current night run, last codes that can still start
+  an avoid pattern); codes no pattern mentions collapse into one placeholder.
+  """
+  depth = max((len(pattern) for pattern in rules.avoid), default=1) - 1
+  tracked = {code for pattern in rules.avoid for code in pattern}
+  start = (0, 0, ())
+  states: Dict[Tuple[int, int, Tuple[str, ...]], int] = {start: 0}
+  queue = [start]
+  transitions: List[Tuple[int, int, int]] = []
+  while queue:
+    state = queue.pop()
+    work_run, night_run, tail = state
+    for label, code in enumerate(codes):
+      next_work = 0
+      if rules.max_work_run is not None and code not in REST_CODES:
+        next_work = work_run + 1
+        if next_work > rules.max_work_run:
+          continue
+      next_night = 0
+      if rules.max_night_run is not None and code == "N":
+        next_night = night_run + 1
+        if next_night > rules.max_night_run:
+          continue
+      recent = tail + (code if code in tracked else "*",)
+      if any(recent[-len(pattern):] == pattern for pattern in rules.avoid if len(recent) >= len(pattern)):
+        continue
+      target = (next_work, next_night, recent[-depth:] if depth else ())
+      if target not in states:
+        states[target] = len(states)
+        queue.append(target)
+      transitions.append((states[state], label, states[target]))
+  return 0, list(states.values()), transitions
+
+
+def night_window_rules(model_ir: ScheduleModelIR, emp) -> Tuple[Dict[int, List[Tuple[int, int, str]]], Set[str]]:
+  """Night-intensive 4/5-day windows keyed by start day: (length, slack column, kind).
+
+  Returns the windows and the names of the IR rows they replace.
+  """
+  day_index = {day.isoformat(): idx for idx, day in enumerate(model_ir.date_range)}
+  windows: Dict[int, List[Tuple[int, int, str]]] = {}
+  names: Set[str] = set()
+  for entry in model_ir.shift_repeat_entries:
+    if entry["employeeId"] != emp.id or entry["kind"] not in ("night_limit", "night_off_buffer"):
+      continue
+    start = day_index[entry["startDate"]]
+    windows.setdefault(start, []).append((entry["window"], entry["var"], entry["kind"]))
+    names.add(f"{entry['kind']}_{emp.id}_{start}")
+  return windows, names
+
+
+def window_slack(kind: str, codes: Sequence[str]) -> int:
+  # The smallest slack each IR row accepts: N beyond 3 in 4 days, O short of 2 in 5 days.
+  if kind == "night_limit":
+    return max(0, sum(1 for code in codes if code == "N") - 3)
+  return max(0, 2 - sum(1 for code in codes if code == "O"))
+
+
+def window_tuples(
+  domains: Sequence[Sequence[Tuple[int, str]]], rules: Sequence[Tuple[int, Optional[float], str]]
+) -> List[Tuple[int, ...]]:
+  """Allowed (code labels..., free slacks...) rows for one table.
+
+  ``domains`` lists each day's (label, code) options. A rule with a fixed slack
+  (presolve already pinned the column) filters tuples instead of adding a column.
+  """
+  tuples: List[Tuple[int, ...]] = []
+  for combo in product(*domains):
+    codes = [code for _, code in combo]
+    slacks: List[int] = []
+    for length, fixed, kind in rules:
+      value = window_slack(kind, codes[:length])
+      if fixed is None:
+        slacks.append(value)
+      elif value > fixed:
+        break
+    else:
+      tuples.append(tuple(label for label, _ in combo) + tuple(slacks))
+  return tuples
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+
+def _positive_float(value: Any) -> Optional[float]:
+  if value is None or value == "":
+    return None
+  try:
+    parsed = float(value)
+  except (TypeError, ValueError):
+    return None
+  return parsed if parsed > 0 else None
+
+
+def resolve_stop_criteria(options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+  """Per-job early stops from ``options.stopCriteria``.
+
+  ``relativeGap``/``absoluteGap`` end the search once the incumbent is that close
+  to the best bound; ``noImprovementMs`` ends it once the incumbent has not
+  improved for that long. Unset or non-positive values leave the engine default.
+  """
+  raw = (options or {}).get("stopCriteria") or {}
+  if not isinstance(raw, dict):
+    raw = {}
+  no_improvement = _positive_float(raw.get("noImprovementMs"))
+  return {
+    "relativeGap": _positive_float(raw.get("relativeGap")),
+    "absoluteGap": _positive_float(raw.get("absoluteGap")),
+    "noImprovementMs": int(no_improvement) if no_improvement is not None else None,
+  }
+
+
+def objective_report(objective: Optional[float], bound: Optional[float]) -> Dict[str, Any]:
+  # Same relative-gap convention as CP-SAT: |objective - bound| / max(1, |objective|).
+  report: Dict[str, Any] = {"value": objective, "bestBound": bound, "absoluteGap": None, "relativeGap": None}
+  if objective is None or bound is None:
+    return report
+  absolute = max(0.0, abs(objective - bound))
+  report["absoluteGap"] = absolute
+  report["relativeGap"] = absolute / max(1.0, abs(objective))
+  return report
+
+
+def gap_stop(report: Dict[str, Any], relative_gap: Optional[float], absolute_gap: Optional[float]) -> Optional[str]:
+  """Which gap limit ended a search the engine called optimal while the bound was still open."""
+  if not report["absoluteGap"]:
+    return None
+  if relative_gap and report["relativeGap"] <= relative_gap + 1e-9:
+    return "relativeGap"
+  if absolute_gap and report["absoluteGap"] <= absolute_gap + 1e-9:
+    return "absoluteGap"
+  return None
@@ -5,6 +5,9 @@ from models import Assignment
 
 SolveStatus = Literal["optimal", "feasible", "timeout", "cancelled", "infeasible", "error"]
 
+# How often solver watchers poll a cancellation token; keeps cancel-to-stop under 100 ms.
+CANCEL_POLL_SECONDS = 0.02
+
 
 class CancellationToken(Protocol):
   """Lightweight protocol to share cancellation intent across solver threads."""
@@ -0,0 +1,92 @@
+import os
+import sys
+import tempfile
+import threading
+from collections import deque
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+  sys.path.insert(0, str(SRC_DIR))
+# pipeline.log_json writes every attempt's input/output; keep it out of the source tree.
+os.environ.setdefault("MILP_LOG_DIR", tempfile.mkdtemp(prefix="milp-logs-"))
+
+
+def build_payload(employees: int = 24, days: int = 28, teams: int = 3) -> dict:
+  """A three-shift ward big enough that neither engine proves optimality in a few seconds."""
+  start = date(2025, 4, 1)
+  groups = ["JR", "MD", "SR"]
+  staff = [
+    {
+      "id": f"emp-{index:02d}",
+      "name": f"E{index}",
+      "role": "RN",
+      "teamId": f"team-{index % teams}",
+      "workPatternType": "three-shift",
+      "careerGroupAlias": groups[index % len(groups)],
+      "maxConsecutiveDaysPreferred": 5,
+    }
+    for index in range(employees)
+  ]
+  shifts = [
+    {"id": "shift-d", "code": "D", "type": "day", "name": "Day", "time": {"start": "08:00", "end": "16:00", "hours": 8}},
+    {"id": "shift-e", "code": "E", "type": "evening", "name": "Evening", "time": {"start": "16:00", "end": "00:00", "hours": 8}},
+    {"id": "shift-n", "code": "N", "type": "night", "name": "Night", "time": {"start": "00:00", "end": "08:00", "hours": 8}},
+    {"id": "shift-o", "code": "O", "type": "off", "name": "Off", "time": {"start": "00:00", "end": "00:00", "hours": 0}},
+  ]
+  per_shift = max(1, employees // 6)
+  return {
+    "departmentId": "dept",
+    "startDate": start.isoformat(),
+    "endDate": (start + timedelta(days=days - 1)).isoformat(),
+    "employees": staff,
+    "shifts": shifts,
+    "requiredStaffPerShift": {"D": per_shift, "E": per_shift, "N": max(1, per_shift - 1)},
+    "specialRequests": [],
+    "holidays": [],
+    "teamPattern": {"pattern": ["D", "E", "N", "O"], "avoidPatterns": [["N", "D"]]},
+    "previousOffAccruals": {},
+    "options": {"maxSolveTimeMs": 60000},
+  }
+
+
+class LocalRedis:
+  """In-process stand-in for the handful of Upstash commands the worker uses."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.values = {}
+    self.lists = {}
+
+  def get(self, key):
+    with self._lock:
+      return self.values.get(key)
+
+  def set(self, key, value):
+    if not isinstance(value, (str, int, float, bool)):
+      raise TypeError(f"Upstash SET takes scalars, got {type(value).__name__}")
+    with self._lock:
+      self.values[key] = value
+    return "OK"
+
+  def expire(self, key, seconds):
+    return 1
+
+  def rpush(self, key, *values):
+    with self._lock:
+      queue = self.lists.setdefault(key, deque())
+      queue.extend(values)
+      return len(queue)
+
+  def lpop(self, key, count=None):
+    with self._lock:
+      queue = self.lists.get(key)
+      return queue.popleft() if queue else None
+
+
+@pytest.fixture
+def schedule_payload():
+  return build_payload()
@@ -0,0 +1,125 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from conftest import build_payload
+from models import Assignment, parse_schedule_input
+from pipeline import solve_job
+from solver.cpsat_solver import CpSatScheduler, solve_with_cpsat
+from solver.exceptions import SolverFailure
+from solver.model_ir import get_model_ir
+from solver import ortools_solver
+from solver.ortools_solver import solve_with_ortools
+from solver.postprocessor import SchedulePostProcessor
+from solver.preflight import schedule_dates
+
+# Cancel-to-idle target is 100 ms: watchers poll every 20 ms, the rest is unwinding (result assembly,
+# killing the CBC worker); the extra 50 ms absorbs scheduler jitter on shared CI runners.
+# The IR build is shared and cached across attempts and is not interruptible, so tests build it up front.
+CANCEL_LATENCY_BOUND_S = 0.15
+
+
+class TimedToken:
+  def __init__(self, delay_s: float):
+    self.cancelled = False
+    self.cancelled_at = None
+    self._timer = threading.Timer(delay_s, self._trip)
+    self._timer.daemon = True
+
+  def _trip(self):
+    self.cancelled_at = time.perf_counter()
+    self.cancelled = True
+
+  def start(self) -> "TimedToken":
+    self._timer.start()
+    return self
+
+
+def _latency_after_cancel(run, token: TimedToken) -> float:
+  token.start()
+  try:
+    run()
+  except SolverFailure:
+    pass
+  returned_at = time.perf_counter()
+  if token.cancelled_at is None:
+    pytest.skip("solve finished before the cancel fired")
+  return returned_at - token.cancelled_at
+
+
+def _only_idle_cbc_workers_remain() -> bool:
+  # Workers parked between solves are fine; the one running the cancelled solve must be gone.
+  idle = {worker.process.pid for worker in ortools_solver._IDLE_WORKERS}
+  return {child.pid for child in multiprocessing.active_children()} <= idle
+
+
+def test_cpsat_stops_while_lowering(schedule_payload):
+  schedule = parse_schedule_input(schedule_payload)
+  get_model_ir(schedule)
+  token = TimedToken(0.1)
+  latency = _latency_after_cancel(lambda: solve_with_cpsat(schedule, token), token)
+  assert latency < CANCEL_LATENCY_BOUND_S
+
+
+def test_cpsat_stops_before_first_solution(schedule_payload):
+  schedule = parse_schedule_input(schedule_payload)
+  model_ir = get_model_ir(schedule)
+  # Lower up front so the cancel lands in the search, not in building the model.
+  session = CpSatScheduler(schedule, model_ir)
+  session.build_model()
+  model_ir.sessions["cpsat"] = session
+  token = TimedToken(0.3)
+  latency = _latency_after_cancel(lambda: solve_with_cpsat(schedule, token), token)
+  assert latency < CANCEL_LATENCY_BOUND_S
+
+
+def test_cbc_cancel_kills_worker_process(schedule_payload):
+  schedule = parse_schedule_input(schedule_payload)
+  get_model_ir(schedule)
+  token = TimedToken(1.0)
+  latency = _latency_after_cancel(lambda: solve_with_ortools(schedule, token), token)
+  assert latency < CANCEL_LATENCY_BOUND_S
+  assert _only_idle_cbc_workers_remain()
+
+
+def test_cbc_worker_keeps_lowered_session():
+  payload = build_payload(employees=12, days=14)
+
+  class IdleToken:
+    cancelled = False
+
+  first = solve_with_ortools(parse_schedule_input(payload), IdleToken())
+  second = solve_with_ortools(parse_schedule_input(payload), IdleToken())
+  assert first.diagnostics["lowering"]["isolated"]
+  assert second.diagnostics["lowering"]["reused"]
+  # Cache stats are the parent's: the second job found the first job's IR.
+  assert second.diagnostics["modelCache"]["hit"]
+  assert second.diagnostics["modelCache"]["hits"] >= 1
+
+
+def test_postprocessor_checks_token(schedule_payload):
+  schedule_payload["options"]["cspSettings"] = {"maxIterations": 10**9, "timeLimitMs": 60000}
+  schedule = parse_schedule_input(schedule_payload)
+  # Everyone off every day: the local search always has a staffing violation to work on.
+  assignments = [
+    Assignment(employeeId=emp.id, date=day.isoformat(), shiftId="shift-o", shiftType="O")
+    for emp in schedule.employees
+    for day in schedule_dates(schedule)
+  ]
+  token = TimedToken(0.3)
+  postprocessor = SchedulePostProcessor(schedule, assignments, {}, schedule.options, cancel_token=token)
+  latency = _latency_after_cancel(postprocessor.run, token)
+  assert latency < CANCEL_LATENCY_BOUND_S
+  assert postprocessor.cancelled
+
+
+def test_solve_job_cancel_skips_relaxation_ladder(schedule_payload):
+  schedule = parse_schedule_input(schedule_payload)
+  get_model_ir(schedule)
+  token = TimedToken(1.0)
+  # A cancelled CBC attempt must not fall through to relaxed-1..3 and the CP-SAT fallback.
+  latency = _latency_after_cancel(lambda: solve_job(schedule, "ortools", token), token)
+  assert latency < CANCEL_LATENCY_BOUND_S
+  assert _only_idle_cbc_workers_remain()
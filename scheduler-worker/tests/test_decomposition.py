@@ -0,0 +1,66 @@
+from dataclasses import replace
+
+import pipeline
+from conftest import build_payload
+from models import parse_schedule_input
+from solver.decomposition import find_repair_days, plan_clusters
+from solver.model_ir import get_model_ir
+from solver.ortools_solver import solve_with_ortools
+
+BROKEN_DAYS = ("2025-04-01", "2025-04-10")
+
+
+def _schedule():
+  # Three teams of six; a cluster limit of six forces one cluster per team. Three per
+  # shift lets every team and career group cover every shift, so only broken days need repair.
+  payload = build_payload(employees=18, days=21)
+  payload["requiredStaffPerShift"] = {"D": 3, "E": 3, "N": 3}
+  payload["options"].update(maxSolveTimeMs=30000, decomposition={"enabled": True, "maxClusterSize": 6})
+  return parse_schedule_input(payload)
+
+
+def test_cluster_requirements_sum_to_department_requirement():
+  model_ir = get_model_ir(_schedule())
+  clusters = plan_clusters(model_ir, 6)
+  assert len(clusters) == 3
+  for (day_key, code), required in model_ir.staffing_requirements.items():
+    assert sum(cluster.required_by_date[day_key][code] for cluster in clusters) == required
+
+
+def test_repair_days_stay_inside_the_period():
+  model_ir = get_model_ir(_schedule())
+  period = {day.isoformat() for day in model_ir.date_range}
+  # An empty schedule breaks every staffing row, first and last day included.
+  assert find_repair_days(model_ir, [], radius=2) == period
+
+
+def test_coordination_keeps_merged_cells_outside_repair_days(monkeypatch):
+  schedule = _schedule()
+  coordination = []
+
+  def broken_subproblem(subproblem, engine, cancel_token):
+    # Every cluster sends its staff off on the broken days, so those days' staffing rows fail.
+    result = solve_with_ortools(subproblem, cancel_token)
+    result.assignments = [
+      replace(item, shiftId="shift-o", shiftType="O") if item.date in BROKEN_DAYS else item
+      for item in result.assignments
+    ]
+    return result
+
+  def raw_coordination(coordination_schedule, label, cancel_token=None):
+    # Skip postprocessing so the check sees exactly what the coordination solve returned.
+    coordination.append(coordination_schedule)
+    return solve_with_ortools(coordination_schedule, cancel_token)
+
+  monkeypatch.setattr(pipeline, "_solve_subproblem", broken_subproblem)
+  monkeypatch.setattr(pipeline, "attempt_schedule_run", raw_coordination)
+  result = pipeline.attempt_decomposed_schedule_run(schedule, "decomposed", preferred_solver="ortools")
+  report = result.diagnostics["decomposition"]
+  assert report["coordination"] == "repair"
+  assert report["repairDays"] == ["2025-04-01", "2025-04-02", "2025-04-09", "2025-04-10", "2025-04-11"]
+  pinned = coordination[0].warmStart.assignments
+  assert len(pinned) == 18 * (21 - len(report["repairDays"]))
+  solved = {(item.employeeId, item.date): item.shiftType.upper() for item in result.assignments}
+  assert all(solved[(item.employeeId, item.date)] == item.shiftType.upper() for item in pinned)
+  for day in BROKEN_DAYS:
+    assert sum(1 for (_, date_key), code in solved.items() if date_key == day and code != "O") >= 9
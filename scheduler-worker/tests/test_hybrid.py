@@ -0,0 +1,54 @@
+import copy
+import time
+
+import pipeline
+from conftest import build_payload
+from models import parse_schedule_input
+from solver.cpsat_solver import solve_with_cpsat
+from solver.exceptions import SolverFailure
+from solver.incumbents import publish_incumbent
+from solver.model_ir import get_model_ir
+from solver.ortools_solver import solve_with_ortools
+from solver.types import SolveResult
+
+
+def test_cpsat_takes_seeded_incumbent_as_hint():
+  schedule = parse_schedule_input(build_payload(employees=12, days=14))
+  model_ir = get_model_ir(schedule)
+  cbc = solve_with_ortools(schedule)
+  seeded = copy.copy(schedule)
+  seeded._incumbent_hint = model_ir.assignment_indices(cbc.assignments)
+  seeded.options = dict(schedule.options, maxSolveTimeMs=5000)
+  result = solve_with_cpsat(seeded)
+  assert result.diagnostics["lowering"]["incumbentHint"]
+  assert result.assignments
+
+
+def test_hybrid_restarts_cpsat_from_cbc_incumbent(monkeypatch):
+  schedule = parse_schedule_input(build_payload(employees=12, days=14))
+  model_ir = get_model_ir(schedule)
+  cbc_active = model_ir.assignment_indices(solve_with_ortools(schedule).assignments)
+  hints = []
+
+  def fake_cbc(engine_schedule, label, token):
+    publish_incumbent(token, model_ir, lambda: cbc_active, 100.0, "cbc")
+    # A penalty above targetPenalty, so CBC does not win outright.
+    diagnostics = {"postprocess": {"finalPenalty": 50.0}}
+    return SolveResult(assignments=[], diagnostics=diagnostics, status="timeout", solve_time_ms=1, best_objective=100.0)
+
+  def fake_cpsat(engine_schedule, label, token):
+    hints.append(getattr(engine_schedule, "_incumbent_hint", None))
+    if len(hints) == 1:
+      # Still searching without an incumbent when CBC returns.
+      while not token.cancelled:
+        time.sleep(0.01)
+      raise SolverFailure("Solver cancelled")
+    diagnostics = {"postprocess": {"finalPenalty": 10.0}}
+    return SolveResult(assignments=[], diagnostics=diagnostics, status="feasible", solve_time_ms=1, best_objective=90.0)
+
+  monkeypatch.setattr(pipeline, "attempt_schedule_run", fake_cbc)
+  monkeypatch.setattr(pipeline, "attempt_cpsat_schedule_run", fake_cpsat)
+  result = pipeline.attempt_hybrid_schedule_run(schedule, "hybrid")
+  assert hints == [None, cbc_active]
+  assert result.diagnostics["hybrid"]["engines"]["cpsat"]["seededFrom"] == "ortools"
+  assert result.diagnostics["hybrid"]["winner"] == "cpsat"
@@ -0,0 +1,80 @@
+import json
+import threading
+
+from fastapi.testclient import TestClient
+
+import app as worker
+from conftest import LocalRedis, build_payload
+
+PHASES = ["parse", "preflight", "build", "solve", "postprocess", "serialize"]
+
+
+def _read_events(client, job_id):
+  events = []
+  with client.stream("GET", f"/scheduler/jobs/{job_id}/events") as response:
+    assert response.headers["content-type"].startswith("text/event-stream")
+    event = None
+    for line in response.iter_lines():
+      if line.startswith("event: "):
+        event = line[len("event: "):]
+      elif line.startswith("data: "):
+        events.append((event, json.loads(line[len("data: "):])))
+  return events
+
+
+def test_local_job_streams_phases_then_done(monkeypatch):
+  monkeypatch.setattr(worker, "UPSTASH_CLIENT", None)
+  monkeypatch.setattr(worker, "JOB_RETENTION_SECONDS", 0)
+  process_job = worker.process_job
+
+  async def process_when_subscribed(job, payload):
+    # Hold the job until the stream subscribes so it sees every phase, not just the current one.
+    while not job.events.listening:
+      await worker.asyncio.sleep(0.01)
+    await process_job(job, payload)
+
+  monkeypatch.setattr(worker, "process_job", process_when_subscribed)
+  payload = build_payload(employees=12, days=7)
+  payload["options"]["maxSolveTimeMs"] = 5000
+  with TestClient(worker.app) as client:
+    job_id = client.post("/scheduler/jobs", json={"milpInput": payload, "solver": "cpsat"}).json()["jobId"]
+    events = _read_events(client, job_id)
+
+  assert events[0][0] == "status" and events[0][1]["status"] == "queued"
+  phases = [data["phase"] for event, data in events if event == "phase"]
+  assert sorted(set(phases), key=phases.index) == PHASES
+  assert phases[-1] == "serialize"
+  event, data = events[-1]
+  assert event == "done"
+  # A 5s budget may end as timedout; either way the stream closes on the job's final status.
+  assert data["status"] in {"completed", "timedout"}
+
+
+def test_remote_job_streams_record_until_terminal(monkeypatch):
+  upstash = LocalRedis()
+  monkeypatch.setattr(worker, "UPSTASH_CLIENT", upstash)
+  monkeypatch.setattr(worker, "UPSTASH_CONSUMER_ENABLED", False)
+  monkeypatch.setattr(worker, "INCUMBENT_PERSIST_SECONDS", 0.05)
+  # Another machine is solving the job: only its record in Upstash is visible here.
+  job = worker.InternalJobState("remote-job")
+  job.mark_processing()
+  key = worker._job_record_key(job.id)
+  upstash.set(key, json.dumps(worker.job_to_record(job)))
+
+  def finish():
+    job.mark_completed({"assignments": []})
+    upstash.set(key, json.dumps(worker.job_to_record(job)))
+
+  timer = threading.Timer(0.3, finish)
+  with TestClient(worker.app) as client:
+    timer.start()
+    try:
+      events = _read_events(client, job.id)
+    finally:
+      timer.cancel()
+
+  assert [(event, data["status"]) for event, data in events] == [
+    ("status", "processing"),
+    ("status", "completed"),
+    ("done", "completed"),
+  ]
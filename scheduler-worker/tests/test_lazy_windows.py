@@ -0,0 +1,35 @@
+from conftest import build_payload
+from models import parse_schedule_input
+from solver.ortools_solver import OrToolsMilpSolver
+
+
+class FirstRoundStarved:
+  """Runs the first lazy round with a 1 ms limit, as if its half of the budget ran out."""
+
+  def __init__(self, solver):
+    self.solver = solver
+    self.calls = 0
+
+  def __getattr__(self, name):
+    return getattr(self.solver, name)
+
+  def Solve(self, params):
+    self.calls += 1
+    if self.calls == 1:
+      self.solver.SetTimeLimit(1)
+    return self.solver.Solve(params)
+
+
+def test_lazy_round_without_solution_falls_through_to_full_model():
+  payload = build_payload(employees=12, days=14)
+  payload["options"].update(lazyWindows=True, maxSolveTimeMs=20000)
+  schedule = parse_schedule_input(payload)
+  solver = OrToolsMilpSolver(schedule)
+  solver.build_model()
+  solver.solver = FirstRoundStarved(solver.solver)
+  result = solver.solve()
+  lazy_stats = result.diagnostics["lowering"]["lazyWindows"]
+  assert result.assignments
+  assert lazy_stats["timedOutRound"] == 1
+  assert lazy_stats["rounds"] == 2
+  assert lazy_stats["pendingRows"] == 0
@@ -0,0 +1,86 @@
+import copy
+from collections import Counter
+
+from conftest import build_payload
+from models import parse_schedule_input
+from solver.model_cache import structural_fingerprint
+from solver.model_ir import ScheduleModelIR, model_signature
+from solver.ortools_solver import solve_with_ortools
+
+
+def _schedule(**options):
+  payload = build_payload(employees=12, days=14)
+  payload["options"].update(maxSolveTimeMs=20000, **options)
+  return parse_schedule_input(payload)
+
+
+def _fingerprint(schedule):
+  return structural_fingerprint(schedule, model_signature(schedule))
+
+
+def test_fingerprint_ignores_weights_but_not_structure():
+  schedule = _schedule()
+  reweighted = copy.deepcopy(schedule)
+  reweighted.options["constraintWeights"] = {"staffing": 0.3, "offBalance": 2.0}
+  assert _fingerprint(reweighted) == _fingerprint(schedule)
+  smaller = copy.deepcopy(schedule)
+  smaller.employees = smaller.employees[:-1]
+  assert _fingerprint(smaller) != _fingerprint(schedule)
+  stricter = copy.deepcopy(schedule)
+  stricter.options["cspSettings"] = {"maxSameShift": 1}
+  assert _fingerprint(stricter) != _fingerprint(schedule)
+
+
+def test_presolve_prunes_forbidden_cells_and_fixed_columns():
+  payload = build_payload(employees=12, days=14)
+  payload["employees"][0]["workPatternType"] = "night-intensive"
+  # A day shift the night-intensive pattern rules out: a guaranteed miss whose slack is fixed at 1.
+  payload["specialRequests"] = [{"employeeId": "emp-00", "date": "2025-04-03", "requestType": "shift", "shiftTypeCode": "D"}]
+  model_ir = ScheduleModelIR(parse_schedule_input(payload))
+  stats = model_ir.presolve_stats
+  assert stats["skippedCells"] > 0 and stats["fixedVariables"] > 0 and stats["droppedRows"] > 0
+  assert ("emp-00", "2025-04-03", "D") not in model_ir.variables
+  assert all(model_ir.var_fixed[idx] is None for row in model_ir.row_indices for idx in row)
+  assert len(model_ir.free_assignment_indices) + stats["fixedCells"] == model_ir.num_assignment_vars
+
+
+def test_warm_start_hints_and_hard_pins():
+  schedule = _schedule()
+  solved = solve_with_ortools(schedule).assignments
+  pinned = [item for item in solved if item.employeeId == "emp-00"]
+  warm = [{"employeeId": item.employeeId, "date": item.date, "shiftType": item.shiftType} for item in pinned]
+
+  payload = build_payload(employees=12, days=14)
+  payload["warmStart"] = {"assignments": warm}
+  soft = ScheduleModelIR(parse_schedule_input(payload))
+  assert soft.warm_start_stats == {"hintedCells": len(pinned), "ignored": 0, "hard": False}
+  assert sum(value for _, value in soft.free_hints()) == len(pinned)
+
+  payload["warmStart"] = {"assignments": warm, "hard": True}
+  payload["options"]["maxSolveTimeMs"] = 20000
+  hard_schedule = parse_schedule_input(payload)
+  # Hard hints become rows that presolve folds into fixed cells, so nothing is left to hint.
+  assert ScheduleModelIR(hard_schedule).free_hints() == []
+  result = solve_with_ortools(hard_schedule)
+  assert {(item.date, item.shiftType) for item in result.assignments if item.employeeId == "emp-00"} == {
+    (item.date, item.shiftType) for item in pinned
+  }
+
+
+def test_symmetry_rows_order_off_days_within_each_class():
+  schedule = _schedule()
+  model_ir = ScheduleModelIR(schedule)
+  assert model_ir.symmetry_stats["mode"] == "count" and model_ir.symmetry_stats["rows"] > 0
+  result = solve_with_ortools(schedule)
+  off_days = Counter(item.employeeId for item in result.assignments if item.shiftType == "O")
+  for members in model_ir.symmetry_classes:
+    counts = [off_days[employee_id] for employee_id in members]
+    assert counts == sorted(counts, reverse=True)
+
+
+def test_spread_balance_needs_fewer_rows_and_still_solves():
+  pairwise = _schedule(balanceFormulation="pairwise")
+  spread = _schedule(balanceFormulation="spread")
+  assert ScheduleModelIR(spread).num_rows < ScheduleModelIR(pairwise).num_rows
+  result = solve_with_ortools(spread)
+  assert result.status in {"optimal", "feasible", "timeout"} and result.assignments
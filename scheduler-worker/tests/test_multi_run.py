@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+import pipeline
+from conftest import build_payload
+from models import parse_schedule_input
+from solver.exceptions import SolverFailure
+from solver.incumbents import IncumbentSink
+
+
+class RecordingEvents:
+  def __init__(self):
+    self.phases = []
+    self.events = []
+
+  def enter_phase(self, phase, **details):
+    self.phases.append((phase, details))
+
+  def emit(self, event, data):
+    self.events.append((event, data() if callable(data) else data))
+
+
+class JobToken:
+  def __init__(self, schedule):
+    self.cancelled = False
+    self.incumbent_sink = IncumbentSink(schedule, min_interval_ms=0)
+    self.events = RecordingEvents()
+
+
+@pytest.fixture
+def pooled(monkeypatch):
+  # Enough cores on paper for one pool worker per attempt, whatever the runner has.
+  monkeypatch.setattr(pipeline, "available_cores", lambda: 4)
+  monkeypatch.setattr(pipeline, "inflight_jobs", lambda: 1)
+
+
+def test_pool_attempts_forward_incumbents_and_progress(pooled):
+  payload = build_payload(employees=12, days=14)
+  payload["options"]["maxSolveTimeMs"] = 3000
+  payload["options"]["multiRun"] = {"attempts": 2, "weightJitterPct": 10, "seed": 7}
+  schedule = parse_schedule_input(payload)
+  token = JobToken(schedule)
+  result = pipeline.solve_job(schedule, "cpsat", token)
+  assert result.assignments
+  snapshot = token.incumbent_sink.snapshot(force=True)
+  assert snapshot and snapshot["assignments"]
+  assert any(event == "incumbent" for event, _ in token.events.events)
+  attempts = {details.get("attempt") for phase, details in token.events.phases if phase == "solve"}
+  assert attempts == {1, 2}
+
+
+def test_pool_gives_up_after_deadline_grace(pooled):
+  payload = build_payload(employees=24, days=28)
+  payload["options"]["maxSolveTimeMs"] = 60000
+  payload["options"]["multiRun"] = {"attempts": 2, "weightJitterPct": 10, "seed": 7, "deadlineMs": 500}
+  schedule = parse_schedule_input(payload)
+  started = time.perf_counter()
+  with pytest.raises(SolverFailure) as failure:
+    # CBC inside a pool worker ignores the stop event; only the grace period ends the wait.
+    pipeline.solve_job(schedule, "ortools")
+  elapsed = time.perf_counter() - started
+  assert failure.value.diagnostics["solverStatus"] == "timeout"
+  # IR build + deadline + grace, with room for spawn and teardown on a loaded runner.
+  assert elapsed < 0.5 + pipeline.CANCEL_GRACE_SECONDS + 2.0
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from conftest import build_payload
+from models import Assignment, parse_schedule_input
+from solver.ortools_solver import solve_with_ortools
+from solver.postprocessor import SchedulePostProcessor, ScheduleState
+
+
+@pytest.fixture(scope="module")
+def solved():
+  schedule = parse_schedule_input(build_payload(employees=12, days=14))
+  return schedule, solve_with_ortools(schedule)
+
+
+def _processor(solved):
+  schedule, result = solved
+  return SchedulePostProcessor(schedule, list(result.assignments), result.diagnostics, schedule.options)
+
+
+def test_delta_swap_penalty_matches_full_rescore(solved):
+  processor = _processor(solved)
+  evaluator, state = processor.evaluator, processor.state
+  rng = random.Random(11)
+  cells = range(len(state.codes))
+  applied = 0
+  for _ in range(400):
+    cell_a, cell_b = rng.sample(cells, 2)
+    if rng.random() < 0.5:
+      # Same-day swaps are the postprocessor's main move; keep them well represented.
+      cell_b = (cell_b // state.num_days) * state.num_days + cell_a % state.num_days
+    if cell_a == cell_b or not state.can_swap_cells(cell_a, cell_b):
+      continue
+    before = evaluator.penalty()
+    predicted = evaluator.swap_penalty(cell_a, cell_b)
+    assert evaluator.penalty() == pytest.approx(before)
+    assert evaluator.apply_swap(cell_a, cell_b)
+    applied += 1
+    full, _ = processor._evaluate()
+    assert predicted == pytest.approx(full)
+    assert evaluator.penalty() == pytest.approx(full)
+  assert applied > 100
+
+
+def test_schedule_state_packs_cells_and_round_trips(solved):
+  schedule, result = solved
+  assignments = list(result.assignments)
+  first = assignments[0]
+  locked = Assignment(employeeId=first.employeeId, date=first.date, shiftId=first.shiftId, shiftType=first.shiftType, isLocked=True)
+  stray = Assignment(employeeId="emp-unknown", date=first.date, shiftId=first.shiftId, shiftType=first.shiftType)
+  state = ScheduleState(schedule, assignments[1:] + [locked, stray])
+  assert state.codes.typecode == "b"
+  assert len(state.codes) == len(state.employee_ids) * state.num_days
+  cell = state.cell_index(first.employeeId, first.date)
+  assert state.locked[cell] and not any(state.can_swap_cells(cell, other) for other in range(len(state.codes)))
+  assert state.fixed_assignments == [stray]
+
+  def key(item):
+    return (item.employeeId, item.date, item.shiftId, item.shiftType, item.isLocked)
+
+  assert sorted(map(key, state.to_assignments())) == sorted(map(key, assignments[1:] + [locked, stray]))
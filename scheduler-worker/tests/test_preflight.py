@@ -0,0 +1,33 @@
+import pytest
+
+import pipeline
+from conftest import build_payload
+from models import parse_schedule_input
+from solver.exceptions import SolverFailure
+from solver.preflight import blocking_issues, run_preflight_checks
+
+
+def _schedule_owing(off_days: int):
+  # 2025-04-01..14 has four weekend days; accruals push emp-00's target past the period.
+  payload = build_payload(employees=12, days=14)
+  payload["previousOffAccruals"] = {"emp-00": off_days - 4}
+  payload["options"]["maxSolveTimeMs"] = 10000
+  return parse_schedule_input(payload)
+
+
+def test_off_day_overrun_starts_the_relaxation_ladder():
+  schedule = _schedule_owing(17)
+  blocking = blocking_issues(schedule, run_preflight_checks(schedule))
+  assert [issue["type"] for issue in blocking] == ["offRequirementImpossible"]
+  assert pipeline.blocking_relax_level(schedule, blocking) == 0
+  result = pipeline.solve_job(schedule, "ortools")
+  relaxations = [issue for issue in result.diagnostics["preflightIssues"] if issue["type"] == "fallbackRelaxation"]
+  assert [issue["level"] for issue in relaxations] == [1]
+  assert result.assignments
+
+
+def test_off_day_overrun_past_every_level_still_fails_fast():
+  schedule = _schedule_owing(30)
+  with pytest.raises(SolverFailure) as failure:
+    pipeline.solve_job(schedule, "ortools")
+  assert failure.value.diagnostics["blockingIssues"][0]["type"] == "offRequirementImpossible"
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+import pipeline
+from conftest import build_payload
+from models import parse_schedule_input
+from solver.model_ir import INF, get_model_ir
+from solver.rolling_horizon import plan_windows
+
+# Families whose windows straddle a rolling-horizon boundary; "avoid_" carries the hard N->D rule.
+BOUNDARY_ROW_PREFIXES = ("max_consecutive_work_", "max_consecutive_nights_", "rest_after_night_", "avoid_")
+
+
+def test_windows_commit_every_day_exactly_once():
+  start = date(2025, 4, 1)
+  for days, window_days, overlap_days in ((21, 7, 2), (30, 14, 3), (15, 14, 13), (8, 7, 0)):
+    end = start + timedelta(days=days - 1)
+    committed = []
+    for window in plan_windows(start, end, window_days, overlap_days):
+      assert window.start <= window.commit_end <= window.end <= end
+      committed.extend(window.start + timedelta(days=offset) for offset in range((window.commit_end - window.start).days + 1))
+    assert committed == [start + timedelta(days=offset) for offset in range(days)]
+
+
+class Passthrough:
+  # Keeps the stitched windows as solved; the postprocessor has its own tests.
+  def __init__(self, schedule, assignments, diagnostics, *args, **kwargs):
+    self.assignments, self.diagnostics = assignments, diagnostics
+
+  def run(self):
+    return self.assignments, self.diagnostics
+
+
+def test_rolling_windows_keep_sequence_rows_across_boundaries(monkeypatch):
+  payload = build_payload(employees=12, days=21)
+  for employee in payload["employees"]:
+    employee["maxConsecutiveNightsPreferred"] = 2
+  payload["options"].update(maxSolveTimeMs=30000, rollingHorizon={"enabled": True, "windowDays": 7, "overlapDays": 2})
+  schedule = parse_schedule_input(payload)
+  monkeypatch.setattr(pipeline, "SchedulePostProcessor", Passthrough)
+  result = pipeline.attempt_rolling_schedule_run(schedule, "rolling", preferred_solver="ortools")
+  windows = result.diagnostics["rollingHorizon"]["windows"]
+  assert len(windows) == 4 and all(window["status"] in {"optimal", "feasible"} for window in windows)
+  cells = [(item.employeeId, item.date) for item in result.assignments]
+  assert len(cells) == len(set(cells)) == 12 * 21
+
+  # Check the stitched schedule against the full-period model's rows, slacks left at zero.
+  model_ir = get_model_ir(schedule)
+  active = set(model_ir.assignment_indices(result.assignments))
+  checked = 0
+  for indices, coefs, lb, ub, name in zip(
+    model_ir.row_indices, model_ir.row_coefs, model_ir.row_lb, model_ir.row_ub, model_ir.row_names
+  ):
+    if not name.startswith(BOUNDARY_ROW_PREFIXES):
+      continue
+    total = sum(coef for idx, coef in zip(indices, coefs) if idx < model_ir.num_assignment_vars and idx in active)
+    assert lb <= total and (ub == INF or total <= ub), name
+    checked += 1
+  assert checked
@@ -0,0 +1,43 @@
+import pytest
+
+from conftest import build_payload
+from models import parse_schedule_input
+from solver.cpsat_solver import solve_with_cpsat
+from solver.ortools_solver import OrToolsMilpSolver
+
+TIME_LIMIT_MS = 60000
+
+
+def _schedule(stop_criteria):
+  payload = build_payload(employees=12, days=14)
+  payload["options"].update(maxSolveTimeMs=TIME_LIMIT_MS, stopCriteria=stop_criteria)
+  return parse_schedule_input(payload)
+
+
+@pytest.mark.parametrize(
+  "stop_criteria, stopped_by",
+  [({"noImprovementMs": 500}, "noImprovement"), ({"relativeGap": 0.9}, "relativeGap")],
+)
+def test_cpsat_stops_early(stop_criteria, stopped_by):
+  result = solve_with_cpsat(_schedule(stop_criteria))
+  # CP-SAT does not close this ward's gap within the limit, so only the criterion can end the search early.
+  assert result.solve_time_ms < TIME_LIMIT_MS / 2
+  assert not result.timed_out
+  assert result.diagnostics["stopCriteria"]["stoppedBy"] == stopped_by
+  assert result.diagnostics["stopCriteria"]["unsupported"] == []
+  objective = result.diagnostics["objective"]
+  assert objective["value"] == pytest.approx(result.best_objective)
+  assert objective["bestBound"] is not None and objective["relativeGap"] is not None
+  if stopped_by == "relativeGap":
+    assert objective["relativeGap"] <= 0.9
+
+
+def test_cbc_reports_unsupported_criteria():
+  schedule = _schedule({"relativeGap": 0.5, "absoluteGap": 10, "noImprovementMs": 500})
+  result = OrToolsMilpSolver(schedule).solve()
+  stop = result.diagnostics["stopCriteria"]
+  assert stop["unsupported"] == ["absoluteGap", "noImprovementMs"]
+  assert "stoppedBy" in stop
+  objective = result.diagnostics["objective"]
+  assert objective["value"] == pytest.approx(result.best_objective)
+  assert objective["bestBound"] is not None and objective["relativeGap"] is not None
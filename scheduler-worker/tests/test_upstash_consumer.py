@@ -0,0 +1,167 @@
+import asyncio
+import importlib.util
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as worker
+from conftest import LocalRedis, build_payload
+from queue_consumer import QueueConsumer
+
+
+def _drain(consumers, handled, expected, timeout=5.0):
+  async def run():
+    for consumer in consumers:
+      consumer.start()
+    deadline = time.perf_counter() + timeout
+    while len(handled) < expected and time.perf_counter() < deadline:
+      await asyncio.sleep(0.01)
+    for consumer in consumers:
+      await consumer.stop()
+      await asyncio.gather(*consumer.running)
+
+  asyncio.run(run())
+
+
+def test_consumer_bounds_concurrency():
+  redis = LocalRedis()
+  redis.rpush("queue", *[f"job-{index}" for index in range(6)])
+  handled, active, peak = [], [0], [0]
+
+  async def handler(job_id):
+    active[0] += 1
+    peak[0] = max(peak[0], active[0])
+    await asyncio.sleep(0.05)
+    active[0] -= 1
+    handled.append(job_id)
+
+  _drain([QueueConsumer(redis, "queue", handler, concurrency=2, min_delay=0.01)], handled, 6)
+  assert sorted(handled) == sorted(f"job-{index}" for index in range(6))
+  assert peak[0] == 2
+
+
+def test_consumer_backs_off_while_idle_and_resets_on_claim():
+  redis = LocalRedis()
+  handled = []
+
+  async def handler(job_id):
+    handled.append((job_id, consumer.delay))
+
+  consumer = QueueConsumer(redis, "queue", handler, concurrency=1, min_delay=0.01, max_delay=0.08)
+
+  async def run():
+    consumer.start()
+    await asyncio.sleep(0.3)
+    assert consumer.delay == pytest.approx(0.08)
+    redis.rpush("queue", "job-1")
+    await asyncio.sleep(0.2)
+    assert handled == [("job-1", 0.01)]
+    await consumer.stop()
+
+  asyncio.run(run())
+
+
+def test_consumers_sharing_a_queue_claim_each_job_once():
+  # Two machines polling the same list: LPOP hands every id to exactly one of them.
+  redis = LocalRedis()
+  redis.rpush("queue", *[f"job-{index}" for index in range(20)])
+  handled = []
+
+  async def handler(job_id):
+    await asyncio.sleep(0.01)
+    handled.append(job_id)
+
+  consumers = [QueueConsumer(redis, "queue", handler, concurrency=2, min_delay=0.01) for _ in range(2)]
+  _drain(consumers, handled, 20)
+  assert sorted(handled) == sorted(f"job-{index}" for index in range(20))
+
+
+def _wait_for_status(client, job_id, timeout=60.0):
+  deadline = time.perf_counter() + timeout
+  while time.perf_counter() < deadline:
+    status = client.get(f"/scheduler/jobs/{job_id}").json()
+    if status["status"] in worker.TERMINAL_JOB_STATUSES:
+      return status
+    time.sleep(0.1)
+  raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def upstash(monkeypatch):
+  redis = LocalRedis()
+  monkeypatch.setattr(worker, "UPSTASH_CLIENT", redis)
+  monkeypatch.setattr(worker, "UPSTASH_POLL_MIN_SECONDS", 0.01)
+  monkeypatch.setattr(worker, "JOB_RETENTION_SECONDS", 0)
+  return redis
+
+
+def test_app_consumes_enqueued_job_from_stored_payload(upstash):
+  payload = build_payload(employees=12, days=7)
+  payload["options"]["maxSolveTimeMs"] = 5000
+  with TestClient(worker.app) as client:
+    job_id = client.post("/scheduler/jobs", json={"milpInput": payload, "solver": "cpsat"}).json()["jobId"]
+    status = _wait_for_status(client, job_id)
+  # A 5s budget may end as timedout with a feasible schedule; either way the stored request was solved.
+  assert status["status"] in {"completed", "timedout"}
+  assert status["result"]["assignments"]
+  record = json.loads(upstash.get(worker._job_record_key(job_id)))
+  assert record["status"] == status["status"]
+  assert upstash.lpop(worker.UPSTASH_QUEUE_KEY) is None
+
+
+def test_app_skips_job_cancelled_while_queued(upstash, monkeypatch):
+  started, messages = [], []
+
+  async def fake_process_job(job, payload):
+    started.append(job.id)
+
+  monkeypatch.setattr(worker, "process_job", fake_process_job)
+  monkeypatch.setattr(worker, "UPSTASH_CONSUMER_ENABLED", False)
+  with TestClient(worker.app) as client:
+    job_id = client.post("/scheduler/jobs", json={"milpInput": build_payload(employees=12, days=7)}).json()["jobId"]
+    assert client.post(f"/scheduler/jobs/{job_id}/cancel").json()["status"] == "cancelled"
+    assert job_id not in worker.jobs
+  record = json.loads(upstash.get(worker._job_record_key(job_id)))
+  # The cancel keeps the request; only the status tells the consumer to skip it.
+  assert record["status"] == "cancelled"
+  assert record["requestPayload"]["milpInput"]
+  sink = worker.logger.add(lambda message: messages.append(message.record), level="INFO")
+  try:
+    asyncio.run(worker.run_queued_job(upstash.lpop(worker.UPSTASH_QUEUE_KEY)))
+  finally:
+    worker.logger.remove(sink)
+  assert started == []
+  assert [(entry["level"].name, entry["message"]) for entry in messages] == [
+    ("INFO", f"[Upstash] queued job {job_id} is cancelled; skipping")
+  ]
+
+
+def _second_machine():
+  # A separate copy of the app module: its own jobs map and event buses, as on another machine.
+  spec = importlib.util.spec_from_file_location("app_machine_b", worker.__file__)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+
+def test_job_solved_on_another_machine_is_read_from_upstash(upstash, monkeypatch):
+  other = _second_machine()
+  monkeypatch.setattr(worker, "UPSTASH_CONSUMER_ENABLED", False)
+  monkeypatch.setattr(other, "UPSTASH_CLIENT", upstash)
+  monkeypatch.setattr(other, "UPSTASH_POLL_MIN_SECONDS", 0.01)
+  monkeypatch.setattr(other, "JOB_RETENTION_SECONDS", 0)
+  payload = build_payload(employees=12, days=7)
+  payload["options"]["maxSolveTimeMs"] = 5000
+  with TestClient(worker.app) as accepting, TestClient(other.app):
+    job_id = accepting.post("/scheduler/jobs", json={"milpInput": payload, "solver": "cpsat"}).json()["jobId"]
+    status = _wait_for_status(accepting, job_id)
+    assert status["status"] in {"completed", "timedout"}
+    assert status["result"]["assignments"]
+    assert job_id not in worker.jobs
+    # A late cancel on the accepting machine must not clobber the finished record.
+    assert accepting.post(f"/scheduler/jobs/{job_id}/cancel").json()["status"] == status["status"]
+  record = json.loads(upstash.get(worker._job_record_key(job_id)))
+  assert record["status"] == status["status"]
+  assert record["result"]["assignments"]
@@ -5,6 +5,7 @@ import type {
   MilpCspScheduleInput,
   MilpCspSpecialRequest,
   MilpCspSolverOptions,
+  MilpCspWarmStart,
 } from './types';
 
 const EMPLOYEE_ALIAS_CHARS = 'abcdefghijklmnopqrstuvwxyz';
@@ -42,6 +43,7 @@ export interface SerializeMilpCspInputOptions {
   careerGroups?: MilpCspCareerGroup[];
   yearsOfServiceMap?: Map<string, number>;
   solverOptions?: MilpCspSolverOptions;
+  warmStart?: MilpCspWarmStart;
 }
 
 const buildEmployeeAliasMap = (employees: ScheduleLikeEmployee[]) => {
@@ -95,6 +97,7 @@ export function serializeMilpCspInput(
     careerGroups = [],
     yearsOfServiceMap = new Map<string, number>(),
     solverOptions,
+    warmStart,
   } = options;
 
   const employeeAliasMap = buildEmployeeAliasMap(source.employees);
@@ -144,5 +147,6 @@ export function serializeMilpCspInput(
     careerGroups,
     aliasMaps,
     options: solverOptions,
+    warmStart,
   };
 }
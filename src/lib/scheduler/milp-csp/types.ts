@@ -76,6 +76,7 @@ export interface MilpMultiRunOptions {
   attempts?: number;
   weightJitterPct?: number;
   seed?: number | null;
+  deadlineMs?: number;
 }
 
 export interface MilpPatternConstraintOptions {
@@ -104,6 +105,52 @@ export interface MilpCspSettingsOptions {
   };
 }
 
+export interface MilpCpSatSearchOptions {
+  numWorkers?: number;
+  portfolio?: string[];
+  linearizationLevel?: number;
+  relativeGapLimit?: number;
+  sequenceConstraints?: 'linear' | 'automaton';
+}
+
+export interface MilpHybridOptions {
+  targetGap?: number;
+  targetPenalty?: number;
+  cbcTimeShare?: number;
+}
+
+export interface MilpDecompositionOptions {
+  enabled?: boolean | 'auto';
+  minEmployees?: number;
+  maxClusterSize?: number;
+  subproblemTimeRatio?: number;
+  repairRadius?: number;
+}
+
+export interface MilpRollingHorizonOptions {
+  enabled?: boolean | 'auto';
+  minDays?: number;
+  windowDays?: number;
+  overlapDays?: number;
+}
+
+export interface MilpSymmetryBreakingOptions {
+  enabled?: boolean;
+  mode?: 'count' | 'lex';
+  prefixDays?: number;
+}
+
+export interface MilpStopCriteriaOptions {
+  relativeGap?: number;
+  absoluteGap?: number;
+  noImprovementMs?: number;
+}
+
+export interface MilpLazyWindowOptions {
+  enabled?: boolean;
+  maxRounds?: number;
+}
+
 export interface MilpCspSolverOptions {
   maxSolveTimeMs?: number;
   maxIterations?: number;
@@ -116,6 +163,27 @@ export interface MilpCspSolverOptions {
   multiRun?: MilpMultiRunOptions;
   patternConstraints?: MilpPatternConstraintOptions;
   dailyStaffingBalance?: MilpDailyStaffingBalanceOptions;
+  cpsatSettings?: MilpCpSatSearchOptions;
+  hybrid?: MilpHybridOptions;
+  decomposition?: MilpDecompositionOptions;
+  rollingHorizon?: MilpRollingHorizonOptions;
+  symmetryBreaking?: boolean | MilpSymmetryBreakingOptions;
+  balanceFormulation?: 'auto' | 'pairwise' | 'spread';
+  lazyWindows?: boolean | MilpLazyWindowOptions;
+  stopCriteria?: MilpStopCriteriaOptions;
+  requiredStaffByDate?: Record<string, Record<string, number>>; // yyyy-MM-dd -> shift code -> staff
+}
+
+export interface MilpCspWarmStartAssignment {
+  employeeId: string;
+  date: string; // yyyy-MM-dd
+  shiftType?: string | null;
+  shiftId?: string | null;
+}
+
+export interface MilpCspWarmStart {
+  assignments: MilpCspWarmStartAssignment[];
+  hard?: boolean;
 }
 
 export interface MilpCspScheduleInput {
@@ -134,6 +202,7 @@ export interface MilpCspScheduleInput {
   careerGroups?: MilpCspCareerGroup[];
   aliasMaps?: MilpCspAliasMaps;
   options?: MilpCspSolverOptions;
+  warmStart?: MilpCspWarmStart;
 }
 
 export interface MilpCspSolverStats {
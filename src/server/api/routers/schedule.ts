@@ -291,11 +291,20 @@ interface SchedulerBackendResult {
   } | null;
 }
 
+interface SchedulerBackendIncumbent {
+  engine: 'cpsat' | 'cbc';
+  objective: number | null;
+  foundAtMs: number;
+  version: number;
+  assignments: SchedulerBackendResult['assignments'];
+}
+
 interface SchedulerBackendJobStatusResponse {
   id: string;
   status: 'queued' | 'processing' | 'completed' | 'failed' | 'timedout' | 'cancelled';
   result?: SchedulerBackendResult | null;
   bestResult?: SchedulerBackendResult | null;
+  incumbent?: SchedulerBackendIncumbent | null;
   error?: string | null;
   errorDiagnostics?: Record<string, unknown> | null;
   createdAt: string;
@@ -2490,6 +2499,7 @@ export const scheduleRouter = createTRPCRouter({
         status: status.status,
         result: status.result ?? null,
         bestResult: status.bestResult ?? null,
+        incumbent: status.incumbent ?? null,
         error: status.error ?? null,
         errorDiagnostics: status.errorDiagnostics ?? null,
       };
@@ -2508,6 +2518,7 @@ export const scheduleRouter = createTRPCRouter({
         status: status.status,
         result: status.result ?? null,
         bestResult: status.bestResult ?? null,
+        incumbent: status.incumbent ?? null,
         error: status.error ?? null,
         errorDiagnostics: status.errorDiagnostics ?? null,
       };